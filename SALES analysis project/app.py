@@ -2,11 +2,27 @@
 import streamlit as st
 import pandas as pd
 import datetime
-from utils.cleaning import clean_data, explain_column_detection
-from utils.eda import get_summary, total_missing, missing_values_chart
+import json
+from functools import partial
+from utils.cache import file_hash, make_key
+from utils.pipeline import dataset_cache, dataset_key, detected_columns, dimension_columns, prepare_dataset, read_upload
+from utils.cube import build_cube
+from utils.ingest import files_key, ingest_files
+from utils.filters import FilterIndex, category_options, isin_mask, take
+from utils.parquet_store import PARQUET_AVAILABLE, open_dataset, write_dataset
+from utils.shared_store import SHARED_STORE_AVAILABLE, shared_datasets
+from utils.append import append_key, append_upload
+from utils.streaming import load_csv_stream, load_xlsx_stream, xlsx_layout
+from utils.eda import APPROX_ROWS, profile_frame, missing_table_from_counts, plot_missing_values
 from utils import charts
-from utils.report import export_report
+from utils.report import build_report, rasterize_charts
+from utils.kpis import compute_kpis, estimate_kpis, estimate_table, kpi_table
+from utils.preview import PAGE_SIZES, export_file, page, search_mask, select_positions, sort_order
+from utils.perf import PERF_DEFAULT, Tracer, deactivate, span
 from utils.insights import generate_insights
+from utils.timeseries import FREQ_LABELS
+from utils.approx import build_sample
+from utils.precompute import precomputer
 
 st.set_page_config(page_title="Sales Analysis Dashboard", layout="wide")
 
@@ -14,31 +30,197 @@ st.set_page_config(page_title="Sales Analysis Dashboard", layout="wide")
 st.title("📊 Sales Analysis Platform")
 st.markdown("---")
 
-uploaded_file = st.sidebar.file_uploader(
-    "Upload your CSV or Excel file",
+uploaded_files = st.sidebar.file_uploader(
+    "Upload your CSV or Excel file(s)",
     type=["csv", "xlsx"],
-    help="The platform automatically detects sales-related columns for analysis."
+    accept_multiple_files=True,
+    help="The platform automatically detects sales-related columns for analysis. "
+         "Several files (e.g. monthly exports) are parsed in parallel and combined."
 )
 
 st.sidebar.markdown("### 🔧 Quick actions")
 st.sidebar.info("Upload a CSV/XLSX with sales, date, category, profit columns (best if column names contain those words).")
 
-# ---------- Main ----------
-if uploaded_file:
-    try:
-        if uploaded_file.name.endswith(".csv"):
-            df = pd.read_csv(uploaded_file, encoding='latin1')
-        else:
-            df = pd.read_excel(uploaded_file)
-    except Exception as e:
-        st.error(f"Error loading file: {e}")
-        st.stop()
+# Performance panel: time every stage of this rerun (off = no tracer, near-zero overhead)
+tracer = None
+if st.sidebar.toggle("⏱️ Performance panel", value=PERF_DEFAULT,
+                     help="Show per-stage timings, row counts and memory deltas for each rerun."):
+    tracer = Tracer().activate()
+else:
+    deactivate()
+
+
+# Identifies this session's batch of background precompute jobs; the batch is
+# cancelled when the session's state (holding the token) is dropped
+if "precompute_token" not in st.session_state:
+    st.session_state["precompute_token"] = precomputer.owner()
+session_owner = st.session_state["precompute_token"].key
+
+
+# This session's dataset leases; looked up here so background jobs can lease too
+session_leases = st.session_state.setdefault("dataset_leases", {})
 
-    df_cleaned = clean_data(df.copy())
-    df_cleaned.columns = df_cleaned.columns.str.strip().str.lower().str.replace('[^a-z0-9_]', '', regex=True)
+
+def lease_dataset(key, build):
+    """
+    Shared, memory-mapped dataset for key (built once per server process), leased by
+    this session until release_leases(). Returns (df, col_info, column_types).
+    """
+    if key not in session_leases:
+        session_leases[key] = shared_datasets.acquire(key, build)
+    lease = session_leases[key]
+    return lease.df, lease.col_info, lease.column_types
+
+
+def release_leases(keep=()):
+    """Release this session's leases on every dataset not in keep."""
+    for key in [k for k in session_leases if k not in keep]:
+        session_leases.pop(key).release()
+
+
+def show_perf():
+    if tracer is None:
+        return
+    with st.sidebar.expander("⏱️ Performance", expanded=True):
+        table = tracer.table()
+        st.caption(f"{len(table)} stages, {table.loc[table['stage'] == table['stage'].str.lstrip(), 'ms'].sum():,.1f} ms "
+                   "in top-level stages")
+        st.dataframe(table, hide_index=True)
+        st.download_button("Download Chrome trace", data=json.dumps(tracer.chrome_trace()),
+                           file_name="sales_dashboard_trace.json", mime="application/json", on_click="ignore",
+                           help="Open in chrome://tracing or ui.perfetto.dev")
+
+
+# ---------- Main ----------
+if uploaded_files:
+    uploaded_file = uploaded_files[0]
+    all_sheets = any(f.name.lower().endswith(".xlsx") for f in uploaded_files) and st.sidebar.toggle(
+        "Combine all workbook sheets",
+        help="Read every worksheet of each workbook instead of only the first one."
+    )
+    multi_file = len(uploaded_files) > 1 or all_sheets
+    is_xlsx = uploaded_file.name.lower().endswith(".xlsx")
+    streaming_mode = not multi_file and st.sidebar.toggle(
+        "Streaming mode (large CSV/XLSX)",
+        help="Read the file in chunks (worksheet rows in batches for Excel) and show pre-aggregated KPIs and "
+             "charts. Filters are not available."
+    )
+    use_store = PARQUET_AVAILABLE and not streaming_mode and st.sidebar.toggle(
+        "Columnar dataset cache (Parquet)", value=True,
+        help="Persist the cleaned upload as Parquet once and read only the row groups matching the filters."
+    )
+    dataset = df_cleaned = None
+    with span("load dataset"):
+        try:
+            if streaming_mode:
+                stream_progress = st.sidebar.empty()
+                report = lambda n: stream_progress.caption(f"Aggregated {n:,} rows...")
+                if is_xlsx:
+                    # Sheet names and header rows come from the first rows of each sheet only
+                    layout = dataset_cache.get_or_compute(make_key("xlsx layout", file_hash(uploaded_file)),
+                                                          lambda: xlsx_layout(uploaded_file))
+                    sheets = list(layout)
+                    sheet = st.sidebar.selectbox("Worksheet", sheets,
+                                                 index=max(range(len(sheets)), key=lambda i: layout[sheets[i]][1]))
+                    header_row = st.sidebar.number_input(
+                        "Header row", min_value=1, value=layout[sheet][0] + 1, key=f"header_row:{sheet}",
+                        help="Detected automatically (title lines above the table are skipped).")
+                    agg, col_info, column_types = load_xlsx_stream(uploaded_file, sheet_name=sheet,
+                                                                   header_row=int(header_row) - 1, progress=report)
+                else:
+                    agg, col_info, column_types = load_csv_stream(uploaded_file, progress=report)
+                stream_progress.empty()
+            else:
+                if multi_file:
+                    # Files/sheets are parsed and cleaned in parallel worker processes
+                    sources = [(f.name, f.getvalue()) for f in uploaded_files]
+                    data_key = files_key(sources, all_sheets)
+                    load_cleaned = partial(ingest_files, sources, all_sheets)
+                else:
+                    data = uploaded_file.getvalue()
+                    data_key = dataset_key(data, uploaded_file.name)
+                    load_cleaned = lambda: prepare_dataset(read_upload(data, uploaded_file.name))
+                if use_store:
+                    dataset = open_dataset(data_key)
+                    if dataset is None:
+                        df_cleaned, col_info, column_types = load_cleaned()
+                        dataset = write_dataset(df_cleaned, data_key, col_info, column_types)
+                    col_info, column_types = dataset.col_info, dataset.column_types
+                elif SHARED_STORE_AVAILABLE:
+                    # One memory-mapped copy per server process, shared read-only by every session
+                    # that opened the same upload; the session's lease keeps it mapped
+                    df_cleaned, col_info, column_types = lease_dataset(data_key, load_cleaned)
+                else:
+                    df_cleaned, col_info, column_types = dataset_cache.get_or_compute(data_key, load_cleaned)
+        except Exception as e:
+            st.error(f"Error loading file: {e}")
+            st.stop()
+
+    def full_frame():
+        """
+        The whole cleaned dataset, for builds that need every row (cube, sample, append).
+        From the Parquet store it is read once into the shared registry, not once per session.
+        """
+        if dataset is None:
+            return df_cleaned
+        if SHARED_STORE_AVAILABLE:
+            return lease_dataset(data_key, lambda: (dataset.read(), col_info, column_types))[0]
+        return dataset.read()
+
+    # ---------- Append mode: fold delta files into the loaded dataset ----------
+    if not streaming_mode:
+        # Deltas appended this session, per base dataset: [(name, bytes)]
+        appended = st.session_state.setdefault("appended", {}).setdefault(data_key, [])
+        append_box = st.sidebar.expander("➕ Append new rows", expanded=bool(appended))
+        delta_file = append_box.file_uploader("Delta file with the same columns", type=["csv", "xlsx"],
+                                              key="delta_file",
+                                              help="Only the new rows are cleaned, deduplicated and aggregated.")
+        if delta_file is not None and append_box.button("Append rows"):
+            delta_data = delta_file.getvalue()
+            if all(d != delta_data for _, d in appended):
+                appended.append((delta_file.name, delta_data))
+        keys = [data_key]
+        for _, delta_data in appended:
+            keys.append(append_key(keys[-1], delta_data))
+
+        if appended:
+            def loaded(key):
+                """Cleaned frame of a version of the dataset if it is still loaded, else None."""
+                if key == keys[0]:
+                    return full_frame()
+                cached = dataset_cache.get(key)
+                return cached[0] if cached else None
+
+            def load_appended():
+                # Fold in only the deltas after the latest version still loaded (the upload at worst)
+                start = len(appended) - 1
+                while start and loaded(keys[start]) is None:
+                    start -= 1
+                df = loaded(keys[start])
+                for key, (name, delta_data) in zip(keys[start:], appended[start:]):
+                    df = append_upload(df, key, name, delta_data, col_info, column_types).df
+                return df, col_info, column_types
+
+            with span("append rows"):
+                # Appended versions stay in this process's dataset cache: writing each one to the
+                # Parquet or shared store would cost time proportional to the whole history.
+                # Only the latest delta can fail validation: drop it and keep the earlier ones.
+                while appended:
+                    try:
+                        df_cleaned, col_info, column_types = dataset_cache.get_or_compute(keys[-1], load_appended)
+                        dataset, data_key = None, keys[-1]
+                        break
+                    except ValueError as e:
+                        append_box.error(f"Could not append {appended.pop()[0]}: {e}")
+                        keys.pop()
+        for (name, _), key in zip(appended, keys[1:]):
+            summary = dataset_cache.get(make_key("append summary", key))
+            append_box.caption(f"{name}: +{summary['added']:,} rows, {summary['duplicates']:,} duplicates skipped"
+                               if summary else name)
+    # Keep only the lease this view uses: the upload's (appended versions are not leased)
+    release_leases(keep=() if streaming_mode else {keys[0]})
 
     # Column detection
-    col_info = explain_column_detection(df_cleaned)
     st.sidebar.subheader("📌 Column Detection Summary")
     for col_label, (col_name, score, reason) in col_info.items():
         if col_name:
@@ -47,188 +229,527 @@ if uploaded_file:
                 st.sidebar.caption(reason)
         else:
             st.sidebar.warning(f"{col_label}: Not detected")
+    if df_cleaned is not None and df_cleaned.attrs.get("detection"):
+        step_times = df_cleaned.attrs["detection"]["timings"]
+        st.sidebar.caption("Detection time: " + ", ".join(f"{k} {v * 1000:.1f} ms" for k, v in step_times.items()))
+    with st.sidebar.expander("🧬 Inferred column types"):
+        st.dataframe(pd.DataFrame(
+            [(c, t["kind"], t["format"] or "") for c, t in column_types.items()],
+            columns=["column", "type", "format"]), hide_index=True)
 
     # Map columns
-    sales_col = col_info.get("Sales Column", (None, 0, ""))[0]
-    profit_col = col_info.get("Profit Column", (None, 0, ""))[0]
-    category_col = col_info.get("Category Column", (None, 0, ""))[0]
-    date_col = col_info.get("Date Column", (None, 0, ""))[0]
+    sales_col, profit_col, category_col, date_col = detected_columns(col_info)
+
+    # ---------- Streaming mode: render from pre-aggregates only ----------
+    if streaming_mode:
+        st.info(f"Streaming mode: {agg.rows:,} rows aggregated in chunks. Filters and drill-down are disabled.")
+        kpi = agg.kpis()
+        kpi_cols = st.columns(4)
+        kpi_cols[0].metric("💰 Total Sales", f"${kpi['total_sales']:,.0f}" if sales_col else "n/a")
+        kpi_cols[1].metric("📈 Total Profit", f"${kpi['total_profit']:,.0f}" if profit_col else "n/a")
+        kpi_cols[2].metric("🛒 Avg. Sales per Record", f"${kpi['avg_sales']:,.2f}" if kpi["avg_sales"] is not None else "n/a")
+        kpi_cols[3].metric("🗑️ Total Missing Cells", f"{kpi['total_missing']:,}")
+
+        col_chart_1, col_chart_2 = st.columns(2)
+        with col_chart_1:
+            if agg.time_series is not None and sales_col:
+                ts = agg.time_series.rename_axis(date_col).reset_index()
+                st.plotly_chart(charts.sales_over_time(ts, date_col, sales_col), use_container_width=True)
+        with col_chart_2:
+            if sales_col and len(agg.histogram.edges):
+                st.plotly_chart(charts.binned_histogram(agg.histogram.edges, agg.histogram.counts, sales_col),
+                                use_container_width=True)
+        if agg.category_sums is not None and sales_col:
+            cat_sums = agg.category_sums.rename_axis(category_col).reset_index()
+            col_chart_3, col_chart_4 = st.columns(2)
+            with col_chart_3:
+                st.plotly_chart(charts.category_sales_bar(cat_sums, category_col, sales_col), use_container_width=True)
+            with col_chart_4:
+                st.plotly_chart(charts.sales_pie_donut_chart(cat_sums, category_col, sales_col), use_container_width=True)
+
+        st.subheader("Missing Values Analysis")
+        st.plotly_chart(plot_missing_values(missing_table_from_counts(agg.missing, agg.rows)), use_container_width=True)
+        st.subheader(f"📄 Data Preview (random sample of {len(agg.sample):,} rows)")
+        st.dataframe(agg.sample)
+        show_perf()
+        st.stop()
 
     if date_col:
-        try:
-            df_cleaned[date_col] = pd.to_datetime(df_cleaned[date_col], errors='coerce')
-            df_cleaned = df_cleaned.dropna(subset=[date_col])
-            df_cleaned = df_cleaned.sort_values(date_col)
-        except Exception:
+        if dataset:
+            date_ok = "date_min" in dataset.stats
+        else:
+            date_ok = pd.api.types.is_datetime64_any_dtype(df_cleaned[date_col])
+        if not date_ok:
             st.sidebar.warning(f"Could not convert '{date_col}' to datetime.")
+            date_col = None
 
-    df_filtered = df_cleaned.copy()
+    # Without the Parquet store, filters are answered by sorted indexes over the
+    # in-memory frame, built once per dataset
+    findex = None if dataset else dataset_cache.get_or_compute(
+        make_key("index", data_key), lambda: FilterIndex(df_cleaned, date_col, category_col, sales_col))
+    date_range = selected_cats = selected_range = None
 
     # Filters
     if date_col:
-        min_date = df_filtered[date_col].min().date()
-        max_date = df_filtered[date_col].max().date()
-        date_range = st.sidebar.date_input("Select Date Range", [min_date, max_date])
-        if isinstance(date_range, list) and len(date_range) == 2:
-            start, end = date_range
-            df_filtered = df_filtered[(df_filtered[date_col] >= pd.to_datetime(start)) &
-                                      (df_filtered[date_col] <= pd.to_datetime(end))]
+        if dataset:
+            min_date, max_date = dataset.date_bounds
+        else:
+            min_date, max_date = (d.date() for d in findex.date_bounds())
+        picked_dates = st.sidebar.date_input("Select Date Range", [min_date, max_date])
+        if isinstance(picked_dates, (list, tuple)) and len(picked_dates) == 2:
+            date_range = (pd.to_datetime(picked_dates[0]), pd.to_datetime(picked_dates[1]))
 
     if category_col:
-        cats = df_filtered[category_col].astype(str).unique().tolist()
+        cats = dataset.stats["categories"] if dataset else findex.category_options(findex.select(date_range))
         selected_cats = st.sidebar.multiselect("Select Categories", options=cats, default=cats)
-        if selected_cats:
-            df_filtered = df_filtered[df_filtered[category_col].astype(str).isin(selected_cats)]
 
     if sales_col:
-        smin = float(df_filtered[sales_col].min())
-        smax = float(df_filtered[sales_col].max())
+        if dataset:
+            smin, smax = dataset.stats["sales_min"], dataset.stats["sales_max"]
+        else:
+            smin, smax = findex.sales_bounds(findex.select(date_range, selected_cats))
+            if smin is None:
+                smin, smax = findex.sales_bounds()
         selected_range = st.sidebar.slider("Filter by Sales Amount", min_value=smin, max_value=smax, value=(smin, smax))
-        df_filtered = df_filtered[(df_filtered[sales_col] >= selected_range[0]) &
-                                  (df_filtered[sales_col] <= selected_range[1])]
 
-    # Tabs
-    tab1, tab_insights, tab2, tab3, tab4 = st.tabs(
-        ["📊 KPIs & Charts", "💡 Insights", "🔬 EDA", "📄 Data Preview", "⬇️ Report Export"]
-    )
+    # Results are memoized per dataset + filter state, so reruns that only switch
+    # tabs or open an expander reuse them instead of recomputing
+    view_key = (data_key, date_range, selected_cats, selected_range)
 
-    # ---------- TAB 1: KPIs & Charts ----------
-    with tab1:
-        st.header("Key Performance Indicators (KPIs)")
-        kpi_cols = st.columns(4)
-        kpis = {}
+    def memo(name, compute, *parts):
+        return dataset_cache.get_or_compute(make_key(name, *view_key, *parts), compute)
 
-        # Total Sales
-        if sales_col:
-            total_sales = df_filtered[sales_col].sum()
-            kpi_cols[0].metric("💰 Total Sales", f"${total_sales:,.0f}")
-            kpis["Total Sales"] = f"${total_sales:,.0f}"
-        else:
-            kpi_cols[0].warning("No Sales column found")
-            kpis["Total Sales"] = "Warning: Column not found"
-
-        # Total Profit
-        if profit_col:
-            total_profit = df_filtered[profit_col].sum()
-            kpi_cols[1].metric("📈 Total Profit", f"${total_profit:,.0f}")
-            kpis["Total Profit"] = f"${total_profit:,.0f}"
+    with span("filter rows", rows_in=None if dataset else len(df_cleaned)) as stage:
+        if dataset:
+            # Push all filters down to Parquet so only matching row groups are read
+            df_filtered = memo("rows", lambda: dataset.read(date_range, selected_cats, selected_range))
         else:
-            kpi_cols[1].warning("No Profit column found")
-            kpis["Total Profit"] = "Warning: Column not found"
-
-        # Avg Sales
-        if sales_col and len(df_filtered) > 0:
-            avg_sales = df_filtered[sales_col].mean()
-            kpi_cols[2].metric("🛒 Avg. Sales per Record", f"${avg_sales:,.2f}")
-            kpis["Average Sales"] = f"${avg_sales:,.2f}"
-        else:
-            kpi_cols[2].warning("No Sales column to calculate average")
-            kpis["Average Sales"] = "Warning: Column not found"
-
-        # Total Missing
-        total_missing_count = total_missing(df_filtered)
-        kpi_cols[3].metric("🗑️ Total Missing Cells", f"{total_missing_count:,}")
-        kpis["Total Missing Cells"] = f"{total_missing_count:,}"
-
-        st.markdown("---")
-        st.header("Visualizations")
+            # Only the selected rows are copied; a date range alone is a slice of the date-sorted frame
+            df_filtered = memo("rows", lambda: take(df_cleaned, findex.select(date_range, selected_cats, selected_range)))
+        stage.rows_out = len(df_filtered)
+
+    # Aggregate cube, built once per dataset; KPIs, category/geo charts, drill-down and
+    # insights slice it instead of grouping the filtered rows again
+    def slice_cube():
+        with span("cube"):
+            cube = dataset_cache.get_or_compute(
+                make_key("cube", data_key),
+                lambda: build_cube(full_frame(), col_info))
+            if selected_range and (selected_range[0] > smin or selected_range[1] < smax):
+                # The sales slider is a row-level predicate the cube can't answer
+                return memo("cube", lambda: build_cube(df_filtered, col_info)).slice()
+            return cube.slice(date_range, selected_cats)
+
+    def get_cube_view():
+        return memo("cube:view", slice_cube) if sales_col else None
+
+    dims = dimension_columns(df_filtered.columns)
+
+    # Approximate mode: KPIs, rankings and the histogram are estimated from a stratified
+    # sample (built once per dataset), optionally refined to exact results in the background
+    n_rows = dataset.stats["rows"] if dataset else len(df_cleaned)
+    # Filters only drop rows, so a view as long as the dataset is all of it
+    unfiltered = len(df_filtered) == n_rows
+    approx_mode = bool(sales_col) and st.sidebar.toggle(
+        "⚡ Approximate mode", value=n_rows > APPROX_ROWS,
+        help="Estimate KPIs, top categories/customers and the sales histogram from a stratified sample, "
+             "with 95% error bounds."
+    )
+    refine_exact = approx_mode and st.sidebar.toggle(
+        "Refine to exact in background", value=True,
+        help="Compute the exact results on a background thread and replace the estimates when they are ready."
+    )
+    estimates = None
+    if approx_mode:
+        reservoir = dataset_cache.get_or_compute(
+            make_key("sample", data_key),
+            lambda: build_sample(full_frame(), col_info))
+        estimates = memo("approx", lambda: reservoir.view(date_range, selected_cats, selected_range))
+    warm_mode = st.sidebar.toggle(
+        "🔥 Precompute in background", value=True,
+        help="Compute KPIs, charts, the EDA summary and insights for the current filters on a background thread, "
+             "most visible first, and show each one as soon as it is ready."
+    )
+    warm_status = st.sidebar.container()
+
+    # One profiling pass per dataset + filter state feeds the EDA tab, the
+    # missing-cells KPI and the data quality insight
+    def get_profile():
+        profile = memo("profile", lambda: profile_frame(df_filtered))
+        if unfiltered and make_key("missing", data_key) not in dataset_cache:
+            # The whole dataset's missing counts, kept for its KPIs and for appending to it
+            dataset_cache.put(make_key("missing", data_key), profile.missing_counts)
+        return profile
+
+    def dataset_missing():
+        """Missing cells of the whole dataset if known (from its profile or an append), else None."""
+        counts = dataset_cache.get(make_key("missing", data_key)) if unfiltered else None
+        return None if counts is None else int(counts.sum())
+
+    def get_summary():
+        return memo("summary", lambda: get_profile().summary())
+
+    def get_kpis():
+        # The missing-cell count is read from the profile only if it is already there
+        return memo("kpis", lambda: compute_kpis(df_filtered, sales_col, profit_col, cube=get_cube_view(),
+                                                 profile=dataset_cache.get(make_key("profile", *view_key)),
+                                                 missing_cells=dataset_missing()))
+
+    def get_insights():
+        def compute():
+            missing = dataset_missing()
+            return generate_insights(df_filtered, sales_col, profit_col, category_col, cube=get_cube_view(),
+                                     missing_cells=get_profile().total_missing if missing is None else missing,
+                                     date_col=date_col)
+        return memo("insights", compute)
+
+    def get_category_sales():
+        return memo("category sales", lambda: get_cube_view().sums("category", sales_col))
+
+    # Chart figures are memoized per view and shared by the KPIs tab and the PDF report
+    def chart_time(freq="auto"):
+        return memo("chart:time", lambda: charts.sales_trend(get_cube_view().series(freq), sales_col), freq)
+
+    def chart_hist():
+        return memo("chart:hist", lambda: charts.sales_distribution_histogram(df_filtered, sales_col))
+
+    def chart_3d():
+        return memo("chart:3d", lambda: charts.sales_3d_scatter(df_filtered, sales_col, profit_col, category_col))
+
+    def chart_geo():
+        return memo("chart:geo", lambda: charts.sales_geo_map(get_cube_view().sums("geo", sales_col), dims["geo"], sales_col))
+
+    # Background warm-up: the current view's results, in the order the KPIs tab shows them,
+    # then the other tabs'. A new filter state replaces the batch and cancels what is left of it.
+    # In approximate mode the exact KPIs, histogram and insights are only computed to refine.
+    estimated = {"kpis", "chart:hist", "insights"} if approx_mode else set()
+    warm_jobs = [
+        # (result name, extra memo key parts, getter, progress label, applicable)
+        ("cube:view", (), get_cube_view, "aggregate cube", sales_col),
+        ("kpis", (), get_kpis, "KPIs", True),
+        ("category sales", (), get_category_sales, "category sales", category_col and sales_col),
+        ("chart:geo", (), chart_geo, "geo map", dims["geo"] and sales_col),
+        ("chart:time", ("auto",), chart_time, "sales over time", date_col and sales_col),
+        ("summary", (), get_summary, "EDA summary", True),
+        ("insights", (), get_insights, "insights", True),
+        ("chart:hist", (), chart_hist, "sales distribution", sales_col),
+    ]
+    jobs = []
+    for priority, (name, parts, compute, label, applicable) in enumerate(warm_jobs):
+        key = make_key(name, *view_key, *parts)
+        if applicable and (refine_exact if name in estimated else warm_mode) and key not in dataset_cache:
+            jobs.append((key, compute, priority, label))
+    warming = precomputer.schedule(session_owner, jobs)
+    PENDING = object()  # what ready() returns for a result still being computed
+    pending = []
+
+    def ready(name, compute, *parts):
+        """
+        compute() (a memoized getter) if its result is cached or it is not being warmed up,
+        else PENDING while the background job runs. Estimated results stay PENDING in
+        approximate mode unless refined.
+        """
+        key = make_key(name, *view_key, *parts)
+        future = warming.get(key)
+        if key in dataset_cache or future is None and name not in estimated:
+            return compute()
+        if future is None:
+            return PENDING
+        if not future.done():
+            pending.append(future)
+            return PENDING
+        if future.exception() and name in estimated:
+            st.sidebar.warning(f"Exact {name} failed: {future.exception()}")
+            return PENDING
+        # A failed job is retried here, so its error shows where the result would
+        return compute()
+
+    def computing(what):
+        st.info(f"⏳ Computing {what} in the background...")
+
+    cube_view = ready("cube:view", get_cube_view)
+
+
+    # Tabs track which one is open, so only the visible tab's body runs
+    tab1, tab_insights, tab2, tab3, tab4 = st.tabs(
+        ["📊 KPIs & Charts", "💡 Insights", "🔬 EDA", "📄 Data Preview", "⬇️ Report Export"],
+        key="main_tabs", on_change="rerun"
+    )
 
-        # Sales Over Time & Distribution
-        col_chart_1, col_chart_2 = st.columns(2)
-        with col_chart_1:
-            if date_col and sales_col:
-                st.plotly_chart(charts.sales_over_time(df_filtered, date_col, sales_col), use_container_width=True)
-            else:
-                st.info("⏳ Skipping Sales Over Time: Requires Date & Sales columns.")
-        with col_chart_2:
-            if sales_col:
-                st.plotly_chart(charts.sales_distribution_histogram(df_filtered, sales_col), use_container_width=True)
-            else:
-                st.info("📊 Skipping Sales Distribution.")
-
-        # Category Sales & Donut
-        col_chart_3, col_chart_4 = st.columns(2)
-        with col_chart_3:
-            if category_col and sales_col:
-                st.plotly_chart(charts.category_sales_bar(df_filtered, category_col, sales_col), use_container_width=True)
-        with col_chart_4:
-            if category_col and sales_col:
-                st.plotly_chart(charts.sales_pie_donut_chart(df_filtered, category_col, sales_col), use_container_width=True)
-
-        # 3D scatter
-        if sales_col and profit_col and category_col:
-            st.plotly_chart(charts.sales_3d_scatter(df_filtered, sales_col, profit_col, category_col), use_container_width=True)
-
-        # Drill-down
-        st.markdown("### 🔎 Drill-Down Analysis")
-        if category_col:
-            clicked_category = st.selectbox("Select a Category to drill into",
-                                            sorted(df_filtered[category_col].astype(str).unique()))
-            df_drill = df_filtered[df_filtered[category_col].astype(str) == str(clicked_category)]
-
-            product_col_candidates = [c for c in df_drill.columns if any(x in c for x in ["product", "item", "sku", "productname"])]
-            product_col = product_col_candidates[0] if product_col_candidates else None
-
-            st.subheader(f"Performance for: {clicked_category}")
-            st.write(f"Records in selection: {len(df_drill):,}")
-
-            if sales_col:
-                st.plotly_chart(charts.sales_over_time(df_drill, date_col, sales_col) if date_col else charts.sales_distribution_histogram(df_drill, sales_col), use_container_width=True)
-
-            if product_col:
-                product_summary = df_drill.groupby(product_col)[sales_col].sum().reset_index().sort_values(by=sales_col, ascending=False).head(10)
-                st.write("Top products in this category (by sales):")
-                st.dataframe(product_summary)
-
-        # ---------- Modern Geo Map ----------
-        st.markdown("### 🌍 Geo Map")
-        geo_candidates = [c for c in df_filtered.columns if any(k in c for k in ["country", "region", "location", "state", "city"])]
-        if geo_candidates and sales_col:
-            geo_col = geo_candidates[0]
-            fig_geo = charts.sales_geo_map(df_filtered, geo_col, sales_col)
-            if fig_geo:
-                st.plotly_chart(fig_geo, use_container_width=True)
+    # ---------- TAB 1: KPIs & Charts ----------
+    if tab1.open:
+        with tab1, span("tab: KPIs & Charts"):
+            st.header("Key Performance Indicators (KPIs)")
+            kpi_cols = st.columns(4)
+            kpi = ready("kpis", get_kpis)
+            kpi_labels = ["💰 Total Sales", "📈 Total Profit", "🛒 Avg. Sales per Record", "🗑️ Total Missing Cells"]
+            if kpi is PENDING and estimates:
+                # Estimates with their 95% bounds, until (or instead of) the exact KPIs
+                approx_kpis = estimate_table(memo("kpis~", lambda: estimate_kpis(estimates, sales_col, profit_col)))
+                for kpi_col, label, (value, bound) in zip(kpi_cols, kpi_labels, approx_kpis.values()):
+                    kpi_col.metric(label, value)
+                    kpi_col.caption(bound)
+            elif kpi is PENDING:
+                for kpi_col, label in zip(kpi_cols, kpi_labels):
+                    kpi_col.metric(label, "⏳")
             else:
-                st.info("🌍 Geo Map cannot be displayed.")
-        else:
-            st.info("🌍 No geographic column detected.")
+                kpis = kpi_table(kpi)
+
+                # Total Sales
+                if kpi["total_sales"] is not None:
+                    kpi_cols[0].metric("💰 Total Sales", kpis["Total Sales"])
+                else:
+                    kpi_cols[0].warning("No Sales column found")
+
+                # Total Profit
+                if kpi["total_profit"] is not None:
+                    kpi_cols[1].metric("📈 Total Profit", kpis["Total Profit"])
+                else:
+                    kpi_cols[1].warning("No Profit column found")
+
+                # Avg Sales
+                if kpi["avg_sales"] is not None:
+                    kpi_cols[2].metric("🛒 Avg. Sales per Record", kpis["Average Sales"])
+                else:
+                    kpi_cols[2].warning("No Sales column to calculate average")
+
+                # Total Missing
+                kpi_cols[3].metric("🗑️ Total Missing Cells", kpis["Total Missing Cells"])
+
+            st.markdown("---")
+            st.header("Visualizations")
+
+            # Sales Over Time & Distribution
+            col_chart_1, col_chart_2 = st.columns(2)
+            with col_chart_1:
+                if date_col and sales_col:
+                    # Period rollups are re-sliced from the cube's time series, not re-aggregated from rows
+                    freq = st.selectbox("Granularity", ["auto", *FREQ_LABELS], key="trend_freq",
+                                        format_func=lambda f: FREQ_LABELS.get(f, "Auto"))
+                    fig_time = ready("chart:time", lambda: chart_time(freq), freq)
+                    if fig_time is PENDING:
+                        computing("sales over time")
+                    else:
+                        st.plotly_chart(fig_time, use_container_width=True)
+                else:
+                    st.info("⏳ Skipping Sales Over Time: Requires Date & Sales columns.")
+            with col_chart_2:
+                if sales_col:
+                    fig_hist = ready("chart:hist", chart_hist)
+                    if fig_hist is PENDING and estimates:
+                        fig_hist = memo("chart:hist~", lambda: charts.binned_histogram(
+                            *estimates.histogram(sales_col), sales_col, title="Sales Distribution (estimated)"))
+                    if fig_hist is PENDING:
+                        computing("the sales distribution")
+                    else:
+                        st.plotly_chart(fig_hist, use_container_width=True)
+                else:
+                    st.info("📊 Skipping Sales Distribution.")
+
+            # Category Sales & Donut
+            col_chart_3, col_chart_4 = st.columns(2)
+            cat_sales = ready("category sales", get_category_sales) if category_col and sales_col else None
+            if cat_sales is PENDING:
+                computing("sales by category")
+                cat_sales = None
+            with col_chart_3:
+                if cat_sales is not None:
+                    st.plotly_chart(charts.category_sales_bar(cat_sales, category_col, sales_col), use_container_width=True)
+            with col_chart_4:
+                if cat_sales is not None:
+                    st.plotly_chart(charts.sales_pie_donut_chart(cat_sales, category_col, sales_col), use_container_width=True)
+
+            # 3D scatter: only built while its expander is open
+            if sales_col and profit_col and category_col:
+                scatter_box = st.expander("🧊 3D Scatter (Sales, Profit, Category)", key="scatter_box", on_change="rerun")
+                if scatter_box.open:
+                    with scatter_box:
+                        st.plotly_chart(chart_3d(), use_container_width=True)
+
+            # Drill-down runs as a fragment: picking another category reruns only this part
+            @st.fragment
+            def drill_down():
+                st.markdown("### 🔎 Drill-Down Analysis")
+                if not category_col:
+                    return
+                if cube_view is PENDING:
+                    computing("the aggregate cube")
+                    return
+                drill_options = cat_sales[category_col] if cat_sales is not None else category_options(df_filtered[category_col])
+                clicked_category = st.selectbox("Select a Category to drill into", sorted(drill_options))
+                df_drill = memo("drill", lambda: df_filtered[isin_mask(df_filtered[category_col], [clicked_category])],
+                                clicked_category)
+                product_col = dims["product"]
+
+                st.subheader(f"Performance for: {clicked_category}")
+                st.write(f"Records in selection: {len(df_drill):,}")
+
+                if sales_col:
+                    if date_col:
+                        drill_chart = lambda: charts.sales_trend(cube_view.narrow([clicked_category]).series(), sales_col)
+                    else:
+                        drill_chart = lambda: charts.sales_distribution_histogram(df_drill, sales_col)
+                    st.plotly_chart(memo("chart:drill", drill_chart, clicked_category),
+                                    use_container_width=True, key="drill_chart")
+
+                if product_col and cube_view:
+                    product_summary = cube_view.narrow([clicked_category]).top("product", sales_col, 10).reset_index()
+                    st.write("Top products in this category (by sales):")
+                    st.dataframe(product_summary)
+
+            drill_down()
+
+            # ---------- Modern Geo Map ----------
+            geo_col = dims["geo"]
+            geo_box = st.expander("🌍 Geo Map", key="geo_box", on_change="rerun")
+            if geo_box.open:
+                with geo_box:
+                    if geo_col and sales_col:
+                        fig_geo = ready("chart:geo", chart_geo)
+                        if fig_geo is PENDING:
+                            computing("the geo map")
+                        elif fig_geo:
+                            st.plotly_chart(fig_geo, use_container_width=True)
+                        else:
+                            st.info("🌍 Geo Map cannot be displayed.")
+                    else:
+                        st.info("🌍 No geographic column detected.")
 
     # ---------- TAB 2: Insights ----------
-    with tab_insights:
-        st.header("💡 Actionable Business Insights")
-        insights_list = generate_insights(df_filtered, sales_col, profit_col, category_col)
-        for insight in insights_list:
-            if any(w in insight.lower() for w in ["drop", "loss", "urgent", "decline", "risk"]):
-                st.warning(f"- {insight}")
+    if tab_insights.open:
+        with tab_insights, span("tab: Insights"):
+            st.header("💡 Actionable Business Insights")
+            insights_list = ready("insights", get_insights)
+            if insights_list is PENDING and estimates:
+                st.caption("Estimated from a stratified sample; ± values are 95% confidence bounds.")
+                insights_list = memo("insights~", lambda: generate_insights(
+                    df_filtered, sales_col, profit_col, category_col, cube=None if cube_view is PENDING else cube_view,
+                    date_col=date_col, sample=estimates))
+            if insights_list is PENDING:
+                computing("insights")
             else:
-                st.success(f"- {insight}")
-        if not insights_list:
-            st.info("No insights generated.")
+                for insight in insights_list:
+                    if any(w in insight.lower() for w in ["drop", "loss", "urgent", "decline", "risk"]):
+                        st.warning(f"- {insight}")
+                    else:
+                        st.success(f"- {insight}")
+                if not insights_list:
+                    st.info("No insights generated.")
 
     # ---------- TAB 3: EDA ----------
-    with tab2:
-        st.header("🔬 Exploratory Data Analysis (EDA)")
-        st.subheader("Summary Statistics")
-        st.dataframe(get_summary(df_filtered))
-
-        st.subheader("Missing Values Analysis")
-        missing_fig = missing_values_chart(df_filtered)
-        if missing_fig:
-            st.plotly_chart(missing_fig, use_container_width=True)
-        else:
-            st.info("No missing values to display.")
+    if tab2.open:
+        with tab2, span("tab: EDA"):
+            st.header("🔬 Exploratory Data Analysis (EDA)")
+            summary = ready("summary", get_summary)
+            if summary is PENDING:
+                computing("the EDA summary")
+            else:
+                profile = get_profile()
+                st.subheader("Summary Statistics")
+                if profile.approximate:
+                    st.caption(f"{profile.rows:,} rows: quartiles, distinct counts and top values are approximate.")
+                with span("st.dataframe", rows_in=len(summary)):
+                    st.dataframe(summary)
+
+                st.subheader("Missing Values Analysis")
+                missing_fig = plot_missing_values(profile.missing_table())
+                if missing_fig:
+                    st.plotly_chart(missing_fig, use_container_width=True)
+                else:
+                    st.info("No missing values to display.")
 
     # ---------- TAB 4: Data Preview ----------
-    with tab3:
-        st.header("📄 Data Preview")
-        st.dataframe(df_filtered)
+    if tab3.open:
+        with tab3, span("tab: Data Preview"):
+            st.header("📄 Data Preview")
+            # Only the visible page is sent to the browser; sort orders and search hits are memoized
+            c_search, c_sort, c_desc, c_size = st.columns([3, 2, 1, 1])
+            search = c_search.text_input("Search text columns", key="preview_search").strip()
+            sort_col = c_sort.selectbox("Sort by", [None] + list(df_filtered.columns), key="preview_sort",
+                                        format_func=lambda c: "(file order)" if c is None else c)
+            descending = c_desc.toggle("Descending", key="preview_desc")
+            page_size = c_size.selectbox("Rows per page", PAGE_SIZES, index=1, key="preview_page_size")
+
+            order = memo("order", lambda: sort_order(df_filtered[sort_col], not descending),
+                         sort_col, descending) if sort_col else None
+            mask = memo("search", lambda: search_mask(df_filtered, search), search) if search else None
+            positions = memo("positions", lambda: select_positions(len(df_filtered), order, mask),
+                             sort_col, descending, search)
+
+            n_pages = max(1, -(-len(positions) // page_size))
+            page_number = st.number_input(f"Page (of {n_pages:,})", min_value=1, max_value=n_pages, value=1,
+                                          key="preview_page")
+            first = (page_number - 1) * page_size
+            st.caption(f"Rows {min(first + 1, len(positions)):,}–{min(first + page_size, len(positions)):,} "
+                       f"of {len(positions):,}")
+            shown = page(df_filtered, positions, page_number, page_size)
+            with span("st.dataframe", rows_in=len(shown)):
+                st.dataframe(shown)
+
+            # Full filtered result, serialized in chunks only when a button is clicked
+            c_csv, c_parquet = st.columns(2)
+            c_csv.download_button("⬇️ Download CSV", data=lambda: export_file(df_filtered, "csv"),
+                                  file_name="filtered_sales.csv", mime="text/csv", on_click="ignore")
+            if PARQUET_AVAILABLE:
+                c_parquet.download_button("⬇️ Download Parquet", data=lambda: export_file(df_filtered, "parquet"),
+                                          file_name="filtered_sales.parquet",
+                                          mime="application/vnd.apache.parquet", on_click="ignore")
 
     # ---------- TAB 5: Report Export ----------
-    with tab4:
-        st.header("⬇️ Export Report")
-        if st.button("Generate PDF Report"):
-            filename = export_report(kpis)
-            st.success(f"Report generated: {filename}")
+    if tab4.open:
+        with tab4, span("tab: Report Export"):
+            st.header("⬇️ Export Report")
+            include_charts = st.toggle("Include charts", value=True, key="report_charts")
+
+            def report_figures():
+                figures = {}
+                if date_col and sales_col:
+                    figures["Sales over time"] = chart_time()
+                if sales_col:
+                    figures["Sales distribution"] = chart_hist()
+                if category_col and sales_col:
+                    cat_sales = get_category_sales()
+                    figures["Sales by category"] = charts.category_sales_bar(cat_sales, category_col, sales_col)
+                    figures["Sales share by category"] = charts.sales_pie_donut_chart(cat_sales, category_col, sales_col)
+                if sales_col and profit_col and category_col:
+                    figures["Sales vs profit by category"] = chart_3d()
+                fig_geo = chart_geo() if dims["geo"] and sales_col else None
+                if fig_geo:
+                    figures["Sales by region"] = fig_geo
+                missing_fig = plot_missing_values(get_profile().missing_table())
+                if missing_fig:
+                    figures["Missing values"] = missing_fig
+                return figures
+
+            def report_pdf():
+                # Charts are rasterized in parallel worker processes; images are cached per chart
+                images = rasterize_charts(report_figures(), cache=dataset_cache, key=make_key(*view_key)) \
+                    if include_charts else None
+                return build_report(kpi_table(get_kpis()), insights=get_insights(), charts=images)
+
+            # Built in memory only when clicked, and memoized per dataset + filter state
+            st.download_button("⬇️ Download PDF Report", data=lambda: memo("report", report_pdf, include_charts),
+                               file_name="sales_report.pdf", mime="application/pdf", on_click="ignore")
+
+    # Poll the background jobs: progress in the sidebar, and a rerun as soon as a result
+    # this page is waiting for is cached
+    if pending or not all(f.done() for f in warming.values()):
+        @st.fragment(run_every=1.0)
+        def warm_progress():
+            if any(f.done() for f in pending):
+                st.rerun()
+            done, total, running = precomputer.progress(session_owner)
+            if done < total:
+                st.progress(done / total, text=f"⏳ Precomputing {running or 'results'} ({done}/{total})")
+                if estimates is not None and refine_exact:
+                    st.caption("Showing estimates while exact results are computed in the background...")
+
+        with warm_status:
+            warm_progress()
+
+    show_perf()
 
 else:
+    precomputer.cancel(session_owner)
+    release_leases()
     st.info("📌 Please upload a CSV or Excel file to see the dashboard.")
@@ -0,0 +1,104 @@
+# tests/test_append.py
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.append import append_key, append_upload
+from utils.approx import build_sample
+from utils.cache import LRUCache, make_key
+from utils.cube import build_cube
+from utils.filters import FilterIndex, _SortedColumn
+from utils.pipeline import prepare_dataset, read_upload
+from utils.synthetic import make_superstore
+
+
+def _rows(n, start, seed, cats=("Furniture", "Technology")):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "orderdate": pd.Timestamp(start) + pd.to_timedelta(np.sort(rng.integers(0, 60 * 24, n)), unit="h"),
+        "category": rng.choice(list(cats), n).astype(object),
+        "sales": rng.uniform(1, 100, n).round(2),
+    })
+
+
+@pytest.mark.parametrize("values, more", [
+    (np.array([5.0, 1.0, 3.0, 3.0, 9.0]), np.array([3.0, 0.5, 10.0, 3.0])),
+    (np.arange(6.0), np.arange(6.0, 10.0)),
+    (np.arange(6.0), np.array([2.0, 1.0])),
+])
+def test_sorted_column_extend_equals_a_fresh_build(values, more):
+    extended, fresh = _SortedColumn(values).extend(more), _SortedColumn(np.concatenate([values, more]))
+    np.testing.assert_array_equal(extended.sorted, fresh.sorted)
+    assert (extended.order is None) == (fresh.order is None)
+    if fresh.order is not None:
+        np.testing.assert_array_equal(extended.order, fresh.order)
+
+
+def test_filter_index_extend_equals_a_fresh_build():
+    base = _rows(300, "2024-01-01", 0)
+    delta = _rows(80, "2024-02-15", 1, cats=("Technology", "Services"))
+    delta.loc[[3, 7], "category"] = np.nan
+    extended = FilterIndex(base, "orderdate", "category", "sales").extend(delta)
+    fresh = FilterIndex(pd.concat([base, delta], ignore_index=True), "orderdate", "category", "sales")
+
+    assert extended.category_options() == fresh.category_options()
+    for args in [(), ((pd.Timestamp("2024-02-20"), pd.Timestamp("2024-03-10")),), (None, ["Services", "nan"]),
+                 (None, ["Technology"], (20.0, 60.0)), ((pd.Timestamp("2024-01-05"), pd.Timestamp("2024-02-25")),
+                                                       ["Furniture", "Services"], (10.0, 90.0))]:
+        got, want = extended.select(*args), fresh.select(*args)
+        np.testing.assert_array_equal(np.arange(extended.rows)[got], np.arange(fresh.rows)[want])
+
+
+def test_appended_cube_equals_a_rebuilt_cube():
+    col_info = {"Sales Column": ("sales", 1.0, ""), "Profit Column": (None, 0.0, ""),
+                "Category Column": ("category", 1.0, ""), "Date Column": ("orderdate", 1.0, "")}
+    base = _rows(300, "2024-01-01", 0)
+    delta = _rows(80, "2024-02-15", 1, cats=("Technology", "Services"))
+    appended = build_cube(base, col_info).append(delta)
+    rebuilt = build_cube(pd.concat([base, delta], ignore_index=True), col_info)
+
+    assert appended.rows == rebuilt.rows
+    for date_range in [None, (pd.Timestamp("2024-02-10"), pd.Timestamp("2024-02-20"))]:
+        a, r = appended.slice(date_range), rebuilt.slice(date_range)
+        assert a.totals() == pytest.approx(r.totals())
+        pd.testing.assert_frame_equal(a.sums("category", "sales").sort_values("category", ignore_index=True),
+                                      r.sums("category", "sales").sort_values("category", ignore_index=True),
+                                      check_dtype=False, check_categorical=False)
+    pd.testing.assert_frame_equal(appended.timeseries.series("W"), rebuilt.timeseries.series("W"))
+
+
+def _csv(df) -> bytes:
+    out = io.StringIO()
+    df.to_csv(out, index=False)
+    return out.getvalue().encode()
+
+
+def test_append_upload_skips_duplicates_and_carries_aggregates_over():
+    raw = make_superstore(500, days=200, missing_rate=0.02, seed=0)
+    df_base, col_info, column_types = prepare_dataset(read_upload(_csv(raw), "base.csv"))
+    new = make_superstore(40, start="2014-07-25", days=30, seed=1)
+    new["Row ID"] += 10_000
+    # 25 rows already in the base, and one new row twice (cleaning drops that copy)
+    delta = _csv(pd.concat([new, new.iloc[:1], raw.iloc[100:125]], ignore_index=True))
+
+    cache = LRUCache(max_bytes=200_000_000)
+    cache.put(make_key("cube", "base"), build_cube(df_base, col_info))
+    cache.put(make_key("sample", "base"), build_sample(df_base, col_info))
+    result = append_upload(df_base, "base", "delta.csv", delta, col_info, column_types, cache=cache)
+
+    assert (result.added, result.duplicates) == (40, 25)
+    assert len(result.df) == len(df_base) + 40
+    new_key = append_key("base", delta)
+    pd.testing.assert_series_equal(cache.get(make_key("missing", new_key)), result.df.isna().sum(),
+                                   check_dtype=False)
+    rebuilt = build_cube(result.df, col_info)
+    assert cache.get(make_key("cube", new_key)).slice().totals() == pytest.approx(rebuilt.slice().totals())
+    sample, base_sample = cache.get(make_key("sample", new_key)), cache.get(make_key("sample", "base"))
+    assert sample.rows == len(result.df) and base_sample.rows == len(df_base)
+    assert sample._rng is not base_sample._rng
+
+    # The same delta again adds nothing
+    again = append_upload(result.df, new_key, "delta.csv", delta, col_info, column_types, cache=cache)
+    assert (again.added, again.duplicates) == (0, 65)
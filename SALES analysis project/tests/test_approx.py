@@ -0,0 +1,38 @@
+# tests/test_approx.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.approx import build_sample
+from utils.filters import filter_frame
+
+COL_INFO = {"Sales Column": ("sales", 1.0, ""), "Profit Column": (None, 0.0, ""),
+            "Category Column": ("category", 1.0, ""), "Date Column": ("orderdate", 1.0, "")}
+
+
+def _frame(n=2_000, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "orderdate": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 200, n), unit="D"),
+        "category": rng.choice(["Furniture", "Technology", "Office Supplies"], n).astype(object),
+        "sales": rng.uniform(1, 500, n).round(2),
+    })
+    df.loc[df.index[::10], "category"] = np.nan
+    return df
+
+
+@pytest.mark.parametrize("categories", [None, []])
+def test_no_category_selection_means_every_category(categories):
+    df = _frame()
+    # Every row is kept when the sample is as large as the data, so the estimates are exact
+    view = build_sample(df, COL_INFO, per_stratum=len(df)).view(None, categories, None)
+    assert view.total("sales").value == pytest.approx(df["sales"].sum())
+    assert view.count().value == pytest.approx(len(df))
+
+
+@pytest.mark.parametrize("categories", [["nan"], ["Technology", "nan"], ["Furniture"]])
+def test_category_selection_matches_the_row_filter(categories):
+    df = _frame()
+    view = build_sample(df, COL_INFO, per_stratum=len(df)).view(None, categories, None)
+    rows = filter_frame(df, category_col="category", categories=categories)
+    assert view.total("sales").value == pytest.approx(rows["sales"].sum())
@@ -0,0 +1,62 @@
+# tests/test_cache.py
+import pandas as pd
+
+from utils.cache import LRUCache, content_hash, make_key
+
+
+def test_make_key_is_stable_and_order_sensitive():
+    assert make_key("rows", "abc", (1, 2)) == make_key("rows", "abc", (1, 2))
+    assert make_key("rows", "abc") != make_key("abc", "rows")
+    assert make_key({"b": 1, "a": 2}) == make_key({"a": 2, "b": 1})
+
+
+def test_content_hash_depends_on_bytes_only():
+    assert content_hash(b"a,b\n1,2\n") == content_hash(b"a,b\n1,2\n")
+    assert content_hash(b"a,b\n1,2\n") != content_hash(b"a,b\n1,3\n")
+
+
+def test_least_recently_used_entry_is_evicted_first():
+    cache = LRUCache(max_bytes=30)
+    cache.put("a", "x", size=10)
+    cache.put("b", "y", size=10)
+    cache.put("c", "z", size=10)
+    cache.get("a")
+    cache.put("d", "w", size=10)
+    assert "b" not in cache
+    assert all(k in cache for k in ("a", "c", "d"))
+    assert cache.total_bytes == 30
+
+
+def test_max_entries_and_oversized_values():
+    cache = LRUCache(max_bytes=100, max_entries=2)
+    for key in "abc":
+        cache.put(key, key, size=1)
+    assert len(cache) == 2 and "a" not in cache
+    cache.put("big", "v", size=101)
+    assert "big" not in cache
+
+
+def test_replacing_a_key_updates_the_size():
+    cache = LRUCache(max_bytes=100)
+    cache.put("a", "x", size=40)
+    cache.put("a", "y", size=10)
+    assert cache.get("a") == "y"
+    assert cache.total_bytes == 10
+
+
+def test_get_or_compute_calls_fn_once_and_counts_hits():
+    cache = LRUCache(max_bytes=10 ** 6)
+    calls = []
+    compute = lambda: calls.append(1) or pd.DataFrame({"x": [1, 2, 3]})
+    first = cache.get_or_compute("k", compute)
+    second = cache.get_or_compute("k", compute)
+    assert first is second and len(calls) == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_none_is_a_cacheable_result():
+    cache = LRUCache(max_bytes=1000)
+    calls = []
+    for _ in range(2):
+        cache.get_or_compute("k", lambda: calls.append(1))
+    assert len(calls) == 1
@@ -0,0 +1,74 @@
+# tests/test_cube.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.cube import build_cube
+from utils.filters import FilterIndex, filter_frame, take
+
+COL_INFO = {"Sales Column": ("sales", 1.0, ""), "Profit Column": ("profit", 1.0, ""),
+            "Category Column": ("category", 1.0, ""), "Date Column": ("orderdate", 1.0, "")}
+
+
+def _frame(freq="6h", periods=400, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "orderdate": pd.date_range("2024-01-01", periods=periods, freq=freq),
+        "category": pd.Categorical(rng.choice(["Furniture", "Technology", "Office Supplies"], periods)),
+        "region": rng.choice(["East", "West"], periods),
+        "customerid": rng.choice([f"C{i}" for i in range(20)], periods),
+        "sales": rng.integers(1, 100, periods).astype(float),
+        "profit": rng.integers(-20, 40, periods).astype(float),
+    })
+
+
+@pytest.mark.parametrize("date_range", [
+    (pd.Timestamp("2024-01-10"), pd.Timestamp("2024-01-20")),
+    (pd.Timestamp("2024-01-01"), pd.Timestamp("2024-01-01")),
+    (pd.Timestamp("2024-02-01"), pd.Timestamp("2024-03-31")),
+])
+@pytest.mark.parametrize("categories", [None, ["Technology"], ["Furniture", "Office Supplies"]])
+def test_cube_slice_matches_the_row_filters(date_range, categories):
+    df = _frame()
+    rows = filter_frame(df, "orderdate", date_range, "category", categories)
+    index = FilterIndex(df, "orderdate", "category", "sales")
+    indexed = take(df, index.select(date_range, categories))
+    cube_view = build_cube(df, COL_INFO).slice(date_range, categories)
+
+    pd.testing.assert_frame_equal(indexed.reset_index(drop=True), rows.reset_index(drop=True))
+    totals = cube_view.totals()
+    assert totals["sales__sum"] == pytest.approx(rows["sales"].sum())
+    assert totals["profit__sum"] == pytest.approx(rows["profit"].sum())
+    by_region = cube_view.sums("geo", "sales").set_index("region")["sales"]
+    pd.testing.assert_series_equal(by_region.sort_index(), rows.groupby("region")["sales"].sum().sort_index(),
+                                   check_names=False)
+
+
+def test_end_date_includes_the_whole_day():
+    df = _frame()
+    rows = filter_frame(df, "orderdate", (pd.Timestamp("2024-01-10"), pd.Timestamp("2024-01-20")))
+    assert rows["orderdate"].max() == pd.Timestamp("2024-01-20 18:00")
+    assert rows["orderdate"].min() == pd.Timestamp("2024-01-10")
+
+
+def test_cube_totals_and_rankings_match_a_groupby():
+    df = _frame(freq="D", periods=300, seed=1)
+    cube = build_cube(df, COL_INFO).slice()
+    assert cube.totals()["sales__sum"] == pytest.approx(df["sales"].sum())
+    expected = df.groupby("customerid")["sales"].sum().nlargest(5)
+    top = cube.top("customer", "sales", 5)
+    assert list(top.index) == list(expected.index)
+
+
+@pytest.mark.parametrize("dtype", ["category", object])
+@pytest.mark.parametrize("categories", [["Furniture", "Office Supplies", "Technology", "nan"], ["nan"],
+                                        ["Technology"]])
+def test_cube_slice_matches_the_index_with_missing_categories(dtype, categories):
+    df = _frame()
+    df["category"] = df["category"].astype(object)
+    df.loc[df.index[::5], "category"] = np.nan
+    df["category"] = df["category"].astype(dtype)
+    rows = take(df, FilterIndex(df, "orderdate", "category", "sales").select(None, categories))
+    totals = build_cube(df, COL_INFO).slice(None, categories).totals()
+    assert totals["sales__sum"] == pytest.approx(rows["sales"].sum())
+    assert totals["sales__count"] == len(rows)
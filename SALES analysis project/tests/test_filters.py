@@ -0,0 +1,62 @@
+# tests/test_filters.py
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.filters import FilterIndex, filter_frame, isin_mask, selection_size, take
+
+
+def _frame(n=2_000, seed=0, categorical=True):
+    rng = np.random.default_rng(seed)
+    category = rng.choice(["Furniture", "Technology", "Office Supplies", None], n, p=[0.4, 0.3, 0.25, 0.05])
+    category = pd.Series(category).fillna(np.nan)  # cleaned frames hold missing text as NaN ("nan")
+    df = pd.DataFrame({
+        "orderdate": pd.Timestamp("2023-01-01") + pd.to_timedelta(np.sort(rng.integers(0, 500 * 24, n)), unit="h"),
+        "category": pd.Categorical(category) if categorical else category,
+        "sales": np.where(rng.random(n) < 0.02, np.nan, rng.gamma(2, 100, n).round(2)),
+    })
+    return df
+
+
+DATE_RANGES = [None, (pd.Timestamp("2023-03-01"), pd.Timestamp("2023-06-30")),
+               (pd.Timestamp("2023-05-05"), pd.Timestamp("2023-05-05")), (pd.Timestamp("2030-01-01"), pd.Timestamp("2030-02-01"))]
+CATEGORIES = [None, ["Technology"], ["Furniture", "nan"], ["Office Supplies", "Technology", "Furniture"]]
+SALES_RANGES = [None, (50.0, 250.0), (0.0, 10_000.0)]
+
+
+@pytest.mark.parametrize("categorical", [True, False])
+def test_select_matches_filter_frame(categorical):
+    df = _frame(categorical=categorical)
+    index = FilterIndex(df, "orderdate", "category", "sales")
+    for date_range, categories, sales_range in itertools.product(DATE_RANGES, CATEGORIES, SALES_RANGES):
+        selection = index.select(date_range, categories, sales_range)
+        expected = filter_frame(df, "orderdate", date_range, "category", categories, "sales", sales_range)
+        assert selection_size(selection) == len(expected)
+        pd.testing.assert_frame_equal(take(df, selection).reset_index(drop=True), expected.reset_index(drop=True))
+
+
+def test_date_only_selection_is_a_slice_of_the_sorted_frame():
+    df = _frame()
+    index = FilterIndex(df, "orderdate", "category", "sales")
+    assert isinstance(index.select(DATE_RANGES[1]), slice)
+    assert index.select() == slice(0, len(df))
+
+
+def test_unsorted_dates_still_match():
+    df = _frame().sample(frac=1, random_state=3).reset_index(drop=True)
+    index = FilterIndex(df, "orderdate", "category", "sales")
+    selection = index.select(DATE_RANGES[1], ["Technology"])
+    expected = filter_frame(df, "orderdate", DATE_RANGES[1], "category", ["Technology"])
+    pd.testing.assert_frame_equal(take(df, selection).reset_index(drop=True), expected.reset_index(drop=True))
+
+
+def test_bounds_and_options_follow_the_selection():
+    df = _frame()
+    index = FilterIndex(df, "orderdate", "category", "sales")
+    selection = index.select(categories=["Technology"])
+    tech = df[isin_mask(df["category"], ["Technology"])]
+    assert index.sales_bounds(selection) == (tech["sales"].min(), tech["sales"].max())
+    assert index.category_options(selection) == ["Technology"]
+    assert index.date_bounds() == (df["orderdate"].min(), df["orderdate"].max())
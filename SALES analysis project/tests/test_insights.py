@@ -0,0 +1,22 @@
+# tests/test_insights.py
+import pandas as pd
+
+from utils.insights import _separated
+
+
+def _ranking(values, errors):
+    return pd.DataFrame({"value": values, "error": errors}, index=[f"C{i}" for i in range(len(values))])
+
+
+def test_ranks_are_kept_while_intervals_stay_apart():
+    top = _ranking([100, 80, 60, 58, 30, 10], [5, 5, 5, 5, 5, 5])
+    assert list(_separated(top, 5).index) == ["C0", "C1"]
+
+
+def test_overlapping_leader_gives_no_estimated_ranking():
+    assert _separated(_ranking([100, 98, 50], [5, 5, 5]), 5).empty
+
+
+def test_all_groups_listed_when_fewer_than_shown():
+    assert list(_separated(_ranking([100, 50, 10], [5, 5, 5]), 5).index) == ["C0", "C1", "C2"]
+    assert list(_separated(_ranking([100, 80, 60, 40, 20, 1], [1] * 6), 5).index) == ["C0", "C1", "C2", "C3", "C4"]
@@ -0,0 +1,66 @@
+# tests/test_parquet_store.py
+import os
+
+import pandas as pd
+import pytest
+
+from utils.parquet_store import PARQUET_AVAILABLE, dataset_path, open_dataset, prune_store, write_dataset
+
+pytestmark = pytest.mark.skipif(not PARQUET_AVAILABLE, reason="pyarrow is not installed")
+
+COL_INFO = {"Sales Column": ("sales", 1.0, ""), "Profit Column": (None, 0.0, ""),
+            "Category Column": ("category", 1.0, ""), "Date Column": ("date", 1.0, "")}
+
+
+def _frame(n=200):
+    return pd.DataFrame({"date": pd.date_range("2024-01-01", periods=n, freq="D"),
+                         "category": ["A", "B"] * (n // 2), "sales": range(n)})
+
+
+def test_read_pushes_filters_down(tmp_path):
+    dataset = write_dataset(_frame(), "k", COL_INFO, {}, store_dir=str(tmp_path))
+    df = dataset.read(date_range=(pd.Timestamp("2024-01-10"), pd.Timestamp("2024-01-19")), categories=["A"])
+    assert len(df) == 5 and set(df["category"]) == {"A"}
+    assert open_dataset("k", str(tmp_path)).stats["rows"] == 200
+    assert open_dataset("missing", str(tmp_path)) is None
+
+
+def test_read_includes_the_whole_end_day(tmp_path):
+    df = pd.DataFrame({"date": pd.date_range("2024-01-01", periods=100, freq="6h"),
+                       "category": ["A", "B"] * 50, "sales": range(100)})
+    dataset = write_dataset(df, "timed", COL_INFO, {}, store_dir=str(tmp_path))
+    df_read = dataset.read(date_range=(pd.Timestamp("2024-01-02"), pd.Timestamp("2024-01-03")))
+    assert len(df_read) == 8 and df_read["date"].max() == pd.Timestamp("2024-01-03 18:00")
+
+
+def test_prune_deletes_least_recently_opened_first(tmp_path):
+    store = str(tmp_path)
+    for i, key in enumerate("abc"):
+        write_dataset(_frame(), key, COL_INFO, {}, store_dir=store)
+        os.utime(dataset_path(key, store), (1000 + i, 1000 + i))
+    open_dataset("a", store)  # now the most recently used
+    size = os.path.getsize(dataset_path("a", store))
+    deleted = prune_store(store, max_bytes=2 * size + 100)
+    assert deleted == [dataset_path("b", store)]
+    assert open_dataset("a", store) is not None and open_dataset("c", store) is not None
+
+
+def test_prune_keeps_the_dataset_just_written(tmp_path):
+    store = str(tmp_path)
+    write_dataset(_frame(), "old", COL_INFO, {}, store_dir=store)
+    assert prune_store(store, max_bytes=0, keep=(dataset_path("old", store),)) == []
+    assert prune_store(store, max_bytes=0) == [dataset_path("old", store)]
+
+
+@pytest.mark.parametrize("dtype", [object, "category"])
+def test_read_keeps_rows_with_a_missing_category(tmp_path, dtype):
+    df = _frame(40)
+    df.loc[df.index[::4], "category"] = None
+    df["category"] = df["category"].astype(dtype)
+    dataset = write_dataset(df, "gaps", COL_INFO, {}, store_dir=str(tmp_path))
+    categories = dataset.stats["categories"]
+    assert "nan" in categories
+    assert len(dataset.read(categories=categories)) == 40
+    assert len(dataset.read(categories=["nan"])) == 10
+    assert len(dataset.read(categories=["A"], sales_range=(0, 39))) == 10
+    assert dataset.read(categories=["nan", "B"], sales_range=(0, 19))["category"].isna().sum() == 5
@@ -0,0 +1,63 @@
+# tests/test_precompute.py
+import gc
+import threading
+import weakref
+
+from utils.precompute import Precomputer
+
+
+def _wait(futures):
+    for future in futures:
+        future.exception(timeout=10)
+
+
+def test_jobs_run_by_priority_and_outdated_ones_are_cancelled():
+    pre, order, gate = Precomputer(), [], threading.Event()
+    pre.submit("gate", gate.wait, priority=-1)
+    batch = pre.schedule("a", [(key, lambda key=key: order.append(key), priority, key)
+                               for key, priority in [("c", 2), ("a", 0), ("b", 1)]])
+    pre.schedule("a", [("b", lambda: order.append("b"), 1, "b"), ("a", lambda: order.append("a"), 0, "a")])
+    assert batch["c"].cancelled()
+    gate.set()
+    _wait([batch["a"], batch["b"]])
+    assert order == ["a", "b"]
+    assert pre.progress("a")[:2] == (2, 2)
+
+
+def test_failed_jobs_are_kept_only_while_a_batch_holds_them():
+    pre = Precomputer()
+
+    def fail():
+        raise ValueError("no data")
+    future = pre.schedule("a", [("k", fail, 0, "k")])["k"]
+    _wait([future])
+    assert isinstance(future.exception(), ValueError) and future.exception().__traceback__ is None
+    # Still in the owner's batch: the same Future comes back instead of a retry
+    assert pre.schedule("a", [("k", fail, 0, "k")])["k"] is future
+    pre.cancel("a")
+    assert not pre._jobs and not pre._batches
+
+
+def test_finished_jobs_release_their_closures():
+    pre = Precomputer()
+
+    class Payload:
+        pass
+    payload = Payload()
+    ref = weakref.ref(payload)
+    future = pre.submit("k", lambda payload=payload: None)
+    _wait([future])
+    del payload
+    gc.collect()
+    assert ref() is None and not pre._jobs
+
+
+def test_batches_of_dropped_owner_tokens_are_cancelled():
+    pre, gate = Precomputer(), threading.Event()
+    pre.submit("gate", gate.wait, priority=-1)
+    token = pre.owner()
+    future = pre.schedule(token.key, [("k", lambda: None, 0, "k")])["k"]
+    del token
+    gc.collect()
+    assert future.cancelled() and not pre._batches and "k" not in pre._jobs
+    gate.set()
@@ -0,0 +1,40 @@
+# tests/test_preview.py
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.preview import export_file, page, search_mask, select_positions, sort_order
+
+
+def _frame(n=250):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({"category": pd.Categorical(rng.choice(["Furniture", "Technology"], n)),
+                         "product": [f"Item {i}" for i in range(n)],
+                         "sales": rng.uniform(0, 100, n).round(2)})
+
+
+def test_csv_export_in_chunks_matches_to_csv():
+    df = _frame()
+    data = export_file(df, "csv", chunk_rows=40)
+    assert isinstance(data, bytes)
+    assert data == df.to_csv(index=False).encode("utf-8")
+
+
+def test_parquet_export_round_trips():
+    pytest.importorskip("pyarrow")
+    df = _frame()
+    out = pd.read_parquet(io.BytesIO(export_file(df, "parquet", chunk_rows=40)))
+    pd.testing.assert_frame_equal(out, df, check_categorical=False)
+
+
+def test_sorted_search_pages():
+    df = _frame()
+    order = sort_order(df["sales"], ascending=False)
+    mask = search_mask(df, "item 1")
+    positions = select_positions(len(df), order, mask)
+    shown = page(df, positions, 1, 10)
+    assert shown["product"].str.startswith("Item 1").all()
+    assert shown["sales"].is_monotonic_decreasing
+    assert len(positions) == int(df["product"].str.startswith("Item 1").sum())
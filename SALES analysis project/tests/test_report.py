@@ -0,0 +1,21 @@
+# tests/test_report.py
+import plotly.graph_objects as go
+
+from utils import report
+from utils.cache import LRUCache
+
+
+def _figures():
+    return {"Bars": go.Figure(go.Bar(x=["a", "b"], y=[1, 2])),
+            "Line": go.Figure(go.Scatter(x=[1, 2, 3], y=[3, 1, 2], mode="lines"))}
+
+
+def test_exports_share_one_pool_and_cache_pngs():
+    cache = LRUCache(max_bytes=10_000_000)
+    first = report.rasterize_charts(_figures(), cache=cache, key="k", max_workers=2)
+    pool = report._pool
+    assert pool is not None
+    assert all(png.startswith(b"\x89PNG") for png in first.values())
+    report.rasterize_charts(_figures(), key="other", max_workers=2)
+    assert report._pool is pool
+    assert report.rasterize_charts(_figures(), cache=cache, key="k", max_workers=2) == first
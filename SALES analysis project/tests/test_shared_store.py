@@ -0,0 +1,38 @@
+# tests/test_shared_store.py
+import os
+import subprocess
+import sys
+
+import pandas as pd
+import pytest
+
+from utils.shared_store import SHARED_STORE_AVAILABLE, DatasetRegistry
+
+pytestmark = pytest.mark.skipif(not SHARED_STORE_AVAILABLE, reason="pyarrow is not installed")
+
+
+def _build():
+    return pd.DataFrame({"sales": [1.0, 2.0, 3.0]}), {"Sales Column": ("sales", 1.0, "")}, {}
+
+
+def _dead_pid() -> int:
+    child = subprocess.Popen([sys.executable, "-c", "pass"])
+    child.wait()
+    return child.pid
+
+
+def test_start_up_sweeps_files_of_finished_processes(tmp_path):
+    store = tmp_path / "shared"
+    dead, live = store / str(_dead_pid()), store / str(os.getppid())
+    for folder in (dead, live):
+        folder.mkdir(parents=True)
+        (folder / "k.arrow").write_bytes(b"x")
+    (store / "loose.arrow").write_bytes(b"x")
+
+    registry = DatasetRegistry(str(store))
+    assert not dead.exists() and not (store / "loose.arrow").exists()
+    assert (live / "k.arrow").exists()
+
+    lease = registry.acquire("k", _build)
+    assert lease.df["sales"].sum() == 6
+    assert os.path.exists(os.path.join(store, str(os.getpid()), "k.arrow"))
@@ -0,0 +1,51 @@
+# tests/test_sketches.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.sketches import HeavyHitters, HyperLogLog, QuantileSketch
+
+
+def test_quantiles_are_within_the_relative_accuracy():
+    rng = np.random.default_rng(0)
+    values = np.concatenate([rng.lognormal(3, 1, 20_000), -rng.lognormal(1, 0.5, 2_000), np.zeros(500)])
+    sketch = QuantileSketch(relative_accuracy=0.01)
+    for chunk in np.array_split(rng.permutation(values), 7):
+        sketch.update(chunk)
+    assert sketch.count == len(values)
+    for q in (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99):
+        exact = np.quantile(values, q, method="lower")
+        assert sketch.quantile(q) == pytest.approx(exact, rel=0.011, abs=1e-9)
+
+
+def test_quantile_of_an_empty_sketch_is_nan():
+    sketch = QuantileSketch()
+    sketch.update([np.nan, np.inf])
+    assert sketch.count == 0 and np.isnan(sketch.quantile(0.5))
+
+
+@pytest.mark.parametrize("n", [10, 1_000, 50_000])
+def test_distinct_count_estimate(n):
+    hll = HyperLogLog(p=12)
+    values = pd.Series([f"customer-{i}" for i in range(n)])
+    hll.update(values)
+    hll.update(values.sample(frac=0.5, random_state=0))  # repeats do not count again
+    hll.update([None])
+    assert hll.estimate() == pytest.approx(n, rel=0.05)
+
+
+def test_heavy_hitters_keep_every_frequent_value():
+    rng = np.random.default_rng(1)
+    frequent = {"A": 5_000, "B": 3_000, "C": 2_000}
+    values = np.concatenate([np.repeat(list(frequent), list(frequent.values())),
+                             [f"rare-{i}" for i in rng.integers(0, 5_000, 10_000)]])
+    rng.shuffle(values)
+    hh = HeavyHitters(k=20)
+    for chunk in np.array_split(values, 9):
+        hh.update(chunk)
+    bound = len(values) / (hh.k + 1)
+    top = dict(hh.top(3))
+    assert list(top) == ["A", "B", "C"]
+    for value, count in frequent.items():
+        assert count - bound <= top[value] <= count
+    assert len(hh.counts) <= hh.k
@@ -0,0 +1,64 @@
+# tests/test_streaming.py
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.streaming import StreamingHistogram, stream_csv
+
+
+def test_histogram_counts_every_finite_value_once():
+    rng = np.random.default_rng(1)
+    hist = StreamingHistogram(nbins=30)
+    chunks = [rng.normal(100, 5, 500), rng.normal(-300, 50, 500), [np.nan, np.inf], rng.uniform(0, 5000, 500)]
+    for chunk in chunks:
+        hist.update(chunk)
+    values = np.concatenate([np.asarray(c, dtype=float) for c in chunks])
+    values = values[np.isfinite(values)]
+    assert hist.counts.sum() == len(values)
+    assert hist.edges[0] <= values.min() and hist.edges[-1] >= values.max()
+    assert len(hist.edges) == hist.nbins + 1
+
+
+def test_growing_the_range_matches_a_histogram_of_all_values():
+    # Integer values and a unit starting width keep every bin edge exact
+    hist = StreamingHistogram(nbins=8)
+    chunks = [np.arange(0, 8), np.array([-20.0, -3.5]), np.array([50.0, 7.25, 31.0])]
+    for chunk in chunks:
+        hist.update(chunk)
+    expected, _ = np.histogram(np.concatenate(chunks), bins=hist.edges)
+    np.testing.assert_array_equal(hist.counts, expected)
+
+
+def test_empty_updates_leave_the_histogram_empty():
+    hist = StreamingHistogram()
+    hist.update([])
+    hist.update([np.nan])
+    assert hist.counts.sum() == 0 and len(hist.edges) == 0
+
+
+def _csv(df):
+    return io.BytesIO(df.to_csv(index=False).encode("latin1"))
+
+
+def test_stream_csv_totals_match_the_whole_file():
+    rng = np.random.default_rng(2)
+    df = pd.DataFrame({
+        "Order Date": pd.date_range("2023-01-01", periods=1000, freq="h").strftime("%Y-%m-%d %H:%M"),
+        "Category": rng.choice(["Furniture", "Technology", "Office Supplies"], 1000),
+        "Sales": rng.uniform(1, 500, 1000).round(2),
+        "Profit": rng.normal(10, 30, 1000).round(2),
+    })
+    agg, col_info, _ = stream_csv(_csv(df), chunksize=128)
+    assert agg.rows == len(df)
+    kpi = agg.kpis()
+    assert kpi["total_sales"] == pytest.approx(df["Sales"].sum())
+    assert kpi["total_profit"] == pytest.approx(df["Profit"].sum())
+    assert agg.histogram.counts.sum() == len(df)
+    assert agg.category_sums.iloc[:, 0].sum() == pytest.approx(df["Sales"].sum())
+
+
+def test_stream_csv_without_data_rows_raises():
+    with pytest.raises(ValueError, match="No data rows"):
+        stream_csv(io.BytesIO(b"Order Date,Category,Sales,Profit\n"))
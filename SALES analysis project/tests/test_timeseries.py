@@ -0,0 +1,86 @@
+# tests/test_timeseries.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.timeseries import TimeSeries
+
+PERIOD = {"D": "D", "W": "W-MON", "MS": "MS", "QS": "QS"}
+
+
+def _frame(n=3_000, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "orderdate": pd.Timestamp("2022-01-03") + pd.to_timedelta(rng.integers(0, 900 * 24, n), unit="h"),
+        "category": rng.choice(["Furniture", "Technology", "Office Supplies"], n),
+        "sales": rng.uniform(1, 500, n).round(2),
+        "profit": rng.normal(10, 40, n).round(2),
+    })
+
+
+def _expected(df, freq, date_range=None, categories=None):
+    if date_range:
+        end = date_range[1] + pd.Timedelta(days=1)
+        df = df[(df["orderdate"] >= date_range[0]) & (df["orderdate"] < end)]
+    if categories:
+        df = df[df["category"].isin(categories)]
+    days = df["orderdate"].dt.normalize()
+    if freq == "W":
+        starts = days - pd.to_timedelta(days.dt.dayofweek, unit="D")
+    elif freq in ("MS", "QS"):
+        starts = days.dt.to_period("M" if freq == "MS" else "Q").dt.start_time
+    else:
+        starts = days
+    return df.groupby(starts)[["sales", "profit"]].sum()
+
+
+@pytest.mark.parametrize("freq", ["D", "W", "MS", "QS"])
+@pytest.mark.parametrize("date_range", [None, (pd.Timestamp("2022-05-17"), pd.Timestamp("2023-02-09"))])
+@pytest.mark.parametrize("categories", [None, ["Technology", "Furniture"]])
+def test_period_sums_match_a_groupby(freq, date_range, categories):
+    df = _frame()
+    ts = TimeSeries.from_frame(df, "orderdate", ["sales", "profit"], "category")
+    out = ts.series(freq, date_range, categories)
+    expected = _expected(df, freq, date_range, categories)
+    got = out.loc[out["records"] > 0, ["sales", "profit"]]
+    pd.testing.assert_frame_equal(got, expected, check_names=False, check_freq=False, rtol=1e-9)
+    assert out["records"].sum() == len(_expected_rows(df, date_range, categories))
+
+
+def _expected_rows(df, date_range, categories):
+    if date_range:
+        df = df[(df["orderdate"] >= date_range[0]) & (df["orderdate"] < date_range[1] + pd.Timedelta(days=1))]
+    return df[df["category"].isin(categories)] if categories else df
+
+
+def test_change_columns_compare_with_previous_period_and_year():
+    df = _frame()
+    ts = TimeSeries.from_frame(df, "orderdate", ["sales"])
+    out = ts.series("MS")
+    monthly = _expected(df, "MS")["sales"]
+    assert out["sales_pop"].iloc[5] == pytest.approx(monthly.iloc[5] / monthly.iloc[4] - 1)
+    assert out["sales_yoy"].iloc[14] == pytest.approx(monthly.iloc[14] / monthly.iloc[2] - 1)
+    assert np.isnan(out["sales_pop"].iloc[0]) and out["sales_yoy"].iloc[:12].isna().all()
+
+
+def test_partial_periods_are_flagged():
+    df = _frame()
+    ts = TimeSeries.from_frame(df, "orderdate", ["sales"])
+    out = ts.series("MS", (pd.Timestamp("2022-03-15"), pd.Timestamp("2022-06-30")))
+    assert list(out["complete"]) == [False, True, True, True]
+    assert out.attrs["freq"] == "MS"
+
+
+@pytest.mark.parametrize("dtype", [object, "category"])
+def test_missing_categories_get_their_own_column(dtype):
+    df = _frame()
+    df["category"] = df["category"].astype(object)
+    df.loc[df.index[::4], "category"] = np.nan
+    df["category"] = df["category"].astype(dtype)
+    ts = TimeSeries.from_frame(df, "orderdate", ["sales"], "category")
+    labels = df["category"].astype(object).fillna("nan")
+    for category, rows in df.groupby(labels, sort=False):
+        out = ts.series("QS", categories=[category])
+        assert out["sales"].sum() == pytest.approx(rows["sales"].sum())
+        assert out["records"].sum() == len(rows)
+    assert ts.series("QS")["records"].sum() == len(df)
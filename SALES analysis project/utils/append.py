@@ -0,0 +1,148 @@
+# utils/append.py
+import copy
+import os
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from utils.cache import LRUCache, content_hash, make_key
+from utils.cleaning import clean_data
+from utils.ingest import SOURCE_COLUMN
+from utils.perf import traced
+from utils.pipeline import dataset_cache, detected_columns, read_upload, standardize_columns
+
+# added/duplicates: delta rows appended / skipped as already present; resorted: whether
+# the delta had to be merged into the date order instead of going at the end
+AppendResult = namedtuple("AppendResult", ["df", "added", "duplicates", "resorted"])
+
+
+def append_key(key: str, data: bytes) -> str:
+    """Identity of the dataset `key` with one delta upload appended."""
+    return make_key("append", key, content_hash(data))
+
+
+def row_fingerprints(df: pd.DataFrame) -> np.ndarray:
+    """64-bit hash of every row. Numbers are hashed as floats, so an int8 and an int64 copy of a row match."""
+    numeric = [c for c in df.columns
+               if pd.api.types.is_numeric_dtype(df[c].dtype) and not pd.api.types.is_bool_dtype(df[c].dtype)]
+    hashed = df.astype({c: "float64" for c in numeric}) if numeric else df
+    return pd.util.hash_pandas_object(hashed, index=False).to_numpy()
+
+
+def _found(sorted_values: np.ndarray, values: np.ndarray) -> np.ndarray:
+    if not len(sorted_values):
+        return np.zeros(len(values), dtype=bool)
+    at = np.searchsorted(sorted_values, values).clip(max=len(sorted_values) - 1)
+    return sorted_values[at] == values
+
+
+@traced
+def clean_delta(raw: pd.DataFrame, df_base: pd.DataFrame, col_info: dict, column_types: dict,
+                name: str = None) -> pd.DataFrame:
+    """
+    Clean a delta file with the base dataset's stored column types (no type
+    inference or column detection), check it against the detected columns
+    and align its columns and dtypes with df_base.
+    Raises ValueError when a detected column is missing or has no usable values.
+    """
+    delta = standardize_columns(raw)
+    sales_col, _, _, date_col = detected_columns(col_info)
+    missing = [c for c in detected_columns(col_info) if c and c not in delta.columns]
+    if missing:
+        raise ValueError(f"Delta file is missing the detected column(s): {', '.join(missing)}")
+    if SOURCE_COLUMN in df_base.columns and SOURCE_COLUMN not in delta.columns:
+        delta[SOURCE_COLUMN] = os.path.basename(name or "appended")
+    delta = clean_data(delta, copy=False, types=column_types)
+
+    for col in (sales_col, date_col):
+        if col and len(delta) and delta[col].notna().sum() == 0:
+            raise ValueError(f"Column '{col}' has no valid {column_types.get(col, {}).get('kind', '')} "
+                             "values in the delta file")
+    if date_col and pd.api.types.is_datetime64_any_dtype(df_base[date_col]):
+        delta = delta.dropna(subset=[date_col]).sort_values(date_col, kind="stable")
+
+    delta = delta.reindex(columns=df_base.columns).reset_index(drop=True)
+    for col in df_base.columns:
+        dtype = df_base[col].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            delta[col] = pd.Categorical(delta[col].astype(object).where(delta[col].notna(), None))
+        elif not pd.api.types.is_numeric_dtype(dtype) and delta[col].dtype != dtype:
+            try:
+                delta[col] = delta[col].astype(dtype)
+            except (TypeError, ValueError):
+                pass
+    return delta
+
+
+def _union_categories(df_base: pd.DataFrame, delta: pd.DataFrame):
+    """Give every categorical column the same categories in both frames, so concat keeps them categorical."""
+    base = {}
+    for col in df_base.columns:
+        if isinstance(df_base[col].dtype, pd.CategoricalDtype):
+            cats = df_base[col].cat.categories
+            added = delta[col].cat.categories.difference(cats)
+            base[col] = df_base[col].cat.add_categories(added) if len(added) else df_base[col]
+            delta[col] = delta[col].cat.set_categories(base[col].cat.categories)
+    return df_base.assign(**base) if base else df_base, delta
+
+
+@traced
+def append_rows(df_base: pd.DataFrame, delta: pd.DataFrame, date_col: str = None) -> AppendResult:
+    """
+    Concatenate cleaned, aligned delta rows after df_base. Deltas dated after
+    the base (the usual daily append) stay at the end; otherwise the frame is
+    re-sorted by date with a stable sort of the two sorted runs.
+    """
+    base, delta = _union_categories(df_base, delta)
+    df = pd.concat([base, delta], ignore_index=True)
+    resorted = bool(date_col and len(base) and len(delta) and pd.api.types.is_datetime64_any_dtype(df[date_col])
+                    and delta[date_col].iloc[0] < base[date_col].iloc[-1])
+    if resorted:
+        df = df.sort_values(date_col, kind="stable", ignore_index=True)
+    return AppendResult(df, len(delta), 0, resorted)
+
+
+@traced
+def append_upload(df_base: pd.DataFrame, key: str, name: str, data: bytes, col_info: dict, column_types: dict,
+                  cache: LRUCache = None) -> AppendResult:
+    """
+    Append one delta upload (CSV/XLSX bytes) to the cleaned dataset stored
+    under key. Delta rows already in the dataset, by row fingerprint, are
+    skipped. The base's stored aggregates - row fingerprints, missing-cell
+    counts, cube, filter index and approximate-mode sample - are carried over
+    to append_key(key, data) with only the delta folded in; those not cached
+    for the base are left to be built on first use.
+    """
+    cache = dataset_cache if cache is None else cache
+    new_key = append_key(key, data)
+    date_col = detected_columns(col_info)[3]
+    delta = clean_delta(read_upload(data, name), df_base, col_info, column_types, name)
+
+    fingerprints = cache.get_or_compute(make_key("fingerprints", key), lambda: np.sort(row_fingerprints(df_base)))
+    delta_prints = row_fingerprints(delta)
+    first = np.zeros(len(delta), dtype=bool)
+    first[np.unique(delta_prints, return_index=True)[1]] = True
+    keep = first & ~_found(fingerprints, delta_prints)
+    delta, delta_prints = delta[keep].reset_index(drop=True), delta_prints[keep]
+
+    result = append_rows(df_base, delta, date_col)._replace(duplicates=int((~keep).sum()))
+    new_prints = np.sort(delta_prints)
+    cache.put(make_key("fingerprints", new_key),
+              np.insert(fingerprints, np.searchsorted(fingerprints, new_prints), new_prints))
+    missing = cache.get_or_compute(make_key("missing", key), lambda: df_base.isna().sum())
+    missing = missing.add(delta.isna().sum(), fill_value=0).astype("int64")
+    cache.put(make_key("missing", new_key), missing)
+
+    derived = {"cube": lambda cube: cube.append(delta),
+               "sample": lambda sample: copy.deepcopy(sample).update(delta)}
+    if not result.resorted:
+        # Row positions of the base are unchanged only when the delta went at the end
+        derived["index"] = lambda index: index.extend(delta)
+    for stored, extend in derived.items():
+        previous = cache.get(make_key(stored, key))
+        if previous is not None:
+            cache.put(make_key(stored, new_key), extend(previous) if len(delta) else previous)
+    cache.put(make_key("append summary", new_key), {"added": result.added, "duplicates": result.duplicates,
+                                                    "rows": len(result.df), "missing": int(missing.sum())})
+    return result
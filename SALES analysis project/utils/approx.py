@@ -0,0 +1,181 @@
+# utils/approx.py
+import os
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from utils.filters import as_str_keys, isin_mask, whole_days
+from utils.perf import traced
+from utils.pipeline import detected_columns, dimension_columns
+
+# Rows kept per (category, month) stratum
+SAMPLE_PER_STRATUM = int(os.environ.get("SALES_SAMPLE_PER_STRATUM", "500"))
+Z_95 = 1.96
+STRATUM = ["_cat", "_month"]
+
+# An estimated value and the half-width of its 95% confidence interval
+Estimate = namedtuple("Estimate", ["value", "error"])
+
+
+class StratifiedSample:
+    """
+    Reservoir sample of at most `per_stratum` rows for every (category,
+    month) stratum, plus each stratum's population count. Every row gets a
+    random priority and a stratum keeps its lowest priorities (bottom-k), so
+    update() can fold in more rows, chunk by chunk, and still hold a uniform
+    sample of everything seen so far.
+
+    Each kept row stores the sales/profit/category/date/customer columns and
+    the number of missing cells in the original row.
+    """
+
+    def __init__(self, sales_col=None, profit_col=None, category_col=None, date_col=None, customer_col=None,
+                 per_stratum: int = SAMPLE_PER_STRATUM, seed: int = 0):
+        self.sales_col, self.profit_col = sales_col, profit_col
+        self.category_col, self.date_col, self.customer_col = category_col, date_col, customer_col
+        self.columns = [c for c in (sales_col, profit_col, category_col, date_col, customer_col) if c]
+        self.per_stratum = per_stratum
+        self._rng = np.random.default_rng(seed)
+        self.sample = None
+        self.population = pd.Series(dtype="int64", index=pd.MultiIndex.from_arrays([[], []], names=STRATUM))
+        self.rows = 0
+
+    def _strata(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Stratum keys: category as text and month as year * 12 + month (-1 where missing)."""
+        strata = pd.DataFrame(index=df.index)
+        strata["_cat"] = as_str_keys(df[self.category_col]).astype(object).fillna("") if self.category_col else ""
+        if self.date_col:
+            dates = df[self.date_col]
+            strata["_month"] = (dates.dt.year * 12 + dates.dt.month - 1).fillna(-1).astype("int64")
+        else:
+            strata["_month"] = 0
+        return strata
+
+    @traced
+    def update(self, df: pd.DataFrame) -> "StratifiedSample":
+        chunk = df[self.columns].copy()
+        chunk["_missing"] = df.isna().sum(axis=1).to_numpy()
+        chunk[STRATUM] = self._strata(df)
+        chunk["_priority"] = self._rng.random(len(chunk))
+        self.population = self.population.add(chunk.groupby(STRATUM, sort=False).size(), fill_value=0).astype("int64")
+        self.rows += len(chunk)
+
+        merged = chunk if self.sample is None else pd.concat([self.sample, chunk], ignore_index=True)
+        rank = merged.groupby(STRATUM, sort=False)["_priority"].rank(method="first")
+        self.sample = merged[(rank <= self.per_stratum).to_numpy()].reset_index(drop=True)
+        return self
+
+    def view(self, date_range=None, categories=None, sales_range=None) -> "SampleView":
+        """The sample restricted to the sidebar's filters (same predicates as filter_frame)."""
+        s = self.sample
+        mask = np.ones(len(s), dtype=bool)
+        if self.date_col and date_range:
+            dates = s[self.date_col]
+            start, end = whole_days(date_range)
+            mask &= ((dates >= start) & (dates <= end)).to_numpy()
+        if self.category_col and categories:
+            mask &= isin_mask(s[self.category_col], categories)
+        if self.sales_col and sales_range:
+            mask &= s[self.sales_col].between(*sales_range).fillna(False).to_numpy(dtype=bool)
+        return SampleView(self, mask)
+
+    def __sizeof__(self):
+        return int(self.sample.memory_usage(deep=True).sum()) if self.sample is not None else 0
+
+
+class SampleView:
+    """
+    Estimates for the rows matching a filter, from a StratifiedSample:
+    stratified totals (each sampled row stands for N_h / n_h rows of its
+    stratum) with 95% confidence intervals from the within-stratum variance.
+    Strata small enough to be kept whole contribute no error.
+    """
+
+    def __init__(self, reservoir: StratifiedSample, mask: np.ndarray):
+        self.reservoir = reservoir
+        self.mask = mask
+        s = reservoir.sample
+        groups = s.groupby(STRATUM, sort=False)
+        self._codes = groups.ngroup().to_numpy()
+        self._n = groups.size().to_numpy(dtype=float)
+        self._N = reservoir.population.reindex(groups.size().index).to_numpy(dtype=float)
+
+    def _totals(self, z: np.ndarray, groups=None) -> pd.DataFrame:
+        """Estimated sum of z over the population (per group, if given): columns value, error."""
+        frame = pd.DataFrame({"h": self._codes, "z": z, "zz": z * z})
+        keys = ["h"] if groups is None else ["h", groups.name]
+        if groups is not None:
+            frame[groups.name] = groups.to_numpy()
+        cells = frame.groupby(keys, sort=False, observed=True)[["z", "zz"]].sum()
+        h = cells.index.get_level_values("h").to_numpy() if groups is not None else cells.index.to_numpy()
+        n, N = self._n[h], self._N[h]
+        total = N / n * cells["z"].to_numpy()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            s2 = np.where(n > 1, (cells["zz"].to_numpy() - cells["z"].to_numpy() ** 2 / n) / (n - 1), 0.0)
+        variance = N * N * (1 - n / N) * np.clip(s2, 0, None) / n
+        out = pd.DataFrame({"value": total, "variance": variance},
+                           index=cells.index.get_level_values(groups.name) if groups is not None else cells.index)
+        out = out.groupby(level=0, sort=False).sum() if groups is not None else out.sum().to_frame().T
+        out["error"] = Z_95 * np.sqrt(out.pop("variance"))
+        return out
+
+    def _estimate(self, z: np.ndarray) -> Estimate:
+        row = self._totals(z).iloc[0]
+        return Estimate(float(row["value"]), float(row["error"]))
+
+    def _values(self, col: str) -> np.ndarray:
+        return self.reservoir.sample[col].to_numpy(dtype=float, na_value=np.nan)
+
+    def count(self) -> Estimate:
+        """Matching rows."""
+        return self._estimate(self.mask.astype(float))
+
+    def total(self, col: str) -> Estimate:
+        return self._estimate(np.where(self.mask, np.nan_to_num(self._values(col)), 0.0))
+
+    def mean(self, col: str) -> Estimate:
+        """Mean of col over matching rows (ratio estimator, linearized variance)."""
+        values = self._values(col)
+        present = self.mask & ~np.isnan(values)
+        total = self._estimate(np.where(present, values, 0.0)).value
+        count = self._estimate(present.astype(float)).value
+        if not count:
+            return Estimate(None, None)
+        ratio = total / count
+        residual = self._estimate(np.where(present, values - ratio, 0.0))
+        return Estimate(ratio, residual.error / count)
+
+    def missing_cells(self) -> Estimate:
+        return self._estimate(np.where(self.mask, self.reservoir.sample["_missing"].to_numpy(dtype=float), 0.0))
+
+    def top(self, group_col: str, value_col: str, n: int = 5) -> pd.DataFrame:
+        """Largest estimated sums of value_col per group_col value: columns value, error."""
+        groups = self.reservoir.sample[group_col]
+        keep = self.mask & groups.notna().to_numpy()
+        values = np.where(keep, np.nan_to_num(self._values(value_col)), 0.0)
+        totals = self._totals(values, as_str_keys(groups).astype(object).where(keep, None).rename("group"))
+        return totals.sort_values("value", ascending=False).head(n)
+
+    def histogram(self, col: str, bins: int = 30):
+        """Estimated row counts per value bin: (edges, counts), like StreamingAggregator's histogram."""
+        values = self._values(col)
+        keep = self.mask & ~np.isnan(values)
+        weights = (self._N / self._n)[self._codes]
+        counts, edges = np.histogram(values[keep], bins=bins, weights=weights[keep])
+        return edges, counts
+
+
+@traced
+def build_sample(df: pd.DataFrame, col_info: dict, per_stratum: int = SAMPLE_PER_STRATUM,
+                 chunk_rows: int = 1_000_000) -> StratifiedSample:
+    """Stratified sample of a cleaned dataset over the detected columns, folded in chunk by chunk."""
+    sales_col, profit_col, category_col, date_col = detected_columns(col_info)
+    if date_col and not pd.api.types.is_datetime64_any_dtype(df[date_col]):
+        date_col = None
+    sample = StratifiedSample(sales_col, profit_col, category_col, date_col,
+                              dimension_columns(df.columns)["customer"], per_stratum)
+    for start in range(0, max(len(df), 1), chunk_rows):
+        sample.update(df.iloc[start:start + chunk_rows])
+    return sample
+
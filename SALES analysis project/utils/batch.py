@@ -0,0 +1,158 @@
+# utils/batch.py
+"""
+Headless report generation: runs the dashboard's cleaning, detection, KPI
+and insights pipeline over a directory of files and writes one PDF report
+per file (or per value of a column) without importing Streamlit.
+
+Run from the project folder:
+    python -m utils.batch csv/ --out reports --start 2016-01-01 --split-by region
+"""
+import argparse
+import glob
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from utils.eda import profile_frame
+from utils.filters import filter_frame
+from utils.insights import generate_insights
+from utils.kpis import compute_kpis, kpi_table
+from utils.pipeline import detected_columns, prepare_dataset, read_upload, standardize_columns
+from utils.report import export_report
+
+INPUT_PATTERNS = ("*.csv", "*.xlsx")
+
+
+def find_inputs(input_dir: str, recursive: bool = False) -> list:
+    """CSV and Excel files under input_dir, sorted by path."""
+    paths = []
+    for pattern in INPUT_PATTERNS:
+        paths += glob.glob(os.path.join(input_dir, "**" if recursive else "", pattern), recursive=recursive)
+    return sorted(set(paths))
+
+
+def _safe_name(text) -> str:
+    return re.sub(r"[^\w.-]+", "_", str(text)).strip("_") or "report"
+
+
+def report_frame(df: pd.DataFrame, col_info: dict, out_dir: str, prefix: str, title: str,
+                 date_range=None, categories=None, sales_range=None) -> str:
+    """Filter a cleaned frame like the sidebar does, then write its KPI/insights PDF. Returns the file path."""
+    sales_col, profit_col, category_col, date_col = detected_columns(col_info)
+    if date_col and not pd.api.types.is_datetime64_any_dtype(df[date_col]):
+        date_col = None
+    if date_col and date_range:
+        start, end = date_range
+        date_range = (start or df[date_col].min(), end or df[date_col].max())
+    if sales_col and sales_range:
+        low, high = sales_range
+        sales_range = (df[sales_col].min() if low is None else low, df[sales_col].max() if high is None else high)
+
+    df = filter_frame(df, date_col, date_range, category_col, categories, sales_col, sales_range)
+    profile = profile_frame(df)
+    kpis = kpi_table(compute_kpis(df, sales_col, profit_col, profile=profile))
+    kpis["Records"] = f"{len(df):,}"
+    insights = generate_insights(df, sales_col, profit_col, category_col, missing_cells=profile.total_missing,
+                                 date_col=date_col)
+    filename = export_report(kpis, filename_prefix=prefix, save_dir=out_dir, insights=insights, title=title)
+    if filename is None:
+        raise RuntimeError(f"Could not write the PDF report for {title}.")
+    return filename
+
+
+def report_file(path: str, out_dir: str, split_by: str = None, encoding: str = "latin1", **filters) -> list:
+    """
+    Worker: load and clean one file, then write one report for it, or one
+    per distinct value of the split_by column. Returns the written paths.
+    """
+    df, col_info, _ = prepare_dataset(read_upload(None, path, encoding))
+    name = os.path.splitext(os.path.basename(path))[0]
+    if not split_by:
+        return [report_frame(df, col_info, out_dir, _safe_name(name), f"Sales Analysis Report: {name}", **filters)]
+
+    split_col = standardize_columns(pd.DataFrame(columns=[split_by])).columns[0]
+    if split_col not in df.columns:
+        raise KeyError(f"Column '{split_by}' not found in {path}.")
+    written = []
+    for value, part in df.groupby(split_col, observed=True, sort=True):
+        written.append(report_frame(part, col_info, out_dir, _safe_name(f"{name}_{value}"),
+                                    f"Sales Analysis Report: {name} / {value}", **filters))
+    return written
+
+
+def run_batch(paths, out_dir: str, max_workers: int = None, split_by: str = None, encoding: str = "latin1",
+              **filters) -> dict:
+    """
+    Write reports for many files in parallel worker processes.
+    Returns {input path: [report paths] or the error message}; one bad file
+    does not stop the others.
+    """
+    results = {}
+    workers = min(len(paths), max_workers or os.cpu_count() or 1)
+    if workers <= 1:
+        for path in paths:
+            try:
+                results[path] = report_file(path, out_dir, split_by, encoding, **filters)
+            except Exception as e:
+                results[path] = f"{type(e).__name__}: {e}"
+        return results
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(report_file, path, out_dir, split_by, encoding, **filters): path for path in paths}
+        for future in as_completed(futures):
+            try:
+                results[futures[future]] = future.result()
+            except Exception as e:
+                results[futures[future]] = f"{type(e).__name__}: {e}"
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m utils.batch",
+                                     description="Write PDF sales reports for every CSV/Excel file in a directory.")
+    parser.add_argument("input_dir", help="Directory holding the input files")
+    parser.add_argument("--out", default="reports", help="Directory for the PDF reports (default: reports)")
+    parser.add_argument("--recursive", action="store_true", help="Also look in sub-directories")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--encoding", default="latin1", help="CSV encoding (default: latin1)")
+    parser.add_argument("--split-by", default=None, help="Write one report per value of this column, e.g. region")
+    parser.add_argument("--start", default=None, help="Keep rows on or after this date")
+    parser.add_argument("--end", default=None, help="Keep rows on or before this date")
+    parser.add_argument("--category", action="append", default=None,
+                        help="Keep only this category (repeat for several)")
+    parser.add_argument("--min-sales", type=float, default=None)
+    parser.add_argument("--max-sales", type=float, default=None)
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    paths = find_inputs(args.input_dir, args.recursive)
+    if not paths:
+        print(f"No CSV or Excel files found in {args.input_dir}", file=sys.stderr)
+        return 1
+
+    filters = {"categories": args.category}
+    if args.start or args.end:
+        filters["date_range"] = (pd.Timestamp(args.start) if args.start else None,
+                                 pd.Timestamp(args.end) if args.end else None)
+    if args.min_sales is not None or args.max_sales is not None:
+        filters["sales_range"] = (args.min_sales, args.max_sales)
+
+    results = run_batch(paths, args.out, args.workers, args.split_by, args.encoding, **filters)
+    failed = 0
+    for path in paths:
+        outcome = results[path]
+        if isinstance(outcome, str):
+            failed += 1
+            print(f"FAILED {path}: {outcome}", file=sys.stderr)
+        else:
+            print(f"{path}: {len(outcome)} report(s)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+# utils/bench.py
+"""
+Stage-by-stage benchmarks of the dashboard pipeline on synthetic
+Superstore-shaped data. Each run appends one JSON line per dataset size to
+the results file, tagged with the git commit, so runs can be compared.
+
+Run from the project folder:
+    python -m utils.bench --rows 10000 100000 --dirty --missing 0.01
+    python -m utils.bench --rows 100000 --compare   # flag stages slower than the last run
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from utils import charts
+from utils.cleaning import clean_data, explain_column_detection
+from utils.cube import build_cube
+from utils.eda import get_summary, profile_frame
+from utils.filters import FilterIndex, take
+from utils.insights import generate_insights
+from utils.pipeline import detected_columns, dimension_columns, finalize_dataset, read_upload, standardize_columns
+from utils.report import export_report
+from utils.kpis import compute_kpis, kpi_table
+from utils.synthetic import write_superstore_csv
+
+RESULTS_FILE = "bench_results.jsonl"
+
+
+def measure(fn, setup=None, repeat: int = 3, memory: bool = True) -> dict:
+    """
+    Best wall time of `repeat` calls of fn(*setup()), and the peak traced
+    allocation of one extra call (run separately: tracing slows code down).
+    setup() runs untimed before every call, e.g. to copy an input fn mutates.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        args = setup() if setup else ()
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    result = {"seconds": round(best, 6)}
+    if memory:
+        args = setup() if setup else ()
+        tracemalloc.start()
+        try:
+            fn(*args)
+            result["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 1024 ** 2, 3)
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def run_stages(path: str, repeat: int = 3, memory: bool = True, out_dir: str = None) -> dict:
+    """Time every pipeline stage on one CSV file. Returns {stage: {"seconds", "peak_mb"}}."""
+    results = {}
+
+    def stage(name, fn, setup=None):
+        results[name] = measure(fn, setup, repeat, memory)
+
+    stage("read", lambda: read_upload(None, path))
+    raw = standardize_columns(read_upload(None, path))
+    stage("clean_data", lambda df: clean_data(df, copy=False), lambda: (raw.copy(),))
+    df_cleaned = clean_data(raw.copy(), copy=False)
+    stage("explain_column_detection", lambda: explain_column_detection(df_cleaned))
+    stage("finalize_dataset", finalize_dataset, lambda: (df_cleaned.copy(),))
+    df, col_info = finalize_dataset(df_cleaned.copy())
+
+    sales_col, profit_col, category_col, date_col = detected_columns(col_info)
+    dims = dimension_columns(df.columns)
+    stage("filter_index", lambda: FilterIndex(df, date_col, category_col, sales_col))
+    findex = FilterIndex(df, date_col, category_col, sales_col)
+    # A mid-span date range, two categories and the middle of the sales range
+    dates = df[date_col]
+    span = dates.max() - dates.min()
+    date_range = (dates.min() + span / 4, dates.max() - span / 4)
+    categories = findex.category_options()[:2]
+    sales_range = tuple(df[sales_col].quantile([0.1, 0.9]))
+    stage("filter_select", lambda: take(df, findex.select(date_range, categories, sales_range)))
+    df_filtered = take(df, findex.select(date_range, categories, sales_range))
+
+    stage("build_cube", lambda: build_cube(df, col_info))
+    cube_view = build_cube(df, col_info).slice(date_range, categories)
+    stage("timeseries.series", lambda: cube_view.series("MS"))
+    cat_sales = df_filtered.groupby(category_col, observed=True)[sales_col].sum().reset_index()
+    stage("charts.sales_over_time", lambda: charts.sales_over_time(df_filtered, date_col, sales_col))
+    stage("charts.sales_trend", lambda: charts.sales_trend(cube_view.series(), sales_col))
+    stage("charts.sales_distribution_histogram", lambda: charts.sales_distribution_histogram(df_filtered, sales_col))
+    stage("charts.category_sales_bar", lambda: charts.category_sales_bar(cat_sales, category_col, sales_col))
+    stage("charts.sales_pie_donut_chart", lambda: charts.sales_pie_donut_chart(cat_sales, category_col, sales_col))
+    stage("charts.sales_3d_scatter",
+          lambda: charts.sales_3d_scatter(df_filtered, sales_col, profit_col, category_col))
+    if dims["geo"]:
+        stage("charts.sales_geo_map", lambda: charts.sales_geo_map(df_filtered, dims["geo"], sales_col))
+
+    stage("profile_frame", lambda: profile_frame(df_filtered))
+    stage("get_summary", lambda: get_summary(df_filtered))
+    stage("generate_insights", lambda: generate_insights(df_filtered, sales_col, profit_col, category_col,
+                                                         date_col=date_col))
+    kpis = kpi_table(compute_kpis(df_filtered, sales_col, profit_col))
+    insights = generate_insights(df_filtered, sales_col, profit_col, category_col, date_col=date_col)
+    with tempfile.TemporaryDirectory(dir=out_dir) as report_dir:
+        stage("export_report", lambda: export_report(kpis, save_dir=report_dir, insights=insights))
+    return results
+
+
+def _commit() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_benchmarks(rows_list, repeat: int = 3, memory: bool = True, **data_options) -> list:
+    """Generate one synthetic CSV per size and time every stage on it. Returns one record per size."""
+    records = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in rows_list:
+            path = write_superstore_csv(os.path.join(tmp, f"superstore_{rows}.csv"), rows=rows, **data_options)
+            records.append({
+                "commit": _commit(),
+                "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "pandas": pd.__version__,
+                "params": {"rows": rows, "repeat": repeat, **data_options},
+                "stages": run_stages(path, repeat, memory),
+            })
+    return records
+
+
+def load_results(path: str = RESULTS_FILE) -> list:
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def save_results(records, path: str = RESULTS_FILE):
+    with open(path, "a", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+def compare(record: dict, previous: dict, threshold: float = 1.25) -> list:
+    """Stages whose time grew by more than `threshold` x versus a previous run: [(stage, old s, new s)]."""
+    slower = []
+    for name, now in record["stages"].items():
+        before = previous["stages"].get(name)
+        # Ignore sub-millisecond stages: their timings are mostly noise
+        if before and max(now["seconds"], before["seconds"]) > 0.001 and now["seconds"] > before["seconds"] * threshold:
+            slower.append((name, before["seconds"], now["seconds"]))
+    return slower
+
+
+def _print_record(record: dict, previous: dict = None):
+    print(f"\n{record['params']['rows']:,} rows (commit {record['commit'] or 'unknown'})")
+    for name, r in record["stages"].items():
+        line = f"  {name:<38}{r['seconds'] * 1000:>10.1f} ms"
+        if "peak_mb" in r:
+            line += f"{r['peak_mb']:>10.1f} MB"
+        before = previous["stages"].get(name) if previous else None
+        if before and before["seconds"]:
+            line += f"   x{r['seconds'] / before['seconds']:.2f} vs {previous['commit'] or 'previous'}"
+        print(line)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m utils.bench", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--extra-columns", type=int, default=0, help="Additional numeric columns")
+    parser.add_argument("--categories", type=int, default=3, help="Category cardinality")
+    parser.add_argument("--days", type=int, default=4 * 365, help="Date span in days")
+    parser.add_argument("--missing", type=float, default=0.0, help="Share of blank cells, e.g. 0.01")
+    parser.add_argument("--dirty", action="store_true", help='Write Sales/Profit as strings like "$1,234.50"')
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per stage; the best is kept")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the traced peak-memory run")
+    parser.add_argument("--out", default=RESULTS_FILE, help=f"Results file (default: {RESULTS_FILE})")
+    parser.add_argument("--compare", action="store_true",
+                        help="Compare with the last saved run of the same parameters; exit 1 on a regression")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Slowdown factor counted as a regression")
+    args = parser.parse_args(argv)
+
+    data_options = {"extra_columns": args.extra_columns, "categories": args.categories, "days": args.days,
+                    "missing_rate": args.missing, "dirty_numbers": args.dirty}
+    history = load_results(args.out)
+    records = run_benchmarks(args.rows, args.repeat, not args.no_memory, **data_options)
+
+    regressions = 0
+    for record in records:
+        previous = next((r for r in reversed(history) if r["params"] == record["params"]), None)
+        _print_record(record, previous if args.compare else None)
+        if args.compare and previous:
+            for name, before, now in compare(record, previous, args.threshold):
+                regressions += 1
+                print(f"  REGRESSION {name}: {before * 1000:.1f} ms -> {now * 1000:.1f} ms", file=sys.stderr)
+    save_results(records, args.out)
+    print(f"\nResults appended to {args.out}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+# utils/cache.py
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def content_hash(data: bytes) -> str:
+    """Return a short hex digest identifying the raw bytes of an upload."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def file_hash(fileobj, block_size: int = 8 * 1024 ** 2) -> str:
+    """Hash a seekable file-like object block by block, then rewind it."""
+    h = hashlib.blake2b(digest_size=16)
+    fileobj.seek(0)
+    for block in iter(lambda: fileobj.read(block_size), b""):
+        h.update(block)
+    fileobj.seek(0)
+    return h.hexdigest()
+
+
+def make_key(*parts) -> str:
+    """Build a stable cache key from hashable parts (hashes, options, filters)."""
+    h = hashlib.blake2b(digest_size=16)
+    for p in parts:
+        if isinstance(p, dict):
+            p = sorted(p.items())
+        h.update(repr(p).encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+def estimate_size(obj) -> int:
+    """Rough in-memory size of a cached value, in bytes."""
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=True, deep=True).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(index=True, deep=True))
+    if isinstance(obj, (bytes, bytearray)):
+        return len(obj)
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes)
+    if hasattr(obj, "to_plotly_json"):
+        # Plotly figures: count the trace arrays and layout they would send
+        return estimate_size(obj.to_plotly_json())
+    if isinstance(obj, (list, tuple)):
+        return sys.getsizeof(obj) + sum(estimate_size(o) for o in obj)
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(estimate_size(k) + estimate_size(v) for k, v in obj.items())
+    return sys.getsizeof(obj)
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache with a memory budget.
+    Least recently used entries are evicted once the total estimated size
+    goes over max_bytes. A single value larger than the budget is not stored.
+    """
+
+    def __init__(self, max_bytes: int, max_entries: int = None):
+        self.max_bytes = int(max_bytes)
+        self.max_entries = max_entries
+        self._data = OrderedDict()  # key -> (value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return self._data[key][0]
+
+    def put(self, key, value, size: int = None):
+        size = estimate_size(value) if size is None else int(size)
+        with self._lock:
+            if key in self._data:
+                self._bytes -= self._data.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            self._data[key] = (value, size)
+            self._bytes += size
+            self._evict()
+
+    def get_or_compute(self, key, fn):
+        """Return the cached value for key, computing and storing it on a miss."""
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = fn()
+            self.put(key, value)
+        return value
+
+    def _evict(self):
+        while self._data and (self._bytes > self.max_bytes or
+                              (self.max_entries and len(self._data) > self.max_entries)):
+            _, (_, size) = self._data.popitem(last=False)
+            self._bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._bytes
+
+    def stats(self) -> dict:
+        return {"entries": len(self._data), "bytes": self._bytes, "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses}
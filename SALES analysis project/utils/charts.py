@@ -2,35 +2,96 @@
 import plotly.express as px
 import pandas as pd
 
+from utils.downsample import (DEFAULT_LINE_POINTS, DEFAULT_SCATTER_POINTS, choose_granularity,
+                              downsample_series, resample_sum, stratified_sample)
+from utils.perf import traced
+from utils.timeseries import FREQ_LABELS, ROLLING_WINDOW
 
-def sales_over_time(df, date_col, sales_col):
-    fig = px.line(df, x=date_col, y=sales_col, title="Sales Over Time")
+
+@traced
+def sales_over_time(df, date_col, sales_col, granularity="auto", max_points=DEFAULT_LINE_POINTS, method="lttb"):
+    """
+    Sales summed per day/week/month (granularity="auto" picks the finest one
+    that fits max_points from the date span). If a forced granularity still
+    exceeds max_points, the line is reduced with LTTB or min/max per bucket.
+    """
+    if not pd.api.types.is_datetime64_any_dtype(df[date_col]):
+        return px.line(downsample_series(df, date_col, sales_col, max_points, method), x=date_col, y=sales_col,
+                       title="Sales Over Time")
+    freq = choose_granularity(df[date_col], max_points) if granularity == "auto" else granularity
+    series = downsample_series(resample_sum(df, date_col, sales_col, freq), date_col, sales_col, max_points, method)
+    label = {"D": "Daily", "W": "Weekly", "MS": "Monthly", "M": "Monthly"}.get(freq, freq)
+    fig = px.line(series, x=date_col, y=sales_col, title=f"Sales Over Time ({label})")
     return fig
 
 
+@traced
+def sales_trend(series, sales_col, max_points=DEFAULT_LINE_POINTS, method="lttb"):
+    """
+    Sales per period from a pre-rolled TimeSeries.series() frame, with its
+    rolling average as a second line. Long daily series are reduced like
+    sales_over_time.
+    """
+    freq = series.attrs.get("freq", "D")
+    date_col = series.index.name
+    rolling = f"{sales_col}_rolling"
+    average = f"{ROLLING_WINDOW[freq]}-period average"
+    data = downsample_series(series[[sales_col, rolling]].reset_index(), date_col, sales_col, max_points, method)
+    fig = px.line(data.rename(columns={rolling: average}), x=date_col, y=[sales_col, average],
+                  title=f"Sales Over Time ({FREQ_LABELS[freq]})")
+    fig.update_layout(yaxis_title=sales_col, legend_title_text="")
+    return fig
+
+
+@traced
 def sales_distribution_histogram(df, sales_col):
     fig = px.histogram(df, x=sales_col, nbins=30, title="Sales Distribution")
     return fig
 
 
+@traced
+def binned_histogram(edges, counts, sales_col, title="Sales Distribution"):
+    """Sales distribution from pre-computed bins (streaming mode, or estimated counts in approximate mode)."""
+    centers = (edges[:-1] + edges[1:]) / 2
+    fig = px.bar(x=centers, y=counts, labels={"x": sales_col, "y": "count"}, title=title)
+    fig.update_traces(width=edges[1] - edges[0])
+    fig.update_layout(bargap=0)
+    return fig
+
+
+@traced
 def category_sales_bar(df, category_col, sales_col):
-    df_cat = df.groupby(category_col)[sales_col].sum().reset_index()
+    df_cat = df.groupby(category_col, observed=True)[sales_col].sum().reset_index()
     fig = px.bar(df_cat, x=category_col, y=sales_col, title="Sales by Category")
     return fig
 
 
+@traced
 def sales_pie_donut_chart(df, category_col, sales_col):
-    df_cat = df.groupby(category_col)[sales_col].sum().reset_index()
+    df_cat = df.groupby(category_col, observed=True)[sales_col].sum().reset_index()
     fig = px.pie(df_cat, names=category_col, values=sales_col, hole=0.4, title="Sales Share by Category")
     return fig
 
 
-def sales_3d_scatter(df, sales_col, profit_col, category_col):
+@traced
+def sales_3d_scatter(df, sales_col, profit_col, category_col, max_points=DEFAULT_SCATTER_POINTS):
+    """
+    3D scatter of sales vs profit per category. Above max_points rows, a
+    category-stratified sample is plotted (each category's sales/profit
+    extremes are always included).
+    """
+    title = "3D Sales vs Profit vs Category"
+    if len(df) > max_points:
+        sampled = stratified_sample(df[[sales_col, profit_col, category_col]], category_col, max_points,
+                                    extremes=[sales_col, profit_col])
+        title += f" (sample of {len(sampled):,} / {len(df):,} rows)"
+        df = sampled
     fig = px.scatter_3d(df, x=sales_col, y=profit_col, z=category_col, color=category_col,
-                        size=sales_col, title="3D Sales vs Profit vs Category")
+                        size=sales_col, title=title)
     return fig
 
 
+@traced
 def sales_geo_map(df: pd.DataFrame, geo_col: str, sales_col: str):
     """
     Modern Geo Map: Choropleth showing sales per country/region.
@@ -39,7 +100,7 @@ def sales_geo_map(df: pd.DataFrame, geo_col: str, sales_col: str):
         return None
 
     # Aggregate sales by geo
-    df_geo = df.groupby(geo_col)[sales_col].sum().reset_index()
+    df_geo = df.groupby(geo_col, observed=True)[sales_col].sum().reset_index()
 
     # Try to plot
     try:
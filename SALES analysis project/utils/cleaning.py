@@ -1,54 +1,249 @@
 # utils/cleaning.py
 import pandas as pd
 import numpy as np
-import re
+import time
+import warnings
 
-def clean_data(df: pd.DataFrame) -> pd.DataFrame:
+from utils.perf import traced
+
+# Candidate date formats tried (in order) before falling back to pandas' own guessing
+DATE_FORMATS = ["%Y-%m-%d", "%m/%d/%Y", "%d/%m/%Y", "%Y/%m/%d", "%d-%m-%Y", "%m-%d-%Y",
+                "%Y-%m-%d %H:%M:%S", "%m/%d/%Y %H:%M", "%d.%m.%Y", "%Y%m%d"]
+
+# Characters stripped from currency / thousands-separated numbers before conversion
+_NUMBER_NOISE = r'[,\s$€£¥]'
+_CURRENCY_HINT = r'[,$€£¥()]'
+# Rough shape of a date string; columns whose sample doesn't look like this skip date parsing
+_DATE_SHAPE = (r'\d{1,4}[-/.]\d{1,2}[-/.]\d{1,4}|^\d{8}$|'
+               r'[A-Za-z]{3,9}\.? \d{1,2},? \d{4}|\d{1,2} [A-Za-z]{3,9},? \d{4}')
+
+
+def _is_text(s: pd.Series) -> bool:
+    return pd.api.types.is_object_dtype(s.dtype) or pd.api.types.is_string_dtype(s.dtype)
+
+
+def _sample(s: pd.Series, sample_size: int) -> pd.Series:
+    """Evenly spaced sample of the non-null values of a column."""
+    if len(s) > sample_size * 2:
+        # Over-sample positions first so dense columns never pay for a full dropna()
+        picked = s.iloc[np.linspace(0, len(s) - 1, sample_size * 2).astype(int)].dropna()
+        if len(picked) >= sample_size:
+            return picked.iloc[:: max(1, len(picked) // sample_size)].head(sample_size)
+    s = s.dropna()
+    if len(s) > sample_size:
+        s = s.iloc[np.linspace(0, len(s) - 1, sample_size).astype(int)]
+    return s
+
+
+def _map_distinct(s: pd.Series, fn) -> pd.Series:
+    """
+    Apply a vectorized string transform to the distinct values of s only and
+    broadcast the result back through the factorized codes (missing stays missing).
+    Sales exports repeat the same strings heavily, so this avoids most per-cell work.
+    """
+    codes, uniques = pd.factorize(s)
+    mapped = fn(pd.Series(uniques))
+    values = pd.api.extensions.take(mapped.array, codes, allow_fill=True)
+    return pd.Series(values, index=s.index, name=s.name)
+
+
+def _to_number(s: pd.Series) -> pd.Series:
+    """Vectorized conversion of '1,234.50' / '$ 99' / '(12.5)' style strings to floats."""
+    s = s.astype(str).str.replace(_NUMBER_NOISE, '', regex=True)
+    s = s.str.replace(r'^\((.*)\)$', r'-\1', regex=True)
+    return pd.to_numeric(s, errors='coerce')
+
+
+def _strip(s: pd.Series) -> pd.Series:
+    # .str.strip() returns NaN for non-string cells, so keep those as they were
+    stripped = s.str.strip()
+    return stripped.where(stripped.notna(), s)
+
+
+def _guess_date_format(sample: pd.Series, threshold: float):
+    """
+    Return (matched, format) for a string sample; format is None when pandas had to guess.
+    Explicit formats are tried first; element-wise guessing only runs on the sample.
+    """
+    for fmt in DATE_FORMATS:
+        parsed = pd.to_datetime(sample, format=fmt, errors='coerce')
+        if parsed.notna().mean() >= threshold:
+            return True, fmt
+    if not sample.str.contains(r'\d', regex=True).any():
+        return False, None
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        try:
+            parsed = pd.to_datetime(sample, errors='coerce', format='mixed')
+        except (ValueError, TypeError):
+            return False, None
+    return parsed.notna().mean() >= threshold, None
+
+
+@traced
+def infer_column_types(df: pd.DataFrame, sample_size: int = 1000, threshold: float = 0.6) -> dict:
+    """
+    Classify each column once from a sample of its non-null values.
+    Returns {column: {"kind": ..., "format": ...}} where kind is one of
+    "numeric", "currency", "date", "categorical", "text" or "empty".
+    "format" holds the strptime format for date columns (None if unknown).
+    """
+    types = {}
+    for col in df.columns:
+        s = df[col]
+        if pd.api.types.is_bool_dtype(s.dtype):
+            types[col] = {"kind": "categorical", "format": None}
+            continue
+        if pd.api.types.is_numeric_dtype(s.dtype):
+            types[col] = {"kind": "numeric", "format": None}
+            continue
+        if pd.api.types.is_datetime64_any_dtype(s.dtype):
+            types[col] = {"kind": "date", "format": None}
+            continue
+
+        sample = _sample(s, sample_size)
+        if sample.empty:
+            types[col] = {"kind": "empty", "format": None}
+            continue
+        sample = sample.astype(str).str.strip()
+
+        # Numbers, possibly with thousands separators or currency symbols
+        if _to_number(sample).notna().mean() >= threshold:
+            kind = "currency" if sample.str.contains(_CURRENCY_HINT, regex=True).any() else "numeric"
+            types[col] = {"kind": kind, "format": None}
+            continue
+
+        # Only try date formats on columns that mostly look like dates
+        if sample.str.contains(_DATE_SHAPE, regex=True).mean() >= threshold:
+            matched, fmt = _guess_date_format(sample, threshold)
+            if matched:
+                types[col] = {"kind": "date", "format": fmt}
+                continue
+
+        kind = "categorical" if sample.nunique() <= max(1, len(sample) * 0.5) else "text"
+        types[col] = {"kind": kind, "format": None}
+    return types
+
+
+def apply_column_types(df: pd.DataFrame, types: dict) -> pd.DataFrame:
+    """Convert columns in place according to an inferred (or previously stored) type mapping."""
+    for col, info in types.items():
+        if col not in df.columns:
+            continue
+        s = df[col]
+        kind = info["kind"]
+        if kind in ("numeric", "currency"):
+            if not pd.api.types.is_numeric_dtype(s.dtype):
+                df[col] = _map_distinct(s, _to_number)
+        elif kind == "date":
+            if not pd.api.types.is_datetime64_any_dtype(s.dtype):
+                df[col] = pd.to_datetime(s, format=info.get("format") or 'mixed', errors='coerce')
+        elif _is_text(s):
+            df[col] = _map_distinct(s, _strip)
+    return df
+
+
+@traced
+def clean_data(df: pd.DataFrame, sample_size: int = 1000, copy: bool = True, return_types: bool = False,
+               types: dict = None):
     """
     Basic cleaning:
     - strip whitespace from column names
-    - drop fully empty columns
-    - simple numeric coercion for likely numeric cols
+    - drop fully empty columns and rows
+    - infer a type per column and convert numeric, currency and date columns
+    - trim string fields (missing values stay missing)
     - drop exact duplicate rows
+    Pass copy=False when the caller owns df and does not need it afterwards.
+    Pass types (e.g. inferred on the first chunk of a stream) to reuse that
+    schema instead of inferring one; columns outside it are dropped.
+    With return_types=True, returns (df, inferred column types).
     """
-    df = df.copy()
+    if copy:
+        df = df.copy()
     # normalize column names temporarily (but app will re-standardize)
     df.columns = [str(c).strip() for c in df.columns]
 
-    # Drop columns that are completely empty
-    df.dropna(axis=1, how='all', inplace=True)
+    if types is not None:
+        extra = [c for c in df.columns if c not in types]
+        if extra:
+            df.drop(columns=extra, inplace=True)
+        counts = df.count()
+    else:
+        # Drop columns that are completely empty; count() is a single pass per column
+        counts = df.count()
+        empty_cols = counts.index[counts == 0]
+        if len(empty_cols):
+            df.drop(columns=empty_cols, inplace=True)
+            counts = counts.drop(empty_cols)
 
-    # Remove rows that are all NaN
-    df.dropna(axis=0, how='all', inplace=True)
+    # Remove rows that are all NaN (only possible when some column has gaps)
+    if len(df) and (counts < len(df)).all():
+        df.dropna(axis=0, how='all', inplace=True)
 
-    # Trim string fields
-    for col in df.select_dtypes(include=['object']).columns:
-        df[col] = df[col].astype(str).str.strip()
-
-    # Try convert numeric-looking columns to numeric
-    for col in df.columns:
-        if df[col].dtype == object:
-            sample = df[col].dropna().astype(str).head(50)
-            numeric_like = sample.apply(lambda s: bool(re.match(r'^[\d\-\+\.,\s]+$', s)))
-            if len(sample) > 0 and numeric_like.sum() >= len(sample) * 0.6:
-                # remove thousand separators and try convert
-                df[col] = df[col].astype(str).str.replace(",", "").str.replace(" ", "")
-                df[col] = pd.to_numeric(df[col], errors='coerce')
+    if types is None:
+        types = infer_column_types(df, sample_size=sample_size)
+    df = apply_column_types(df, types)
 
     # Drop duplicate rows
     df = df.drop_duplicates()
 
+    if return_types:
+        return df, types
     return df
 
-def explain_column_detection(df: pd.DataFrame):
+@traced
+def compact_frame(df: pd.DataFrame, max_unique_ratio: float = 0.5, arrow_strings: bool = False,
+                  downcast_floats: bool = False) -> pd.DataFrame:
+    """
+    Shrink a cleaned frame in place:
+    - low-cardinality text columns (category, segment, region, state, ship
+      mode, customer, product...) become 'category' dtype with string categories
+    - integer columns are downcast to the smallest integer type
+    - optionally, float columns go to float32 (off by default: it changes sums)
+    - optionally, remaining text columns use Arrow-backed strings
+    """
+    n = len(df)
+    for col in df.columns:
+        s = df[col]
+        if pd.api.types.is_integer_dtype(s.dtype) and not pd.api.types.is_bool_dtype(s.dtype):
+            df[col] = pd.to_numeric(s, downcast="integer")
+        elif downcast_floats and pd.api.types.is_float_dtype(s.dtype):
+            df[col] = pd.to_numeric(s, downcast="float")
+        elif _is_text(s) and n:
+            codes, uniques = pd.factorize(s)
+            if len(uniques) <= n * max_unique_ratio and pd.api.types.infer_dtype(uniques) == "string":
+                df[col] = pd.Categorical.from_codes(codes, categories=uniques)
+            elif arrow_strings and pd.api.types.is_object_dtype(s.dtype):
+                try:
+                    df[col] = s.astype("string[pyarrow]")
+                except (ImportError, TypeError, ValueError):
+                    pass
+    return df
+
+
+@traced
+def explain_column_detection(df: pd.DataFrame, sample_size: int = 200, details: dict = None):
     """
     Attempt to detect sales/profit/category/date columns and give
     a confidence score and a short reason.
     Returns a dict:
       { "Sales Column": (col_name or None, score (0-1), reason str), ... }
+    Date-like values are checked on a sample of sample_size values first.
+    If a details dict is passed, it receives "date_format" (the strptime format
+    to reuse when converting the date column, None if unknown) and "timings"
+    (seconds per detection step).
     """
     cols = [c.lower() for c in df.columns]
     mapping = {}
+    details = {} if details is None else details
+    details.setdefault("date_format", None)
+    timings = details.setdefault("timings", {})
+    clock = [time.perf_counter()]
+
+    def _lap():
+        now = time.perf_counter()
+        elapsed, clock[0] = now - clock[0], now
+        return elapsed
 
     def detect(keywords, prefer_contains=True):
         # keywords list in priority order
@@ -73,6 +268,7 @@ def explain_column_detection(df: pd.DataFrame):
     profit_col, profit_score, profit_reason = detect(profit_candidates)
     category_col, category_score, category_reason = detect(category_candidates)
     date_col, date_score, date_reason = detect(date_candidates)
+    timings["keyword match"] = _lap()
 
     # If sales not found, try numeric columns with large values
     if not sales_col:
@@ -86,18 +282,40 @@ def explain_column_detection(df: pd.DataFrame):
                     sales_col = best
                     sales_score = 0.6
                     sales_reason = "No obvious 'sales' name; selected numeric column with highest total."
+        timings["sales fallback"] = _lap()
+
     # If date not found, check for object columns that look like dates
     if not date_col:
         for c in df.columns:
-            try:
-                parsed = pd.to_datetime(df[c], errors='coerce')
-                if parsed.notna().sum() >= max(5, len(parsed) * 0.4):
-                    date_col = c
-                    date_score = 0.7
-                    date_reason = f"Column '{c}' parsed mostly as datetimes."
-                    break
-            except Exception:
+            s = df[c]
+            if pd.api.types.is_datetime64_any_dtype(s.dtype):
+                date_col, date_score = c, 0.8
+                date_reason = f"Column '{c}' already holds datetimes."
+                break
+            if not _is_text(s):
+                continue  # numeric/bool/categorical dtypes are never parsed as dates
+            # Enough values must parse for at least 40% of all rows (and 5 rows) to be datetimes
+            count = s.count()
+            need = max(5, len(s) * 0.4)
+            if count < need:
+                continue
+            sample = _sample(s, sample_size).astype(str).str.strip()
+            matched, fmt = _guess_date_format(sample, need / count)
+            if not matched:
                 continue
+            # Confirm on the full column only for the winning candidate
+            parsed = pd.to_datetime(s, format=fmt or 'mixed', errors='coerce')
+            if parsed.notna().sum() >= need:
+                date_col, date_score = c, 0.7
+                date_reason = f"Column '{c}' parsed mostly as datetimes" + (f" (format {fmt})." if fmt else ".")
+                details["date_format"] = fmt
+                break
+        timings["date fallback"] = _lap()
+    elif not pd.api.types.is_datetime64_any_dtype(df[date_col].dtype) and _is_text(df[date_col]):
+        # Keyword match on a text column: infer its format from a sample for the later conversion
+        sample = _sample(df[date_col], sample_size).astype(str).str.strip()
+        details["date_format"] = _guess_date_format(sample, 0.4)[1] if len(sample) else None
+        timings["date format"] = _lap()
 
     mapping["Sales Column"] = (sales_col, sales_score, sales_reason)
     mapping["Profit Column"] = (profit_col, profit_score, profit_reason)
@@ -0,0 +1,218 @@
+# utils/cube.py
+import copy
+
+import pandas as pd
+
+from utils.filters import as_str_keys, isin_mask, whole_days
+from utils.perf import traced
+from utils.pipeline import detected_columns, dimension_columns
+from utils.timeseries import TimeSeries
+
+MEASURE_AGGS = ("sum", "count", "min", "max")
+# Each cuboid is grouped by date bucket x category plus at most one extra dimension, so
+# its size is bounded by the distinct combinations of those keys rather than by row count.
+EXTRA_DIMS = ("geo", "product", "customer")
+
+
+class SalesCube:
+    """
+    Pre-aggregated sum/count/min/max of the sales and profit columns by
+    (date bucket x category) and by (date bucket x category x geo / product /
+    customer). Built once per dataset; filter changes are answered by slicing
+    and rolling up cells instead of rescanning rows.
+
+    Dates are bucketed by day, so a date filter matches whole days. The daily
+    cells also feed a TimeSeries (utils.timeseries) for period rollups.
+    """
+
+    def __init__(self, df: pd.DataFrame, sales_col=None, profit_col=None, category_col=None, date_col=None,
+                 geo_col=None, product_col=None, customer_col=None, freq: str = "D"):
+        self.columns = {"date": date_col, "category": category_col, "geo": geo_col,
+                        "product": product_col, "customer": customer_col}
+        self.sales_col, self.profit_col = sales_col, profit_col
+        self.value_cols = [c for c in (sales_col, profit_col) if c]
+        self.freq = freq
+        self.rows = len(df)
+
+        keys = {}
+        if date_col:
+            keys["date"] = df[date_col].dt.floor(freq)
+        if category_col:
+            keys["category"] = as_str_keys(df[category_col])
+        for dim in EXTRA_DIMS:
+            if self.columns[dim]:
+                keys[dim] = df[self.columns[dim]]
+        base_dims = [d for d in ("date", "category") if d in keys]
+
+        self.cuboids = {"base": self._aggregate(df, keys, base_dims)}
+        for dim in EXTRA_DIMS:
+            if dim in keys:
+                self.cuboids[dim] = self._aggregate(df, keys, base_dims + [dim])
+
+        self.timeseries = self._build_timeseries()
+
+    def _build_timeseries(self):
+        if not (self.columns["date"] and self.value_cols):
+            return None
+        base = self.cuboids["base"]
+        return TimeSeries(base["date"], base[[f"{c}__sum" for c in self.value_cols]].set_axis(self.value_cols, axis=1),
+                          base[f"{self.value_cols[0]}__count"],
+                          base["category"] if self.columns["category"] else None, self.columns["date"])
+
+    def _aggregate(self, df, keys, dims):
+        values = df[self.value_cols]
+        if not dims:
+            agg = values.agg(list(MEASURE_AGGS)).unstack().to_frame().T
+        else:
+            agg = values.groupby([keys[d].rename(d) for d in dims], observed=True, sort=False, dropna=False) \
+                        .agg(list(MEASURE_AGGS))
+        agg.columns = [f"{col}__{fn}" for col, fn in agg.columns]
+        return agg.reset_index() if dims else agg
+
+    @staticmethod
+    def _merge(a: pd.DataFrame, b: pd.DataFrame) -> pd.DataFrame:
+        """
+        Cells of two cuboids over the same dimensions, combined: sums and counts
+        add up, min/max of both. Only cells of `a` on dates that `b` has can
+        change, so the others are passed through without regrouping.
+        """
+        dims = [c for c in a.columns if "__" not in c]
+        how = {c: "sum" if c.endswith(("__sum", "__count")) else c.rsplit("__", 1)[1] for c in a.columns if "__" in c}
+
+        def concat(frames):
+            # Categorical keys only stay categorical (instead of object) with the same categories
+            for dim in dims:
+                if all(isinstance(f[dim].dtype, pd.CategoricalDtype) for f in frames):
+                    cats = frames[0][dim].cat.categories
+                    for f in frames[1:]:
+                        cats = cats.append(f[dim].cat.categories.difference(cats))
+                    frames = [f.assign(**{dim: f[dim].cat.set_categories(cats)}) for f in frames]
+            return pd.concat(frames, ignore_index=True)
+
+        if not dims:
+            return concat([a, b]).agg(how).to_frame().T
+        untouched = a.iloc[:0]
+        if "date" in dims:
+            touched = a["date"].isin(b["date"].unique()).to_numpy()
+            untouched, a = a[~touched], a[touched]
+        merged = concat([a, b]).groupby(dims, observed=True, sort=False, dropna=False).agg(how).reset_index()
+        return concat([untouched, merged]) if len(untouched) else merged
+
+    @traced
+    def append(self, df: pd.DataFrame) -> "SalesCube":
+        """
+        Cube over this cube's rows plus df's: df is aggregated on its own and
+        its cells merged in, so the cost depends on df and the cube size, not
+        on the rows already aggregated.
+        """
+        columns = self.columns
+        delta = SalesCube(df, self.sales_col, self.profit_col, columns["category"], columns["date"],
+                          columns["geo"], columns["product"], columns["customer"], self.freq)
+        out = copy.copy(self)
+        out.rows = self.rows + delta.rows
+        out.cuboids = {name: self._merge(cells, delta.cuboids[name]) for name, cells in self.cuboids.items()}
+        out.timeseries = out._build_timeseries()
+        return out
+
+    def _slice(self, cuboid: pd.DataFrame, date_range=None, categories=None) -> pd.DataFrame:
+        mask = None
+        if date_range and "date" in cuboid.columns:
+            start, end = whole_days(date_range)
+            mask = (cuboid["date"] >= start.floor(self.freq)) & (cuboid["date"] <= end)
+        if categories and "category" in cuboid.columns:
+            # Same matching as the row filters: "nan" selects the missing-category cells
+            cat_mask = isin_mask(cuboid["category"], categories)
+            mask = cat_mask if mask is None else mask & cat_mask
+        return cuboid if mask is None else cuboid[mask]
+
+    def _roll(self, cells: pd.DataFrame, by=None) -> pd.DataFrame:
+        how = {c: c.rsplit("__", 1)[1] for c in cells.columns if "__" in c}
+        how = {c: ("sum" if fn == "count" else fn) for c, fn in how.items()}
+        if by is None:
+            return cells[list(how)].agg(how).to_frame().T if len(cells) else \
+                pd.DataFrame([{c: (0 if fn == "sum" else None) for c, fn in how.items()}])
+        return cells.groupby(by, observed=True, sort=False).agg(how)
+
+    def has(self, dim: str) -> bool:
+        return bool(self.columns.get(dim))
+
+    def rollup(self, dim: str, date_range=None, categories=None) -> pd.DataFrame:
+        """
+        Roll the cube up to one dimension ("date", "category", "geo", "product"
+        or "customer") after applying the date/category slice.
+        Returns a frame indexed by that dimension with '<col>__<agg>' columns.
+        """
+        cuboid = self.cuboids.get(dim, self.cuboids["base"])
+        if dim not in cuboid.columns:
+            raise KeyError(f"Dimension '{dim}' is not in the cube.")
+        out = self._roll(self._slice(cuboid, date_range, categories), dim)
+        out.index.name = self.columns[dim]
+        return out
+
+    def totals(self, date_range=None, categories=None) -> dict:
+        """Overall sum/count/min/max per measure column, plus '<col>__mean'."""
+        row = self._roll(self._slice(self.cuboids["base"], date_range, categories)).iloc[0].to_dict()
+        for col in self.value_cols:
+            count = row[f"{col}__count"]
+            row[f"{col}__mean"] = row[f"{col}__sum"] / count if count else None
+        return row
+
+    def slice(self, date_range=None, categories=None) -> "CubeSlice":
+        return CubeSlice(self, date_range, categories)
+
+    def __sizeof__(self):
+        return sum(int(c.memory_usage(deep=True).sum()) for c in self.cuboids.values()) + \
+            (self.timeseries.__sizeof__() if self.timeseries else 0)
+
+
+class CubeSlice:
+    """A cube with the sidebar's date range and category selection applied."""
+
+    def __init__(self, cube: SalesCube, date_range=None, categories=None):
+        self.cube = cube
+        self.date_range = date_range
+        self.categories = categories
+
+    def has(self, dim: str) -> bool:
+        return self.cube.has(dim)
+
+    def column(self, dim: str):
+        return self.cube.columns.get(dim)
+
+    def narrow(self, categories) -> "CubeSlice":
+        """Same date range, different categories (used by the drill-down)."""
+        return CubeSlice(self.cube, self.date_range, categories)
+
+    def totals(self) -> dict:
+        return self.cube.totals(self.date_range, self.categories)
+
+    def rollup(self, dim: str) -> pd.DataFrame:
+        return self.cube.rollup(dim, self.date_range, self.categories)
+
+    def sums(self, dim: str, value_cols) -> pd.DataFrame:
+        """Equivalent of df.groupby(dim_col)[value_cols].sum().reset_index() over the sliced rows."""
+        value_cols = [value_cols] if isinstance(value_cols, str) else list(value_cols)
+        out = self.rollup(dim)[[f"{c}__sum" for c in value_cols]]
+        out.columns = value_cols
+        return out.reset_index()
+
+    def series(self, freq: str = "auto") -> pd.DataFrame:
+        """Period rollups with rolling and period-over-period columns (TimeSeries.series); None without dates."""
+        ts = self.cube.timeseries
+        return ts.series(freq, self.date_range, self.categories) if ts else None
+
+    def top(self, dim: str, value_col: str, n: int = 10) -> pd.Series:
+        """Largest sums of value_col by dimension, like groupby(...)[value_col].sum().nlargest(n)."""
+        sums = self.rollup(dim)[f"{value_col}__sum"].rename(value_col)
+        return sums.sort_values(ascending=False).head(n)
+
+
+@traced
+def build_cube(df: pd.DataFrame, col_info: dict) -> SalesCube:
+    """Build a cube over the detected sales/profit/category/date columns and the geo, product and customer columns."""
+    sales_col, profit_col, category_col, date_col = detected_columns(col_info)
+    if date_col and not pd.api.types.is_datetime64_any_dtype(df[date_col]):
+        date_col = None
+    dims = dimension_columns(df.columns)
+    return SalesCube(df, sales_col, profit_col, category_col, date_col,
+                     geo_col=dims["geo"], product_col=dims["product"], customer_col=dims["customer"])
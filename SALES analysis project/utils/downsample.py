@@ -0,0 +1,102 @@
+# utils/downsample.py
+import numpy as np
+import pandas as pd
+
+from utils.filters import as_str_keys
+
+# Largest number of points a single chart trace should send to the browser
+DEFAULT_LINE_POINTS = 2000
+DEFAULT_SCATTER_POINTS = 5000
+
+
+def choose_granularity(dates: pd.Series, max_points: int = DEFAULT_LINE_POINTS) -> str:
+    """Pick day, week or month buckets so the span fits into max_points buckets."""
+    if dates.empty:
+        return "D"
+    span_days = (dates.max() - dates.min()).days + 1
+    if span_days <= max_points:
+        return "D"
+    if span_days / 7 <= max_points:
+        return "W"
+    return "MS"
+
+
+def resample_sum(df: pd.DataFrame, date_col: str, value_cols, freq: str) -> pd.DataFrame:
+    """Sum value_cols per date bucket; returns a frame with date_col and value_cols columns."""
+    value_cols = [value_cols] if isinstance(value_cols, str) else list(value_cols)
+    out = df.groupby(pd.Grouper(key=date_col, freq=freq))[value_cols].sum()
+    return out.reset_index()
+
+
+def lttb_indices(x, y, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: indices of n_out points that keep the
+    visual shape of the (x, y) line. x must be sorted and numeric.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    picked = np.empty(n_out, dtype=np.int64)
+    picked[0], picked[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt_lo, nxt_hi = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[nxt_lo:nxt_hi].mean(), y[nxt_lo:nxt_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        picked[i + 1] = a
+    return picked
+
+
+def minmax_indices(y, n_out: int) -> np.ndarray:
+    """Indices of the min and max point in each of n_out // 2 equal buckets (keeps spikes)."""
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n_out >= n:
+        return np.arange(n)
+    edges = np.linspace(0, n, max(1, n_out // 2) + 1).astype(int)
+    picked = []
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        if hi > lo:
+            seg = y[lo:hi]
+            picked += [lo + int(np.nanargmin(seg)), lo + int(np.nanargmax(seg))] if np.isfinite(seg).any() else [lo]
+    return np.unique(picked)
+
+
+def downsample_series(df: pd.DataFrame, x_col: str, y_col: str, max_points: int = DEFAULT_LINE_POINTS,
+                      method: str = "lttb") -> pd.DataFrame:
+    """Reduce a sorted line series to at most max_points rows with LTTB or min/max-per-bucket."""
+    if len(df) <= max_points:
+        return df
+    if method == "minmax":
+        idx = minmax_indices(df[y_col], max_points)
+    else:
+        x = df[x_col]
+        x = x.astype("int64") if pd.api.types.is_datetime64_any_dtype(x) else x
+        idx = lttb_indices(x, df[y_col], max_points)
+    return df.iloc[idx]
+
+
+def stratified_sample(df: pd.DataFrame, by: str, n: int, extremes=(), random_state: int = 0) -> pd.DataFrame:
+    """
+    Sample about n rows keeping each group's share of the rows (every group
+    keeps at least one). Rows holding each group's min/max of the `extremes`
+    columns are always kept so outliers stay visible.
+    """
+    if len(df) <= n:
+        return df
+    rng = np.random.default_rng(random_state)
+    groups = as_str_keys(df[by])
+    # Categorical keys map to categorical counts, so cast before scaling
+    quota = (groups.map(groups.value_counts()).astype(float) * n / len(df)).clip(lower=1)
+    rank = pd.Series(rng.random(len(df)), index=df.index).groupby(groups, observed=True).rank(method="first")
+    keep = rank <= quota
+    for col in extremes:
+        keep.loc[df.groupby(groups, observed=True)[col].idxmin().dropna()] = True
+        keep.loc[df.groupby(groups, observed=True)[col].idxmax().dropna()] = True
+    return df[keep.to_numpy()]
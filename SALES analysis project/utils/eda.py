@@ -1,58 +1,215 @@
 # utils/eda.py
+import os
+import warnings
+
+import numpy as np
 import pandas as pd
 import plotly.express as px
 
+from utils.perf import traced
+from utils.sketches import HeavyHitters, HyperLogLog, QuantileSketch
+
+
+# Frames with more rows than this are profiled with sketches instead of exact statistics
+APPROX_ROWS = int(os.environ.get("SALES_PROFILE_APPROX_ROWS", "1000000"))
+NUMERIC_STATS = ['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max']
+TEXT_STATS = ['count', 'unique', 'top']
+
+
+class DataProfile:
+    """
+    Per-column statistics of one (filtered) frame, computed in a single pass
+    by profile_frame(): count and missing cells for every column, moments and
+    quartiles for numeric columns, distinct count and most frequent value for
+    text/categorical columns. The summary table, missing-values table and
+    total missing count are all read from it.
+    """
+
+    def __init__(self, stats: pd.DataFrame, rows: int, approximate: bool = False):
+        self.stats = stats
+        self.rows = rows
+        self.approximate = approximate
+
+    @property
+    def missing_counts(self) -> pd.Series:
+        return self.stats['missing'] if len(self.stats) else pd.Series(dtype="int64")
+
+    @property
+    def total_missing(self) -> int:
+        return int(self.missing_counts.sum())
+
+    def missing_table(self) -> pd.DataFrame:
+        return missing_table_from_counts(self.missing_counts, self.rows)
+
+    def summary(self) -> pd.DataFrame:
+        """Combined numeric + text summary in the layout get_summary() has always returned."""
+        if not self.rows:
+            return pd.DataFrame()
+        numeric = self.stats[self.stats['kind'] == 'numeric'][NUMERIC_STATS].astype(float).fillna(0)
+        numeric = numeric.rename_axis('column').reset_index()
+        objs_df = self.stats[self.stats['kind'] == 'text'][TEXT_STATS].rename_axis('column').reset_index()
+        if not objs_df.empty:
+            return pd.concat([numeric, objs_df], ignore_index=True, sort=False).fillna("")
+        return numeric
+
+    def __sizeof__(self):
+        return int(self.stats.memory_usage(deep=True).sum())
+
+
+def _column_kinds(df: pd.DataFrame) -> dict:
+    numeric = set(df.select_dtypes(include=['number']).columns)
+    text = set(df.select_dtypes(include=['object', 'category', 'string']).columns)
+    return {c: 'numeric' if c in numeric else 'text' if c in text else 'other' for c in df.columns}
+
+
+def _top_value(uniques, counts: np.ndarray):
+    """Most frequent value; ties go to the smallest value, as with Series.mode()."""
+    tied = [uniques[i] for i in np.flatnonzero(counts == counts.max())]
+    try:
+        return min(tied)
+    except TypeError:
+        return tied[0]
+
 
-def get_summary(df: pd.DataFrame) -> pd.DataFrame:
+def _exact_stats(df: pd.DataFrame, kinds: dict) -> dict:
+    n = len(df)
+    stats = {}
+    numeric_cols = [c for c, k in kinds.items() if k == 'numeric']
+    if numeric_cols:
+        # One float block for every numeric column; quantiles 0 and 1 give min and max
+        values = df[numeric_cols].to_numpy(dtype=float, na_value=np.nan)
+        counts = (~np.isnan(values)).sum(axis=0)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN columns
+            means = np.nanmean(values, axis=0)
+            stds = np.nanstd(values, axis=0, ddof=1)
+            qs = np.nanquantile(values, [0, 0.25, 0.5, 0.75, 1], axis=0)
+        for i, col in enumerate(numeric_cols):
+            stats[col] = {'count': int(counts[i]), 'missing': n - int(counts[i]), 'mean': means[i], 'std': stds[i],
+                          'min': qs[0, i], '25%': qs[1, i], '50%': qs[2, i], '75%': qs[3, i], 'max': qs[4, i]}
+    for col, kind in kinds.items():
+        if kind == 'text':
+            s = df[col]
+            codes, uniques = (s.cat.codes.to_numpy(), s.cat.categories) if isinstance(s.dtype, pd.CategoricalDtype) \
+                else pd.factorize(s)
+            freq = np.bincount(codes[codes >= 0], minlength=len(uniques))
+            count = int(freq.sum())
+            stats[col] = {'count': count, 'missing': n - count, 'unique': int((freq > 0).sum()),
+                          'top': _top_value(uniques, freq) if count else None}
+        elif kind == 'other':
+            count = int(df[col].notna().sum())
+            stats[col] = {'count': count, 'missing': n - count}
+    return stats
+
+
+def _approx_stats(df: pd.DataFrame, kinds: dict, chunk_rows: int) -> dict:
+    """Chunked pass: exact count/mean/std/min/max, sketched quartiles, distinct counts and top values."""
+    acc = {}
+    for col, kind in kinds.items():
+        acc[col] = {'count': 0}
+        if kind == 'numeric':
+            acc[col].update(mean=0.0, m2=0.0, min=np.inf, max=-np.inf, sketch=QuantileSketch())
+        elif kind == 'text':
+            acc[col].update(hll=HyperLogLog(), top=HeavyHitters())
+
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows]
+        for col, kind in kinds.items():
+            a = acc[col]
+            if kind == 'numeric':
+                values = chunk[col].to_numpy(dtype=float, na_value=np.nan)
+                values = values[~np.isnan(values)]
+                if not len(values):
+                    continue
+                # Chan et al. parallel update of the running mean and sum of squared deviations
+                n_a, n_b, mean_b = a['count'], len(values), values.mean()
+                delta = mean_b - a['mean']
+                a['m2'] += ((values - mean_b) ** 2).sum() + delta ** 2 * n_a * n_b / (n_a + n_b)
+                a['mean'] += delta * n_b / (n_a + n_b)
+                a['count'] = n_a + n_b
+                a['min'], a['max'] = min(a['min'], values.min()), max(a['max'], values.max())
+                a['sketch'].update(values)
+            else:
+                values = chunk[col].dropna()
+                a['count'] += len(values)
+                if kind == 'text':
+                    a['hll'].update(values)
+                    a['top'].update(values)
+
+    n = len(df)
+    stats = {}
+    for col, kind in kinds.items():
+        a = acc[col]
+        row = {'count': a['count'], 'missing': n - a['count']}
+        if kind == 'numeric' and a['count']:
+            sketch = a['sketch']
+            row.update(mean=a['mean'], std=np.sqrt(a['m2'] / (a['count'] - 1)) if a['count'] > 1 else np.nan,
+                       min=a['min'], max=a['max'], **{'25%': sketch.quantile(0.25), '50%': sketch.quantile(0.5),
+                                                       '75%': sketch.quantile(0.75)})
+        elif kind == 'text':
+            top = a['top'].top(1)
+            row.update(unique=min(a['hll'].estimate(), a['count']), top=top[0][0] if top else None)
+        stats[col] = row
+    return stats
+
+
+@traced
+def profile_frame(df: pd.DataFrame, approximate: bool = None, chunk_rows: int = 200_000) -> DataProfile:
+    """
+    Profile every column of df in one pass. approximate=None switches to
+    sketches (quantile sketch, HyperLogLog distinct count, Misra-Gries top
+    value) above APPROX_ROWS rows; counts, missing, mean, std, min and max
+    stay exact in both modes.
+    """
+    if df is None or df.empty:
+        return DataProfile(pd.DataFrame(), 0)
+    if approximate is None:
+        approximate = len(df) > APPROX_ROWS
+    kinds = _column_kinds(df)
+    stats = _approx_stats(df, kinds, chunk_rows) if approximate else _exact_stats(df, kinds)
+    table = pd.DataFrame.from_dict(stats, orient='index').reindex(df.columns)
+    table.insert(0, 'kind', pd.Series(kinds))
+    return DataProfile(table, len(df), approximate)
+
+
+def get_summary(df: pd.DataFrame, profile: DataProfile = None) -> pd.DataFrame:
     """Return a combined numeric + object summary dataframe for display"""
     if df is None or df.empty:
         return pd.DataFrame()
-
-    # Numeric summary
-    numeric = df.select_dtypes(include=['number']).describe().T
-    numeric = numeric[['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max']].fillna(0)
-    numeric = numeric.reset_index().rename(columns={'index': 'column'})
-
-    # Text column summary
-    objs = []
-    for col in df.select_dtypes(include=['object']).columns:
-        objs.append({
-            "column": col,
-            "count": df[col].notna().sum(),
-            "unique": df[col].nunique(),
-            "top": df[col].mode().iloc[0] if not df[col].mode().empty else None
-        })
-    objs_df = pd.DataFrame(objs)
-    if not objs_df.empty:
-        objs_df = objs_df[['column', 'count', 'unique', 'top']]
-
-    # Combine numeric + object summary
-    if not objs_df.empty:
-        return pd.concat([numeric, objs_df], ignore_index=True, sort=False).fillna("")
-    else:
-        return numeric
+    return (profile or profile_frame(df)).summary()
 
 
-def total_missing(df):
+def total_missing(df, profile: DataProfile = None):
     """Return total number of missing cells in the dataframe"""
     if df is None or df.empty:
         return 0
-    return int(df.isna().sum().sum())
+    return profile.total_missing if profile else int(df.isna().sum().sum())
 
 
-def get_missing_values_table(df):
+def get_missing_values_table(df, profile: DataProfile = None):
     """Return a table with missing count and percentage per column"""
     if df is None or df.empty:
         return pd.DataFrame()
-    mv = df.isna().sum().reset_index()
+    return profile.missing_table() if profile else missing_table_from_counts(df.isna().sum(), len(df))
+
+
+def missing_table_from_counts(counts: pd.Series, n_rows: int) -> pd.DataFrame:
+    """Build the missing-values table from per-column missing counts (e.g. streamed)"""
+    if counts is None or not n_rows:
+        return pd.DataFrame()
+    mv = counts.reset_index()
     mv.columns = ['column', 'missing_count']
-    mv['missing_pct'] = (mv['missing_count'] / len(df) * 100).round(2)
+    mv['missing_pct'] = (mv['missing_count'] / n_rows * 100).round(2)
     return mv.sort_values('missing_count', ascending=False)
 
 
-def missing_values_chart(df):
+def missing_values_chart(df, profile: DataProfile = None):
     """Return a Plotly bar chart showing missing % by column."""
-    mv = get_missing_values_table(df)
+    return plot_missing_values(get_missing_values_table(df, profile))
+
+
+def plot_missing_values(mv):
+    """Return a Plotly bar chart from a missing-values table."""
 
     # If no data or no missing values, return a placeholder figure
     if mv is None or mv.empty or mv['missing_count'].sum() == 0:
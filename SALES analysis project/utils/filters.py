@@ -0,0 +1,268 @@
+# utils/filters.py
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from utils.perf import traced
+
+
+def as_str_keys(s: pd.Series) -> pd.Series:
+    """
+    Group/filter keys as strings. Categorical columns keep their codes and
+    only their (few) categories are converted, instead of every row.
+    """
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        if pd.api.types.infer_dtype(s.cat.categories) == "string":
+            return s
+        return s.cat.rename_categories(s.cat.categories.astype(str))
+    return s.astype(str)
+
+
+def _str_values(s: pd.Series) -> pd.Series:
+    """Values as strings, missing ones as "nan" (pandas' str dtype keeps them missing)."""
+    return s.astype(str).fillna("nan")
+
+
+def category_options(s: pd.Series) -> list:
+    """Distinct values present in s, as strings, in order of first appearance."""
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        codes = pd.unique(s.cat.codes.to_numpy())
+        return [str(s.cat.categories[c]) if c >= 0 else "nan" for c in codes]
+    return _str_values(s).unique().tolist()
+
+
+def isin_mask(s: pd.Series, values) -> np.ndarray:
+    """Boolean mask of rows whose string value is in values; compares codes for categoricals."""
+    wanted = {str(v) for v in values}
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        cats = s.cat.categories.astype(str)
+        wanted_codes = np.flatnonzero(cats.isin(wanted))
+        if "nan" in wanted:
+            wanted_codes = np.append(wanted_codes, -1)
+        return np.isin(s.cat.codes.to_numpy(), wanted_codes)
+    return _str_values(s).isin(wanted).to_numpy()
+
+
+def whole_days(date_range):
+    """
+    (start, end) of a sidebar date range with end moved to the last instant
+    of its day, so every row dated on the end date is included - the same
+    days the cube's and time series' daily buckets cover.
+    """
+    start, end = pd.Timestamp(date_range[0]), pd.Timestamp(date_range[1])
+    return start, end.normalize() + pd.Timedelta(days=1) - pd.Timedelta(1, "ns")
+
+
+def filter_frame(df: pd.DataFrame, date_col=None, date_range=None, category_col=None, categories=None,
+                 sales_col=None, sales_range=None) -> pd.DataFrame:
+    """Apply the dashboard's date range, category selection and sales range filters in one mask."""
+    mask = np.ones(len(df), dtype=bool)
+    if date_col and date_range:
+        start, end = whole_days(date_range)
+        mask &= ((df[date_col] >= start) & (df[date_col] <= end)).to_numpy()
+    if category_col and categories:
+        mask &= isin_mask(df[category_col], categories)
+    if sales_col and sales_range:
+        mask &= ((df[sales_col] >= sales_range[0]) & (df[sales_col] <= sales_range[1])).to_numpy()
+    return df if mask.all() else df[mask]
+
+
+def _row_dtype(n: int):
+    return np.int32 if n < 2 ** 31 else np.int64
+
+
+class _SortedColumn:
+    """Values of one column plus their sort order, for binary-search range lookups."""
+
+    def __init__(self, values: np.ndarray):
+        self.values = values
+        # Frames come out of finalize_dataset() sorted by date, so the date column needs no argsort
+        self.order = None if _is_sorted(values) else np.argsort(values, kind="stable").astype(_row_dtype(len(values)))
+        self.sorted = values if self.order is None else values[self.order]
+
+    def bounds(self, low, high):
+        """Binary search: positions in sorted order of the first and past-the-last value in [low, high]."""
+        return int(np.searchsorted(self.sorted, low, side="left")), int(np.searchsorted(self.sorted, high, side="right"))
+
+    def rows(self, lo: int, hi: int):
+        """Rows for a bounds() result: a slice if the column is stored sorted, else sorted row positions."""
+        return slice(lo, hi) if self.order is None else np.sort(self.order[lo:hi])
+
+    def extend(self, values: np.ndarray) -> "_SortedColumn":
+        """
+        Index over these values followed by `values`: the new values are sorted
+        and merged in by binary search, so only the appended part is sorted.
+        """
+        n = len(self.values)
+        values = values.astype(self.values.dtype, copy=False)
+        out = _SortedColumn.__new__(_SortedColumn)
+        out.values = np.concatenate([self.values, values])
+        if self.order is None and _is_sorted(values) and (not n or not len(values) or values[0] >= self.values[-1]):
+            out.order, out.sorted = None, out.values
+            return out
+        order = np.argsort(values, kind="stable")
+        at = np.searchsorted(self.sorted, values[order], side="right")
+        base_order = np.arange(n) if self.order is None else self.order
+        out.order = np.insert(base_order, at, order + n).astype(_row_dtype(len(out.values)))
+        out.sorted = np.insert(self.sorted, at, values[order])
+        return out
+
+    def check(self, low, high):
+        def in_range(selection):
+            values = self.values[selection]
+            return (values >= low) & (values <= high)
+        return in_range
+
+
+def _is_sorted(values: np.ndarray) -> bool:
+    return len(values) < 2 or bool((values[1:] >= values[:-1]).all())
+
+
+def _positions(selection) -> np.ndarray:
+    return np.arange(selection.start, selection.stop) if isinstance(selection, slice) else selection
+
+
+def selection_size(selection) -> int:
+    return selection.stop - selection.start if isinstance(selection, slice) else len(selection)
+
+
+class FilterIndex:
+    """
+    Sorted indexes over a cleaned frame's date and sales columns plus
+    per-category row sets, built once per dataset. select() answers the
+    sidebar's date range / category / sales range filters from the most
+    selective index (binary search for ranges, the row set for categories),
+    then checks the other predicates on those candidate rows only.
+    Selections are row slices (for a date range on the date-sorted frame)
+    or sorted row positions; take() materializes one.
+    """
+
+    @traced
+    def __init__(self, df: pd.DataFrame, date_col=None, category_col=None, sales_col=None):
+        self.rows = len(df)
+        self.columns = (date_col, category_col, sales_col)
+        self.date = _SortedColumn(df[date_col].to_numpy()) if date_col else None
+        self.sales = _SortedColumn(df[sales_col].to_numpy(dtype=float, na_value=np.nan)) if sales_col else None
+        self.slots = self.categories = None
+        if category_col:
+            s = df[category_col]
+            if isinstance(s.dtype, pd.CategoricalDtype):
+                codes, categories = s.cat.codes.to_numpy(), s.cat.categories
+            else:
+                codes, categories = pd.factorize(s)
+            self.categories = pd.Index(categories).astype(str)
+            # One slot per category plus a last slot for missing values
+            self.slots = np.where(codes < 0, len(categories), codes).astype(_row_dtype(len(categories) + 1))
+            counts = np.bincount(self.slots, minlength=len(categories) + 1)
+            self._slot_counts = counts
+            self._slot_starts = np.concatenate([[0], np.cumsum(counts)])
+            self._slot_order = np.argsort(self.slots, kind="stable").astype(_row_dtype(self.rows))
+
+    @traced
+    def extend(self, delta: pd.DataFrame) -> "FilterIndex":
+        """
+        Index over the frame with delta's rows appended at the end (positions
+        rows, rows + 1, ...), merging delta into the existing sorted arrays and
+        category row sets instead of rebuilding them.
+        """
+        date_col, category_col, sales_col = self.columns
+        n = self.rows
+        out = FilterIndex.__new__(FilterIndex)
+        out.rows = n + len(delta)
+        out.columns = self.columns
+        out.date = self.date.extend(delta[date_col].to_numpy()) if self.date else None
+        out.sales = self.sales.extend(delta[sales_col].to_numpy(dtype=float, na_value=np.nan)) if self.sales else None
+        out.slots = out.categories = None
+        if self.slots is not None:
+            s = delta[category_col]
+            codes, uniques = (s.cat.codes.to_numpy(), s.cat.categories) if isinstance(s.dtype, pd.CategoricalDtype) \
+                else pd.factorize(s)
+            uniques = pd.Index(uniques).astype(str)
+            out.categories = self.categories.append(uniques[~uniques.isin(self.categories)].unique())
+            missing = len(out.categories)
+            # Code -1 (missing) picks the last entry: the missing slot
+            lookup = np.append(out.categories.get_indexer(uniques), missing)
+            dtype = _row_dtype(missing + 1)
+            old_slots = np.where(self.slots == len(self.categories), missing, self.slots).astype(dtype)
+            new_slots = lookup[codes].astype(dtype)
+            out.slots = np.concatenate([old_slots, new_slots])
+
+            new_counts = np.bincount(new_slots, minlength=missing + 1)
+            new_starts = np.concatenate([[0], np.cumsum(new_counts)])
+            new_order = np.argsort(new_slots, kind="stable") + n
+            # Old slot i (missing moved to the end) keeps its rows, then gets the delta's rows
+            old_counts = np.zeros(missing + 1, dtype=np.int64)
+            old_counts[:len(self.categories)] = self._slot_counts[:-1]
+            old_counts[missing] = self._slot_counts[-1]
+            old_slot = np.concatenate([np.arange(len(self.categories)), [missing]])
+            old_starts = np.zeros(missing + 1, dtype=np.int64)
+            old_starts[old_slot] = self._slot_starts[:-1]
+            parts = []
+            for i in range(missing + 1):
+                parts += [self._slot_order[old_starts[i]:old_starts[i] + old_counts[i]],
+                          new_order[new_starts[i]:new_starts[i + 1]]]
+            out._slot_counts = old_counts + new_counts
+            out._slot_starts = np.concatenate([[0], np.cumsum(out._slot_counts)])
+            out._slot_order = np.concatenate(parts).astype(_row_dtype(out.rows))
+        return out
+
+    def _category_lookup(self, categories) -> np.ndarray:
+        """Boolean table indexed by slot: which categories (and missing) are wanted."""
+        wanted = {str(c) for c in categories}
+        return np.append(self.categories.isin(wanted), "nan" in wanted)
+
+    def _category_rows(self, lookup: np.ndarray) -> np.ndarray:
+        parts = [self._slot_order[self._slot_starts[i]:self._slot_starts[i + 1]] for i in np.flatnonzero(lookup)]
+        return np.sort(np.concatenate(parts)) if parts else np.array([], dtype=self._slot_order.dtype)
+
+    @traced
+    def select(self, date_range=None, categories=None, sales_range=None):
+        """Rows matching all given filters, as a slice or a sorted position array."""
+        # Candidate drivers: (exact row count, build the row set, check the predicate on given rows).
+        # Only the smallest row set is built; the other predicates are checked on it.
+        drivers = []
+        for col, bounds in ((self.date, date_range), (self.sales, sales_range)):
+            if col is not None and bounds:
+                if col is self.date:
+                    low, high = (np.datetime64(d, "ns").astype(col.values.dtype) for d in whole_days(bounds))
+                else:
+                    low, high = float(bounds[0]), float(bounds[1])
+                lo, hi = col.bounds(low, high)
+                drivers.append((hi - lo, partial(col.rows, lo, hi), col.check(low, high)))
+        if self.slots is not None and categories:
+            lookup = self._category_lookup(categories)
+            if not lookup[self._slot_counts > 0].all():
+                drivers.append((int(self._slot_counts[lookup].sum()), partial(self._category_rows, lookup),
+                                lambda selection: lookup[self.slots[selection]]))
+        if not drivers:
+            return slice(0, self.rows)
+
+        drivers.sort(key=lambda d: d[0])
+        selection = drivers[0][1]()
+        for _, _, check in drivers[1:]:
+            keep = check(selection)
+            if not keep.all():
+                selection = _positions(selection)[keep]
+        return selection
+
+    def category_options(self, selection=slice(None)) -> list:
+        """Categories present in the selection, as strings, in order of first appearance."""
+        slots = pd.unique(self.slots[selection])
+        return [self.categories[c] if c < len(self.categories) else "nan" for c in slots]
+
+    def date_bounds(self, selection=slice(None)):
+        dates = self.date.values[selection]
+        return (pd.Timestamp(dates.min()), pd.Timestamp(dates.max())) if len(dates) else (None, None)
+
+    def sales_bounds(self, selection=slice(None)):
+        values = self.sales.values[selection]
+        return (float(np.nanmin(values)), float(np.nanmax(values))) if len(values) else (None, None)
+
+
+@traced
+def take(df: pd.DataFrame, selection) -> pd.DataFrame:
+    """Materialize a FilterIndex selection; a full-range slice returns df itself."""
+    if isinstance(selection, slice) and selection.start == 0 and selection.stop == len(df):
+        return df
+    return df.iloc[selection]
@@ -0,0 +1,84 @@
+# utils/ingest.py
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from utils.cache import LRUCache, content_hash, make_key
+from utils.cleaning import clean_data, infer_column_types
+from utils.perf import traced
+from utils.pipeline import dataset_cache, finalize_dataset, read_upload, standardize_columns
+
+SOURCE_COLUMN = "source_file"
+
+
+def _is_excel(name: str) -> bool:
+    return name.lower().endswith((".xlsx", ".xls"))
+
+
+def list_tasks(sources, all_sheets: bool = False):
+    """
+    Expand (name, data) sources into (name, data, sheet) parse tasks.
+    data is the raw bytes, or None to read from the path `name`.
+    With all_sheets, every worksheet of a workbook becomes its own task;
+    otherwise only the first sheet is read, as for a single upload.
+    """
+    tasks = []
+    for name, data in sources:
+        if _is_excel(name) and all_sheets:
+            with pd.ExcelFile(name if data is None else io.BytesIO(data)) as book:
+                tasks += [(name, data, sheet) for sheet in book.sheet_names]
+        else:
+            tasks.append((name, data, 0 if _is_excel(name) else None))
+    return tasks
+
+
+def _load_one(name, data, sheet, encoding):
+    """Worker: parse and clean one file or worksheet. Returns (label, cleaned frame)."""
+    df = read_upload(data, name, encoding, sheet_name=sheet if sheet is not None else 0)
+    df = clean_data(standardize_columns(df), copy=False)
+    label = os.path.basename(name)
+    if isinstance(sheet, str):
+        label = f"{label}:{sheet}"
+    return label, df
+
+
+@traced
+def ingest_files(sources, all_sheets: bool = False, max_workers: int = None, encoding: str = "latin1"):
+    """
+    Parse and clean several files (and optionally every sheet of each
+    workbook) in parallel worker processes, then concatenate them with a
+    source_file column and run detection once on the combined frame.
+    Column names are reconciled through standardize_columns(); columns
+    missing from some files are left empty there.
+    Returns (df_cleaned, col_info, column_types) like prepare_dataset().
+    """
+    tasks = list_tasks(sources, all_sheets)
+    workers = min(len(tasks), max_workers or os.cpu_count() or 1)
+    if workers <= 1:
+        results = [_load_one(name, data, sheet, encoding) for name, data, sheet in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_load_one, *zip(*tasks), [encoding] * len(tasks)))
+
+    frames = []
+    for label, df in results:
+        df[SOURCE_COLUMN] = label
+        frames.append(df)
+    combined = pd.concat(frames, ignore_index=True, sort=False) if frames else pd.DataFrame()
+    column_types = infer_column_types(combined)
+    df_cleaned, col_info = finalize_dataset(combined)
+    return df_cleaned, col_info, column_types
+
+
+def files_key(sources, all_sheets: bool = False, encoding: str = "latin1") -> str:
+    """Identity of a multi-file dataset: every file's name and content hash plus options."""
+    return make_key("files", [(os.path.basename(n), content_hash(d)) for n, d in sources], all_sheets, encoding)
+
+
+def load_files(sources, all_sheets: bool = False, cache: LRUCache = None, key: str = None, **options):
+    """Cached ingest_files() for uploaded (name, bytes) sources."""
+    cache = dataset_cache if cache is None else cache
+    key = key or files_key(sources, all_sheets, options.get("encoding", "latin1"))
+    return cache.get_or_compute(key, lambda: ingest_files(sources, all_sheets, **options))
@@ -1,27 +1,122 @@
 # utils/insights.py
 import pandas as pd
 
-def generate_insights(df: pd.DataFrame, sales_col: str, profit_col: str, category_col: str):
+from utils.perf import traced
+from utils.timeseries import ROLLING_WINDOW, TimeSeries
+
+
+def _pm(value: float, error: float) -> str:
+    """An estimate with its 95% interval, e.g. '$1,234 ± $56'."""
+    return f"${value:,.0f} ± ${error:,.0f}"
+
+
+def _separated(top: pd.DataFrame, n: int) -> pd.DataFrame:
+    """
+    The leading rows of an estimated ranking (columns value, error; one row
+    more than shown) whose intervals do not overlap the next row's, i.e. the
+    places the sample is sure about. Empty when even the first is uncertain.
+    """
+    lower = (top["value"] - top["error"]).to_numpy()
+    upper = (top["value"] + top["error"]).to_numpy()
+    sure = 0
+    while sure < min(n, len(top) - 1) and lower[sure] > upper[sure + 1]:
+        sure += 1
+    if sure == len(top) - 1 and sure < n:
+        sure += 1  # every group is listed, and the last one has no neighbour below it
+    return top.head(sure)
+
+
+def _change(value: float, what: str, period: str) -> str:
+    return f"{what} {'grew' if value >= 0 else 'declined'} {abs(value):.1%} {period}"
+
+
+def trend_insights(monthly: pd.DataFrame, sales_col: str, profit_col: str = None) -> list:
+    """
+    Month-over-month, year-over-year and rolling-trend notes from a monthly
+    TimeSeries.series() frame. Only complete months are compared, so a
+    partly covered first or last month never reads as a drop.
+    """
+    insights = []
+    months = monthly[monthly["complete"]]
+    if months.empty:
+        return insights
+    last = months.iloc[-1]
+    label = months.index[-1].strftime("%B %Y")
+    insights.append(f"Sales in {label} (latest full month): ${last[sales_col]:,.0f}")
+    if pd.notna(last[f"{sales_col}_pop"]):
+        insights.append(_change(last[f"{sales_col}_pop"], "Sales", f"month over month in {label}") + ".")
+    if pd.notna(last[f"{sales_col}_yoy"]):
+        insights.append(_change(last[f"{sales_col}_yoy"], "Sales", f"year over year in {label}")
+                        + f" (vs {(months.index[-1] - pd.DateOffset(years=1)).strftime('%B %Y')}).")
+    if profit_col and profit_col in monthly.columns and pd.notna(last[f"{profit_col}_pop"]):
+        insights.append(_change(last[f"{profit_col}_pop"], "Profit", f"month over month in {label}")
+                        + f" (${last[profit_col]:,.0f}).")
+
+    # Rolling average of the last full months vs the same window just before it
+    window = ROLLING_WINDOW["MS"]
+    rolling = months[f"{sales_col}_rolling"]
+    if len(months) >= 2 * window and rolling.iloc[-1 - window]:
+        recent = rolling.iloc[-1]
+        insights.append(_change(recent / rolling.iloc[-1 - window] - 1, f"{window}-month average sales",
+                                f"vs the {window} months before") + f" (${recent:,.0f} per month).")
+    return insights
+
+
+@traced
+def generate_insights(df: pd.DataFrame, sales_col: str, profit_col: str, category_col: str, cube=None,
+                      missing_cells: int = None, date_col: str = None, sample=None):
+    """
+    Build the list of insight strings for the filtered data.
+    If a CubeSlice (utils.cube) matching df is given, totals and rankings are
+    read from it instead of grouping the rows again; missing_cells, if known
+    (e.g. from a DataProfile), saves another scan for the data quality note.
+    Month-over-month and year-over-year notes come from the cube's time series,
+    or from date_col when no cube is given. With a SampleView (utils.approx),
+    totals, rankings and the missing-cell count are estimates with 95% bounds.
+    """
     insights = []
     if df is None or df.empty:
         return insights
 
     # Basic checks
     if sales_col and sales_col in df.columns:
-        total_sales = df[sales_col].sum()
-        insights.append(f"Total sales (filtered): ${total_sales:,.0f}")
-        # monthly trend if date present
+        if sample:
+            insights.append(f"Total sales (filtered, estimated): {_pm(*sample.total(sales_col))}")
+        else:
+            total_sales = cube.totals()[f"{sales_col}__sum"] if cube else df[sales_col].sum()
+            insights.append(f"Total sales (filtered): ${total_sales:,.0f}")
+        # Monthly trend if a date is present
+        if cube and cube.has("date"):
+            monthly = cube.series("MS")
+        elif date_col and date_col in df.columns and pd.api.types.is_datetime64_any_dtype(df[date_col]):
+            monthly = TimeSeries.from_frame(df, date_col, [c for c in (sales_col, profit_col) if c in df.columns]) \
+                .series("MS")
+        else:
+            monthly = None
+        if monthly is not None:
+            insights += trend_insights(monthly, sales_col, profit_col)
         # Top categories
-        if category_col and category_col in df.columns:
-            top = df.groupby(category_col)[sales_col].sum().sort_values(ascending=False).head(3)
+        if category_col and category_col in df.columns and sample:
+            top = sample.top(category_col, sales_col, 3)
+            top_items = ", ".join([f"{idx} ({_pm(r.value, r.error)})" for idx, r in top.iterrows()])
+            insights.append(f"Top categories by sales (estimated): {top_items}")
+        elif category_col and category_col in df.columns:
+            if cube and cube.has("category"):
+                top = cube.top("category", sales_col, 3)
+            else:
+                top = df.groupby(category_col, observed=True)[sales_col].sum().sort_values(ascending=False).head(3)
             top_items = ", ".join([f"{idx} (${v:,.0f})" for idx, v in top.items()])
             insights.append(f"Top categories by sales: {top_items}")
     else:
         insights.append("Cannot generate sales insights: Sales column missing.")
 
     if profit_col and profit_col in df.columns:
-        total_profit = df[profit_col].sum()
-        insights.append(f"Total profit (filtered): ${total_profit:,.0f}")
+        if sample:
+            total_profit, error = sample.total(profit_col)
+            insights.append(f"Total profit (filtered, estimated): {_pm(total_profit, error)}")
+        else:
+            total_profit = cube.totals()[f"{profit_col}__sum"] if cube else df[profit_col].sum()
+            insights.append(f"Total profit (filtered): ${total_profit:,.0f}")
         if total_profit < 0:
             insights.append("Alert: Total profit is negative. Investigate high-cost or low-margin items.")
     else:
@@ -34,13 +129,29 @@ def generate_insights(df: pd.DataFrame, sales_col: str, profit_col: str, categor
             cust_cols = [c for c in df.columns if 'customer' in c.lower()]
             if cust_cols:
                 cust = cust_cols[0]
-                cust_sum = df.groupby(cust)[sales_col].sum().sort_values(ascending=False).head(5)
-                insights.append("Top customers by sales: " + ", ".join([f"{c} (${v:,.0f})" for c, v in cust_sum.items()]))
+                # Estimated ranks are only shown as far as their intervals keep them apart
+                top = _separated(sample.top(cust, sales_col, 6), 5) \
+                    if sample and sample.reservoir.customer_col == cust else None
+                if top is not None and len(top):
+                    insights.append("Top customers by sales (estimated): "
+                                    + ", ".join([f"{c} ({_pm(r.value, r.error)})" for c, r in top.iterrows()]))
+                else:
+                    if cube and cube.column("customer") == cust:
+                        cust_sum = cube.top("customer", sales_col, 5)
+                    else:
+                        cust_sum = df.groupby(cust, observed=True)[sales_col].sum().sort_values(ascending=False).head(5)
+                    insights.append("Top customers by sales: " + ", ".join([f"{c} (${v:,.0f})" for c, v in cust_sum.items()]))
 
     # Data quality note
-    missing_cells = int(df.isna().sum().sum())
-    if missing_cells > 0:
-        insights.append(f"Data quality: {missing_cells} missing cells found. Consider imputation or cleaning.")
+    if missing_cells is None and sample:
+        missing, error = sample.missing_cells()
+        found = f"about {missing:,.0f} ± {error:,.0f} missing cells (estimated)" if round(missing) else None
+    else:
+        if missing_cells is None:
+            missing_cells = int(df.isna().sum().sum())
+        found = f"{missing_cells} missing cells" if missing_cells > 0 else None
+    if found:
+        insights.append(f"Data quality: {found} found. Consider imputation or cleaning.")
     else:
         insights.append("Data quality: No missing cells detected in the filtered dataset.")
 
@@ -0,0 +1,72 @@
+# utils/kpis.py
+import pandas as pd
+
+from utils.eda import total_missing
+from utils.perf import traced
+
+NOT_FOUND = "Warning: Column not found"
+
+
+@traced
+def compute_kpis(df: pd.DataFrame, sales_col=None, profit_col=None, cube=None, profile=None,
+                 missing_cells: int = None) -> dict:
+    """
+    Raw KPI numbers for the filtered rows (None where the source column was
+    not detected), in the same shape as StreamingAggregator.kpis().
+    If a CubeSlice or DataProfile (utils.eda) matching df is given, totals
+    and the missing-cell count are read from them; a known missing_cells
+    count (e.g. the whole dataset's, for an unfiltered view) is used as is.
+    """
+    totals = cube.totals() if cube else {}
+    kpi = {"total_sales": None, "total_profit": None, "avg_sales": None,
+           "total_missing": total_missing(df, profile) if missing_cells is None else int(missing_cells)}
+    if sales_col:
+        if cube:
+            kpi["total_sales"] = totals[f"{sales_col}__sum"]
+            kpi["avg_sales"] = totals.get(f"{sales_col}__mean")
+        else:
+            kpi["total_sales"] = df[sales_col].sum()
+            kpi["avg_sales"] = df[sales_col].mean() if len(df) else None
+    if profit_col:
+        kpi["total_profit"] = totals[f"{profit_col}__sum"] if cube else df[profit_col].sum()
+    return kpi
+
+
+def _money(value, fmt: str = ",.0f") -> str:
+    return NOT_FOUND if value is None or pd.isna(value) else f"${value:{fmt}}"
+
+
+def kpi_table(kpi: dict) -> dict:
+    """Format raw KPIs as the {metric: text} dict shown on the dashboard and in the PDF report."""
+    return {
+        "Total Sales": _money(kpi["total_sales"]),
+        "Total Profit": _money(kpi["total_profit"]),
+        "Average Sales": _money(kpi["avg_sales"], ",.2f"),
+        "Total Missing Cells": f"{kpi['total_missing']:,}",
+    }
+
+
+def estimate_kpis(sample, sales_col=None, profit_col=None) -> dict:
+    """KPIs as Estimate(value, error) pairs from a SampleView (utils.approx); None where the column is missing."""
+    return {
+        "total_sales": sample.total(sales_col) if sales_col else None,
+        "total_profit": sample.total(profit_col) if profit_col else None,
+        "avg_sales": sample.mean(sales_col) if sales_col else None,
+        "total_missing": sample.missing_cells(),
+    }
+
+
+def estimate_table(estimates: dict) -> dict:
+    """Format estimated KPIs as {metric: (value text, 95% bound text)}, with the kpi_table() metric names."""
+    def pair(est, fmt=",.0f", money=True):
+        if est is None or est.value is None:
+            return NOT_FOUND, ""
+        unit = "$" if money else ""
+        return f"≈ {unit}{est.value:{fmt}}", f"± {unit}{est.error:{fmt}} (95% CI)"
+
+    return {
+        "Total Sales": pair(estimates["total_sales"]),
+        "Total Profit": pair(estimates["total_profit"]),
+        "Average Sales": pair(estimates["avg_sales"], ",.2f"),
+        "Total Missing Cells": pair(estimates["total_missing"], money=False),
+    }
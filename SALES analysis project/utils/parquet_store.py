@@ -0,0 +1,168 @@
+# utils/parquet_store.py
+import json
+import os
+
+import pandas as pd
+
+from utils.filters import category_options, isin_mask, whole_days
+from utils.perf import traced
+from utils.pipeline import detected_columns
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:  # the dashboard still works fully in memory without pyarrow
+    PARQUET_AVAILABLE = False
+
+STORE_DIR = os.environ.get("SALES_DATASET_DIR", ".sales_cache")
+# Stored datasets are kept up to this total size, least recently opened deleted first
+STORE_MAX_BYTES = int(os.environ.get("SALES_STORE_MAX_MB", "2048")) * 1024 ** 2
+ROW_GROUP_SIZE = 64_000
+_META_KEY = b"sales_dashboard"
+
+
+def dataset_path(key: str, store_dir: str = None) -> str:
+    return os.path.join(store_dir or STORE_DIR, f"{key}.parquet")
+
+
+def _dataset_stats(df: pd.DataFrame, col_info: dict) -> dict:
+    """Bounds and options the sidebar widgets need, so they can be built without reading rows."""
+    sales_col, _, category_col, date_col = detected_columns(col_info)
+    stats = {"rows": len(df)}
+    if date_col and pd.api.types.is_datetime64_any_dtype(df[date_col]) and len(df):
+        stats["date_min"] = df[date_col].min().isoformat()
+        stats["date_max"] = df[date_col].max().isoformat()
+    if category_col:
+        stats["categories"] = category_options(df[category_col])
+    if sales_col and len(df):
+        stats["sales_min"] = float(df[sales_col].min())
+        stats["sales_max"] = float(df[sales_col].max())
+    return stats
+
+
+def _is_string_type(t) -> bool:
+    """Plain or dictionary-encoded (categorical) string columns can take an 'in' filter."""
+    if pa.types.is_dictionary(t):
+        t = t.value_type
+    return pa.types.is_string(t) or pa.types.is_large_string(t)
+
+
+class ParquetDataset:
+    """
+    A cleaned dataset persisted as a single Parquet file whose row groups are
+    sorted by the detected date column. Detection results and widget bounds
+    live in the file's schema metadata, so reopening it skips parsing,
+    cleaning and detection entirely.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        meta = json.loads(pq.read_schema(path).metadata[_META_KEY])
+        self.col_info = {k: tuple(v) for k, v in meta["col_info"].items()}
+        self.column_types = meta["column_types"]
+        self.stats = meta["stats"]
+        self.string_columns = set(meta.get("string_columns", []))
+
+    @property
+    def date_bounds(self):
+        return pd.Timestamp(self.stats["date_min"]).date(), pd.Timestamp(self.stats["date_max"]).date()
+
+    @traced
+    def read(self, date_range=None, categories=None, sales_range=None, columns=None) -> pd.DataFrame:
+        """
+        Read only the rows matching the sidebar filters. Date, sales and
+        (string) category predicates are pushed down to Parquet, so row groups
+        outside the date range are skipped using their statistics.
+        """
+        sales_col, _, category_col, date_col = detected_columns(self.col_info)
+        filters = []
+        if date_col and date_range:
+            start, end = whole_days(date_range)
+            filters += [(date_col, ">=", start), (date_col, "<=", end)]
+        if sales_col and sales_range:
+            filters += [(sales_col, ">=", float(sales_range[0])), (sales_col, "<=", float(sales_range[1]))]
+        push_categories = category_col in self.string_columns
+        filters = pq.filters_to_expression(filters) if filters else None
+        if category_col and categories and push_categories:
+            wanted = [str(c) for c in categories]
+            match = pc.field(category_col).isin(wanted)
+            if "nan" in wanted:
+                # Missing categories are offered as "nan" (see isin_mask); in Parquet they are nulls
+                match = match | pc.field(category_col).is_null()
+            filters = match if filters is None else filters & match
+
+        table = pq.read_table(self.path, columns=columns, filters=filters, memory_map=True)
+        df = table.to_pandas()
+        if category_col and categories and not push_categories:
+            df = df[isin_mask(df[category_col], categories)]
+        return df
+
+
+@traced
+def write_dataset(df: pd.DataFrame, key: str, col_info: dict, column_types: dict,
+                  store_dir: str = None, row_group_size: int = ROW_GROUP_SIZE) -> ParquetDataset:
+    """
+    Persist a cleaned, date-sorted frame and its detection results.
+    Written to a temp file first so concurrent readers never see a partial file.
+    """
+    path = dataset_path(key, store_dir)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    meta = {
+        "col_info": col_info,
+        "column_types": column_types,
+        "stats": _dataset_stats(df, col_info),
+        "string_columns": [f.name for f in table.schema if _is_string_type(f.type)],
+    }
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), _META_KEY: json.dumps(meta).encode()})
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    pq.write_table(table, tmp, row_group_size=row_group_size)
+    os.replace(tmp, path)
+    prune_store(store_dir, keep=(path,))
+    return ParquetDataset(path)
+
+
+def open_dataset(key: str, store_dir: str = None):
+    """Return the stored ParquetDataset for a content hash, or None if it was never written (or was pruned)."""
+    path = dataset_path(key, store_dir)
+    if not PARQUET_AVAILABLE or not os.path.exists(path):
+        return None
+    try:
+        dataset = ParquetDataset(path)
+        os.utime(path)  # the modification time doubles as the last-use time for prune_store()
+        return dataset
+    except Exception:
+        return None
+
+
+def prune_store(store_dir: str = None, max_bytes: int = None, keep=()) -> list:
+    """
+    Delete the least recently used stored datasets until the store fits in
+    max_bytes (STORE_MAX_BYTES by default). Paths in keep are never deleted.
+    Returns the deleted paths.
+    """
+    store_dir = store_dir or STORE_DIR
+    max_bytes = STORE_MAX_BYTES if max_bytes is None else max_bytes
+    files = []
+    for entry in os.scandir(store_dir) if os.path.isdir(store_dir) else ():
+        if entry.is_file() and entry.name.endswith(".parquet"):
+            stat = entry.stat()
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in files)
+    deleted = []
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        if path in keep:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        deleted.append(path)
+    return deleted
@@ -0,0 +1,152 @@
+# utils/perf.py
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+
+import pandas as pd
+
+# Turn the dashboard's Performance panel on by default
+PERF_DEFAULT = os.environ.get("SALES_PERF", "0") == "1"
+
+# The tracer of the current Streamlit rerun (None = tracing off). A context
+# variable keeps concurrent sessions, each running in its own thread, apart.
+_current = contextvars.ContextVar("sales_perf_tracer", default=None)
+
+
+def _rss_bytes():
+    """Resident memory of this process (Linux); None where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _rows(obj):
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return len(obj)
+    if isinstance(obj, tuple) and obj and isinstance(obj[0], (pd.DataFrame, pd.Series)):
+        return len(obj[0])
+    return None
+
+
+class Span:
+    """One timed stage: wall time, nesting depth, rows in/out and resident memory delta."""
+
+    def __init__(self, tracer, name: str, rows_in=None):
+        self.tracer = tracer
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.thread = threading.get_ident()
+
+    def __enter__(self):
+        self.depth = self.tracer._depth
+        self.tracer._depth += 1
+        self.mem_before = _rss_bytes()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.end = time.perf_counter()
+        mem_after = _rss_bytes()
+        self.mem_delta = mem_after - self.mem_before if mem_after is not None and self.mem_before is not None else None
+        self.tracer._depth -= 1
+        self.tracer.spans.append(self)
+        return False
+
+    @property
+    def seconds(self) -> float:
+        return self.end - self.start
+
+
+class _NullSpan:
+    """Returned by span() while tracing is off: a do-nothing context manager."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """Collects the spans of one rerun; activate() makes it the current tracer."""
+
+    def __init__(self):
+        self.spans = []
+        self._depth = 0
+        self.origin = time.perf_counter()
+
+    def activate(self):
+        _current.set(self)
+        return self
+
+    def table(self) -> pd.DataFrame:
+        """Spans in start order, with names indented by nesting depth."""
+        rows = [{
+            "stage": "  " * s.depth + s.name,
+            "ms": round(s.seconds * 1000, 2),
+            "rows in": s.rows_in,
+            "rows out": s.rows_out,
+            "mem Δ MB": round(s.mem_delta / 1024 ** 2, 2) if s.mem_delta is not None else None,
+        } for s in sorted(self.spans, key=lambda s: s.start)]
+        table = pd.DataFrame(rows, columns=["stage", "ms", "rows in", "rows out", "mem Δ MB"])
+        return table.astype({"rows in": "Int64", "rows out": "Int64"})
+
+    def chrome_trace(self) -> dict:
+        """Spans as Chrome trace events (load in chrome://tracing or ui.perfetto.dev)."""
+        events = [{
+            "name": s.name, "ph": "X", "pid": os.getpid(), "tid": s.thread,
+            "ts": round((s.start - self.origin) * 1e6, 1), "dur": round(s.seconds * 1e6, 1),
+            "args": {"rows_in": s.rows_in, "rows_out": s.rows_out, "mem_delta_bytes": s.mem_delta},
+        } for s in self.spans]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def save_chrome_trace(self, path: str) -> str:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f)
+        return path
+
+
+def deactivate():
+    _current.set(None)
+
+
+def span(name: str, rows_in=None):
+    """Context manager timing a stage of the current rerun; free when tracing is off."""
+    tracer = _current.get()
+    return _NULL_SPAN if tracer is None else Span(tracer, name, rows_in)
+
+
+def traced(fn=None, *, name: str = None):
+    """
+    Decorator recording each call as a span named '<module>.<function>'.
+    Rows in/out are taken from a DataFrame first (or second, for methods)
+    argument and a DataFrame result. Costs one context-variable lookup per
+    call while tracing is off.
+    """
+    def wrap(fn):
+        label = name or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            tracer = _current.get()
+            if tracer is None:
+                return fn(*args, **kwargs)
+            rows_in = next((n for n in map(_rows, args[:2]) if n is not None), None)
+            with Span(tracer, label, rows_in) as s:
+                result = fn(*args, **kwargs)
+                s.rows_out = _rows(result)
+            return result
+        return wrapper
+    return wrap(fn) if fn is not None else wrap
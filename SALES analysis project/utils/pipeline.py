@@ -0,0 +1,112 @@
+# utils/pipeline.py
+import io
+import os
+
+import pandas as pd
+
+from utils.cache import LRUCache, content_hash, make_key
+from utils.cleaning import clean_data, compact_frame, explain_column_detection
+from utils.perf import traced
+
+# Shared by every session in the server process; size is configurable with
+# SALES_CACHE_MAX_MB so several users don't exhaust the container.
+dataset_cache = LRUCache(max_bytes=int(os.environ.get("SALES_CACHE_MAX_MB", "1024")) * 1024 ** 2)
+# Store remaining (high-cardinality) text columns as Arrow-backed strings
+ARROW_STRINGS = os.environ.get("SALES_ARROW_STRINGS", "0") == "1"
+
+
+@traced
+def read_upload(data, name: str, encoding: str = "latin1", sheet_name=0) -> pd.DataFrame:
+    """
+    Parse an upload as CSV or Excel depending on the file name.
+    data is the raw bytes, or None to read the file at path `name`.
+    """
+    source = name if data is None else io.BytesIO(data)
+    if name.lower().endswith(".csv"):
+        return pd.read_csv(source, encoding=encoding)
+    return pd.read_excel(source, sheet_name=sheet_name)
+
+
+def standardize_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Lower-case column names and keep only [a-z0-9_] characters."""
+    df.columns = df.columns.str.strip().str.lower().str.replace('[^a-z0-9_]', '', regex=True)
+    return df
+
+
+def detected_columns(col_info: dict):
+    """Return (sales_col, profit_col, category_col, date_col) from a detection mapping."""
+    return tuple(col_info.get(label, (None, 0, ""))[0]
+                 for label in ("Sales Column", "Profit Column", "Category Column", "Date Column"))
+
+
+# Keywords for the secondary dimensions; the first column (in file order) containing any of them wins
+DIMENSION_KEYWORDS = {
+    "geo": ["country", "region", "location", "state", "city"],
+    "product": ["product", "item", "sku", "productname"],
+    "customer": ["customer"],
+}
+
+
+def dimension_columns(columns) -> dict:
+    """Return {"geo": col or None, "product": ..., "customer": ...} for standardized column names."""
+    found = {}
+    for dim, keywords in DIMENSION_KEYWORDS.items():
+        matches = [c for c in columns if any(k in str(c).lower() for k in keywords)]
+        found[dim] = matches[0] if matches else None
+    return found
+
+
+@traced
+def prepare_dataset(df: pd.DataFrame, **clean_options):
+    """
+    Run column standardization, cleaning and detection on a raw frame,
+    then convert and sort by the detected date column.
+    The raw frame is cleaned in place. Returns (df_cleaned, col_info, column_types).
+    """
+    df_cleaned, column_types = clean_data(standardize_columns(df), copy=False, return_types=True, **clean_options)
+    df_cleaned, col_info = finalize_dataset(df_cleaned)
+    return df_cleaned, col_info, column_types
+
+
+@traced
+def finalize_dataset(df_cleaned: pd.DataFrame):
+    """
+    Detect columns on an already cleaned frame, then convert, drop missing
+    and sort by the detected date column. Returns (df_cleaned, col_info).
+    """
+    details = {}
+    col_info = explain_column_detection(df_cleaned, details=details)
+
+    date_col = detected_columns(col_info)[3]
+    if date_col:
+        try:
+            df_cleaned[date_col] = pd.to_datetime(df_cleaned[date_col], format=details["date_format"],
+                                                  errors='coerce')
+            df_cleaned = df_cleaned.dropna(subset=[date_col])
+            df_cleaned = df_cleaned.sort_values(date_col)
+        except Exception:
+            # app.py warns when the date column is left unconverted
+            pass
+    # Categorical codes for dimension columns and downcast integers
+    df_cleaned = compact_frame(df_cleaned, arrow_strings=ARROW_STRINGS)
+    df_cleaned.attrs["detection"] = details
+    return df_cleaned, col_info
+
+
+def load_dataset(data: bytes, name: str, encoding: str = "latin1", cache: LRUCache = None, key: str = None,
+                 **clean_options):
+    """
+    Cached upload -> clean -> detect pipeline.
+    Keyed on the file content hash plus reader/cleaning options, so widget
+    reruns reuse the cleaned, date-sorted frame instead of re-parsing.
+    The returned frame is shared between reruns and must not be mutated.
+    Pass key (from dataset_key) if the caller already hashed the upload.
+    """
+    cache = dataset_cache if cache is None else cache
+    key = key or dataset_key(data, name, encoding, **clean_options)
+    return cache.get_or_compute(key, lambda: prepare_dataset(read_upload(data, name, encoding), **clean_options))
+
+
+def dataset_key(data: bytes, name: str, encoding: str = "latin1", **clean_options) -> str:
+    """Identity of a cleaned dataset: file content hash plus reader/cleaning options."""
+    return make_key("dataset", content_hash(data), os.path.splitext(name.lower())[1], encoding, clean_options)
@@ -0,0 +1,142 @@
+# utils/precompute.py
+import heapq
+import itertools
+import threading
+import uuid
+import weakref
+from concurrent.futures import Future
+
+
+class _Job:
+    __slots__ = ("future", "compute", "priority", "label", "owners")
+
+    def __init__(self, compute, priority, label):
+        self.future = Future()
+        self.compute = compute
+        self.priority = priority
+        self.label = label
+        self.owners = set()
+
+
+class Owner:
+    """Token naming one owner's batch; see Precomputer.owner()."""
+    __slots__ = ("key", "__weakref__")
+
+    def __init__(self):
+        self.key = uuid.uuid4().hex
+
+
+class Precomputer:
+    """
+    One background thread working through cache-warming jobs, lowest priority
+    number first. A job is identified by the cache key its compute() fills:
+    submitting a key that is already queued or running returns the same
+    Future (at the more urgent of the two priorities).
+
+    Each owner (a dashboard session) has one current batch of jobs. A new
+    batch cancels the owner's jobs that are still queued and that no other
+    owner wants, so work for an outdated filter state never starts. A job
+    already running is left to finish; its result is cached all the same.
+    A job is forgotten once it is done and no owner's batch holds it.
+    """
+
+    def __init__(self, name: str = "sales-precompute"):
+        self.name = name
+        self._jobs = {}  # key -> _Job: queued, running, or failed and still in a batch (so it is not retried)
+        self._batches = {}  # owner -> {key: Future}
+        self._heap = []
+        self._seq = itertools.count()
+        self._running = None
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def owner(self) -> Owner:
+        """
+        A new owner token (e.g. kept in a session's state). Batches are keyed by
+        token.key; once the token is garbage collected, its batch is cancelled.
+        """
+        token = Owner()
+        weakref.finalize(token, self.cancel, token.key)
+        return token
+
+    def submit(self, key: str, compute, priority: int = 0, owner=None, label: str = None) -> Future:
+        """Queue compute() under key, unless it is already queued or running."""
+        with self._cond:
+            return self._submit(key, compute, priority, owner, label)
+
+    def _submit(self, key, compute, priority, owner, label):
+        job = self._jobs.get(key)
+        new = job is None
+        if new:
+            job = self._jobs[key] = _Job(compute, priority, label or key)
+        job.owners.add(owner)
+        if new or (priority < job.priority and not job.future.running() and not job.future.done()):
+            # A raised priority leaves a stale heap entry behind; the worker skips it
+            job.priority = priority
+            heapq.heappush(self._heap, (priority, next(self._seq), key))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._work, name=self.name, daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return job.future
+
+    def schedule(self, owner, jobs) -> dict:
+        """
+        Make jobs - (key, compute, priority, label) tuples - the owner's current
+        batch, cancelling the rest of its previous batch. Returns {key: Future}.
+        """
+        with self._cond:
+            batch = {key: self._submit(key, compute, priority, owner, label)
+                     for key, compute, priority, label in jobs}
+            self._drop(owner, set(self._batches.get(owner, ())) - set(batch))
+            self._batches[owner] = batch
+            return batch
+
+    def cancel(self, owner):
+        """Forget the owner's batch, cancelling its jobs nobody else waits for."""
+        with self._cond:
+            self._drop(owner, set(self._batches.pop(owner, ())))
+
+    def _drop(self, owner, keys):
+        for key in keys:
+            job = self._jobs.get(key)
+            if job is None:
+                continue
+            job.owners.discard(owner)
+            if not job.owners and (job.future.cancel() or job.future.done()):
+                del self._jobs[key]
+
+    def progress(self, owner) -> tuple:
+        """(jobs done, jobs in the owner's batch, label of the job running now or None)."""
+        with self._cond:
+            batch = self._batches.get(owner, {})
+            done = sum(f.done() for f in batch.values())
+            return done, len(batch), self._running
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                priority, _, key = heapq.heappop(self._heap)
+                job = self._jobs.get(key)
+                if job is None or job.priority != priority or job.future.running() or job.future.done() \
+                        or not job.future.set_running_or_notify_cancel():
+                    continue
+                self._running = job.label
+            try:
+                job.compute()
+            except BaseException as e:
+                # Without its traceback the stored error keeps no frames (and their data) alive
+                job.future.set_exception(e.with_traceback(None))
+            else:
+                job.future.set_result(None)
+            with self._cond:
+                self._running = None
+                job.compute = None
+                if (job.future.exception() is None or not job.owners) and self._jobs.get(key) is job:
+                    del self._jobs[key]
+
+
+# Shared by every session of the server process
+precomputer = Precomputer()
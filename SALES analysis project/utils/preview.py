@@ -0,0 +1,78 @@
+# utils/preview.py
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from utils.perf import traced
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is offered only when pyarrow is installed
+    pa = pq = None
+
+PAGE_SIZES = (25, 50, 100, 500)
+EXPORT_CHUNK_ROWS = 100_000
+
+
+@traced
+def sort_order(s: pd.Series, ascending: bool = True) -> np.ndarray:
+    """Row positions of s in sorted order (stable, missing values last). Categoricals sort by label."""
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        s = s.cat.reorder_categories(sorted(s.cat.categories, key=str))
+    s = s.reset_index(drop=True)
+    return s.sort_values(ascending=ascending, kind="stable", na_position="last").index.to_numpy()
+
+
+@traced
+def search_mask(df: pd.DataFrame, text: str) -> np.ndarray:
+    """
+    Rows where any text column contains `text` (case-insensitive). Categorical
+    columns are searched through their categories, not row by row.
+    """
+    mask = np.zeros(len(df), dtype=bool)
+    for col in df.select_dtypes(include=['object', 'category', 'string']).columns:
+        s = df[col]
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            hits = s.cat.categories.astype(str).str.contains(text, case=False, regex=False)
+            mask |= np.isin(s.cat.codes.to_numpy(), np.flatnonzero(hits))
+        else:
+            mask |= s.astype(str).str.contains(text, case=False, regex=False, na=False).to_numpy()
+    return mask
+
+
+def select_positions(n_rows: int, order: np.ndarray = None, mask: np.ndarray = None) -> np.ndarray:
+    """Row positions to page through: in `order` if given, keeping only rows where `mask` is set."""
+    positions = np.arange(n_rows) if order is None else order
+    return positions if mask is None else positions[mask[positions]]
+
+
+def page(df: pd.DataFrame, positions: np.ndarray, page_number: int, page_size: int) -> pd.DataFrame:
+    """Materialize only one page (1-based) of the selected rows."""
+    start = (page_number - 1) * page_size
+    return df.iloc[positions[start:start + page_size]]
+
+
+def export_file(df: pd.DataFrame, fmt: str = "csv", chunk_rows: int = EXPORT_CHUNK_ROWS) -> bytes:
+    """
+    Serialize df chunk by chunk (CSV, or Parquet row groups) through a
+    temporary file, so no whole-frame CSV string or Arrow table is built
+    next to the output. Returns the file's bytes: Streamlit's download
+    button needs them in memory in any case. The temporary file is closed
+    (and deleted) before returning.
+    """
+    with tempfile.TemporaryFile() as out:
+        if fmt == "parquet":
+            writer = None
+            for start in range(0, max(len(df), 1), chunk_rows):
+                table = pa.Table.from_pandas(df.iloc[start:start + chunk_rows], preserve_index=False,
+                                             schema=writer.schema if writer else None)
+                writer = writer or pq.ParquetWriter(out, table.schema)
+                writer.write_table(table)
+            writer.close()
+        else:
+            for start in range(0, max(len(df), 1), chunk_rows):
+                out.write(df.iloc[start:start + chunk_rows].to_csv(index=False, header=start == 0).encode("utf-8"))
+        out.seek(0)
+        return out.read()
@@ -1,14 +1,237 @@
 # utils/report.py
+import base64
+import datetime
+import io
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from reportlab.platypus import Image, KeepTogether, SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
 from reportlab.lib.styles import getSampleStyleSheet
-import datetime
-import os
 
-def export_report(kpis: dict, filename_prefix="sales_report", save_dir="."):
+from utils.cache import LRUCache, make_key
+from utils.perf import traced
+
+try:
+    import kaleido  # noqa: F401  (plotly's own image export, used when installed)
+    KALEIDO_AVAILABLE = True
+except ImportError:
+    KALEIDO_AVAILABLE = False
+
+# Rasterized chart size: inches at CHART_DPI, drawn CHART_WIDTH_PT wide on the page
+CHART_SIZE = (8, 4.5)
+CHART_DPI = 110
+CHART_WIDTH_PT = 480
+
+# One worker pool for every export of the server process, started on first use
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# ---------- Chart rasterization ----------
+def _array(value) -> np.ndarray:
+    """A trace array from a figure dict: plain lists/arrays or plotly's base64 typed arrays."""
+    if isinstance(value, dict) and "bdata" in value:
+        out = np.frombuffer(base64.b64decode(value["bdata"]), dtype=value["dtype"])
+        return out.reshape([int(n) for n in str(value["shape"]).split(",")]) if "shape" in value else out
+    out = np.asarray(value if value is not None else [])
+    if out.dtype.kind in "OU" and len(out):
+        # ISO timestamps (date axes) become datetimes so lines keep their spacing
+        dates = pd.to_datetime(pd.Series(out), errors="coerce", format="ISO8601")
+        if dates.notna().all():
+            return dates.to_numpy()
+    return out
+
+
+def _title(layout: dict, *path) -> str:
+    for key in path:
+        layout = (layout or {}).get(key)
+    return (layout or {}).get("text", "") if isinstance(layout, dict) else (layout or "")
+
+
+def _draw_matplotlib(fig_dict: dict, size=CHART_SIZE, dpi: int = CHART_DPI) -> bytes:
     """
-    Create a PDF report containing the KPIs dictionary.
+    Draw the traces of a plotly figure dict with matplotlib and return PNG
+    bytes. Covers the trace types the dashboard uses (line/scatter, bar,
+    histogram, pie, 3D scatter); a choropleth is drawn as a bar chart of its
+    largest regions, since matplotlib has no map shapes.
+    """
+    from matplotlib.figure import Figure
+
+    traces, layout = fig_dict.get("data", []), fig_dict.get("layout", {})
+    fig = Figure(figsize=size, dpi=dpi)
+    kind = traces[0].get("type", "scatter") if traces else "scatter"
+    ax = fig.add_subplot(projection="3d" if kind == "scatter3d" else None)
+    # Text z values (e.g. categories) share one integer position across 3D traces
+    text_z = [z for z in (_array(t.get("z")) for t in traces if t.get("type") == "scatter3d") if z.dtype.kind in "OU"]
+    z_labels = pd.Index(pd.unique(np.concatenate(text_z).astype(str)) if text_z else [])
+    for trace in traces:
+        kind, name = trace.get("type", "scatter"), trace.get("name") or None
+        color = (trace.get("marker") or {}).get("color")
+        color = color if isinstance(color, str) else None
+        if kind in ("scatter", "scattergl"):
+            x, y = _array(trace.get("x")), _array(trace.get("y"))
+            if "lines" in trace.get("mode", "lines"):
+                ax.plot(x, y, label=name, linewidth=1.2)
+            else:
+                ax.scatter(x, y, s=6, label=name, color=color)
+        elif kind == "bar":
+            x, y = _array(trace.get("x")), _array(trace.get("y"))
+            width = trace.get("width")
+            ax.bar(x if x.dtype.kind in "fiuM" else x.astype(str), y, label=name, color=color,
+                   width=float(width) if width is not None else 0.8)
+        elif kind == "histogram":
+            ax.hist(_array(trace.get("x")), bins=trace.get("nbinsx") or 30, label=name, color=color)
+        elif kind == "pie":
+            values, labels = _array(trace.get("values")), _array(trace.get("labels")).astype(str)
+            sums = pd.Series(values).groupby(labels, sort=False).sum()
+            ax.pie(sums, labels=sums.index, autopct="%1.0f%%", wedgeprops={"width": 1 - (trace.get("hole") or 0)})
+        elif kind == "scatter3d":
+            z = _array(trace.get("z"))
+            z = z_labels.get_indexer(z.astype(str)) if z.dtype.kind in "OU" else z
+            ax.scatter(_array(trace.get("x")), _array(trace.get("y")), z, s=4, label=name, color=color)
+        elif kind in ("choropleth", "scattergeo"):
+            regions = pd.Series(_array(trace.get("z")), index=_array(trace.get("locations")).astype(str))
+            top = regions.sort_values().tail(15)
+            ax.barh(top.index, top.to_numpy())
+    ax.set_title(_title(layout, "title"), fontsize=11)
+    if kind == "scatter3d":
+        ax.set_xlabel(_title(layout, "scene", "xaxis", "title"))
+        ax.set_ylabel(_title(layout, "scene", "yaxis", "title"))
+        ax.set_zlabel(_title(layout, "scene", "zaxis", "title"))
+        if len(z_labels):
+            ax.set_zticks(range(len(z_labels)), z_labels, fontsize=7)
+    elif kind != "pie":
+        ax.set_xlabel(_title(layout, "xaxis", "title"))
+        ax.set_ylabel(_title(layout, "yaxis", "title"))
+    if sum(bool(t.get("name")) for t in traces) > 1:
+        ax.legend(fontsize=7)
+    fig.tight_layout()
+    out = io.BytesIO()
+    fig.savefig(out, format="png")
+    return out.getvalue()
+
+
+def _render_pool() -> ProcessPoolExecutor:
+    """The shared rasterization pool, created (or replaced, if broken) on demand."""
+    global _pool
+    with _pool_lock:
+        if _pool is None or getattr(_pool, "_broken", False):
+            _pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1)
+        return _pool
+
+
+def _rasterize(fig_dict: dict) -> bytes:
+    """Worker: one figure dict to PNG bytes, with kaleido if installed, else matplotlib."""
+    if KALEIDO_AVAILABLE:
+        import plotly.io as pio
+        return pio.to_image(fig_dict, format="png", width=CHART_SIZE[0] * CHART_DPI,
+                            height=CHART_SIZE[1] * CHART_DPI)
+    return _draw_matplotlib(fig_dict)
+
+
+@traced
+def rasterize_charts(figures: dict, cache: LRUCache = None, key: str = None, max_workers: int = None) -> dict:
+    """
+    PNG bytes for each {name: plotly figure}, rendered in parallel worker
+    processes (one pool shared by all exports). With a cache and key (e.g. dataset hash + filter state),
+    images are stored per chart, and only the missing ones are rendered.
+    """
+    images, missing = {}, {}
+    for name, fig in figures.items():
+        png = cache.get(make_key("png", key, name)) if cache is not None else None
+        if png is None:
+            missing[name] = fig.to_dict()
+        else:
+            images[name] = png
+    workers = min(len(missing), max_workers or os.cpu_count() or 1)
+    if workers <= 1:
+        rendered = [_rasterize(fig) for fig in missing.values()]
+    else:
+        try:
+            rendered = list(_render_pool().map(_rasterize, missing.values()))
+        except BrokenProcessPool:
+            rendered = [_rasterize(fig) for fig in missing.values()]
+    for name, png in zip(missing, rendered):
+        images[name] = png
+        if cache is not None:
+            cache.put(make_key("png", key, name), png)
+    return {name: images[name] for name in figures}
+
+
+# ---------- PDF ----------
+@traced
+def build_report(kpis: dict, insights=None, title="Sales Analysis Report", charts=None) -> bytes:
+    """
+    Render the PDF report into memory: KPIs table, insights and, if given,
+    charts as {chart title: PNG bytes}. Returns the PDF bytes.
+    """
+    out = io.BytesIO()
+    doc = SimpleDocTemplate(out, pagesize=A4)
+    styles = getSampleStyleSheet()
+    story = []
+
+    # Title
+    story.append(Paragraph(escape(title), styles['Title']))
+    story.append(Spacer(1, 12))
+
+    # Timestamp
+    ts_text = Paragraph(f"Generated: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", styles['Normal'])
+    story.append(ts_text)
+    story.append(Spacer(1, 12))
+
+    # KPIs Table
+    table_data = [["Metric", "Value"]]
+    for k, v in kpis.items():
+        table_data.append([k, str(v)])
+
+    t = Table(table_data, colWidths=[200, 300])
+    t.setStyle(TableStyle([
+        ('BACKGROUND', (0,0), (-1,0), colors.HexColor("#2E86AB")),
+        ('TEXTCOLOR', (0,0), (-1,0), colors.white),
+        ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
+        ('BACKGROUND', (0,1), (-1,-1), colors.whitesmoke)
+    ]))
+    story.append(t)
+    story.append(Spacer(1, 24))
+
+    # Insights
+    if insights:
+        story.append(Paragraph("Insights", styles['Heading2']))
+        for insight in insights:
+            story.append(Paragraph(f"- {escape(insight)}", styles['Normal']))
+        story.append(Spacer(1, 24))
+
+    # Charts
+    if charts:
+        story.append(Paragraph("Charts", styles['Heading2']))
+        height = CHART_WIDTH_PT * CHART_SIZE[1] / CHART_SIZE[0]
+        for name, png in charts.items():
+            story.append(KeepTogether([Paragraph(escape(name), styles['Heading4']),
+                                       Image(io.BytesIO(png), width=CHART_WIDTH_PT, height=height),
+                                       Spacer(1, 12)]))
+
+    # Footer
+    footer = Paragraph("This report was generated by the Sales Analysis Platform.", styles['Italic'])
+    story.append(footer)
+
+    # Build PDF
+    doc.build(story)
+    return out.getvalue()
+
+
+@traced
+def export_report(kpis: dict, filename_prefix="sales_report", save_dir=".", insights=None,
+                  title="Sales Analysis Report", charts=None):
+    """
+    Create a PDF report containing the KPIs dictionary and, if given,
+    the list of insight strings and chart images (see build_report).
     Returns the full filename path.
     """
     # Ensure save directory exists
@@ -19,41 +242,9 @@ def export_report(kpis: dict, filename_prefix="sales_report", save_dir="."):
     filename = os.path.join(save_dir, f"{filename_prefix}_{ts}.pdf")
 
     try:
-        doc = SimpleDocTemplate(filename, pagesize=A4)
-        styles = getSampleStyleSheet()
-        story = []
-
-        # Title
-        title = Paragraph("Sales Analysis Report", styles['Title'])
-        story.append(title)
-        story.append(Spacer(1, 12))
-
-        # Timestamp
-        ts_text = Paragraph(f"Generated: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", styles['Normal'])
-        story.append(ts_text)
-        story.append(Spacer(1, 12))
-
-        # KPIs Table
-        table_data = [["Metric", "Value"]]
-        for k, v in kpis.items():
-            table_data.append([k, str(v)])
-
-        t = Table(table_data, colWidths=[200, 300])
-        t.setStyle(TableStyle([
-            ('BACKGROUND', (0,0), (-1,0), colors.HexColor("#2E86AB")),
-            ('TEXTCOLOR', (0,0), (-1,0), colors.white),
-            ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
-            ('BACKGROUND', (0,1), (-1,-1), colors.whitesmoke)
-        ]))
-        story.append(t)
-        story.append(Spacer(1, 24))
-
-        # Footer
-        footer = Paragraph("This report was generated by the Sales Analysis Platform.", styles['Italic'])
-        story.append(footer)
-
-        # Build PDF
-        doc.build(story)
+        pdf = build_report(kpis, insights, title, charts)
+        with open(filename, "wb") as f:
+            f.write(pdf)
         return filename
 
     except Exception as e:
@@ -0,0 +1,216 @@
+# utils/shared_store.py
+import json
+import os
+import shutil
+import threading
+import weakref
+from collections import OrderedDict
+
+from utils.parquet_store import STORE_DIR
+from utils.perf import traced
+
+try:
+    import pyarrow as pa
+    SHARED_STORE_AVAILABLE = True
+except ImportError:  # without pyarrow each session falls back to the in-memory dataset cache
+    SHARED_STORE_AVAILABLE = False
+
+SHARED_DIR = os.environ.get("SALES_SHARED_DIR", os.path.join(STORE_DIR, "shared"))
+# Datasets no session uses any more stay mapped up to this size, then are evicted
+IDLE_MAX_BYTES = int(os.environ.get("SALES_SHARED_IDLE_MB", "512")) * 1024 ** 2
+_META_KEY = b"sales_dashboard"
+
+
+class SharedDataset:
+    """
+    One cleaned dataset stored as an Arrow IPC file and memory-mapped once
+    per server process. `df` is a read-only pandas view of the mapping:
+    numeric and date columns point straight into the mapped pages, so every
+    session reading it shares one copy (held in the OS page cache).
+    """
+
+    def __init__(self, key: str, path: str):
+        self.key = key
+        self.path = path
+        table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+        meta = json.loads(table.schema.metadata[_META_KEY])
+        self.col_info = {k: tuple(v) for k, v in meta["col_info"].items()}
+        self.column_types = meta["column_types"]
+        self.df = table.to_pandas(split_blocks=True)
+        self.nbytes = os.path.getsize(path)
+        self.refs = 0
+
+
+def _pid_alive(pid: int) -> bool:
+    if os.name == "nt":
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        code = ctypes.c_ulong()
+        kernel32.GetExitCodeProcess(handle, ctypes.byref(code))
+        kernel32.CloseHandle(handle)
+        return code.value == 259  # STILL_ACTIVE
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # alive, owned by another user
+        return True
+    return True
+
+
+def sweep_stale(store_dir: str = None) -> list:
+    """
+    Delete what earlier server processes left in the shared store: the
+    per-process folders (named by PID) of processes no longer running, and
+    loose .arrow/.tmp files from before files were kept per process.
+    Returns the deleted paths.
+    """
+    store_dir = store_dir or SHARED_DIR
+    if not os.path.isdir(store_dir):
+        return []
+    deleted = []
+    for entry in os.scandir(store_dir):
+        if entry.is_dir():
+            stale = entry.name.isdigit() and not _pid_alive(int(entry.name))
+        else:
+            stale = entry.name.endswith((".arrow", ".tmp"))
+        if not stale:
+            continue
+        if entry.is_dir():
+            shutil.rmtree(entry.path, ignore_errors=True)
+        else:
+            try:
+                os.remove(entry.path)
+            except OSError:  # still mapped by a running process (Windows)
+                continue
+        deleted.append(entry.path)
+    return deleted
+
+
+@traced
+def write_shared(df, key: str, col_info: dict, column_types: dict, store_dir: str = None) -> str:
+    """Write a cleaned frame and its detection results as an uncompressed Arrow file (atomically)."""
+    path = os.path.join(store_dir or SHARED_DIR, f"{key}.arrow")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    meta = {"col_info": col_info, "column_types": column_types}
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), _META_KEY: json.dumps(meta).encode()})
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp, path)
+    return path
+
+
+class Lease:
+    """
+    A session's reference to a SharedDataset. Released explicitly, or when
+    the lease is garbage collected (e.g. with the session's state).
+    """
+
+    def __init__(self, registry, dataset: SharedDataset):
+        self.dataset = dataset
+        self.key = dataset.key
+        self._finalizer = weakref.finalize(self, registry.release, dataset.key)
+
+    @property
+    def df(self):
+        return self.dataset.df
+
+    @property
+    def col_info(self):
+        return self.dataset.col_info
+
+    @property
+    def column_types(self):
+        return self.dataset.column_types
+
+    def release(self):
+        self._finalizer()
+
+
+class DatasetRegistry:
+    """
+    Process-wide registry of shared datasets with reference counts. acquire()
+    builds and writes a dataset once (concurrent sessions wait for the first
+    build), later sessions just map it. Datasets whose last lease is
+    released are kept, least recently used first out, while their files fit
+    in max_idle_bytes; evicted ones are unmapped and their files deleted.
+
+    Files go in a folder of store_dir named after the server's PID; on
+    start-up the folders of processes that are gone are swept away.
+    """
+
+    def __init__(self, store_dir: str = None, max_idle_bytes: int = IDLE_MAX_BYTES):
+        sweep_stale(store_dir)
+        self.store_dir = os.path.join(store_dir or SHARED_DIR, str(os.getpid()))
+        self.max_idle_bytes = max_idle_bytes
+        self._datasets = {}
+        self._idle = OrderedDict()  # key -> nbytes, for datasets with no leases
+        self._building = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str, build) -> Lease:
+        """
+        Lease the dataset for key, creating it with build() -> (df_cleaned,
+        col_info, column_types) on first use.
+        """
+        while True:
+            with self._lock:
+                dataset = self._datasets.get(key)
+                if dataset is not None:
+                    dataset.refs += 1
+                    self._idle.pop(key, None)
+                    return Lease(self, dataset)
+                build_lock = self._building.setdefault(key, threading.Lock())
+            with build_lock:
+                with self._lock:
+                    if key in self._datasets:
+                        continue
+                path = os.path.join(self.store_dir, f"{key}.arrow")
+                if not os.path.exists(path):
+                    df_cleaned, col_info, column_types = build()
+                    write_shared(df_cleaned, key, col_info, column_types, self.store_dir)
+                    del df_cleaned
+                dataset = SharedDataset(key, path)
+                with self._lock:
+                    self._datasets[key] = dataset
+                    self._building.pop(key, None)
+
+    def get(self, key: str):
+        """The mapped SharedDataset for key, if any, without taking a lease."""
+        with self._lock:
+            return self._datasets.get(key)
+
+    def release(self, key: str):
+        with self._lock:
+            dataset = self._datasets.get(key)
+            if dataset is None:
+                return
+            dataset.refs -= 1
+            if dataset.refs <= 0:
+                self._idle[key] = dataset.nbytes
+                self._evict()
+
+    def _evict(self):
+        while self._idle and sum(self._idle.values()) > self.max_idle_bytes:
+            key, _ = self._idle.popitem(last=False)
+            dataset = self._datasets.pop(key)
+            # Frames still referencing the mapping (e.g. in the results cache) keep it alive;
+            # the file itself can go
+            try:
+                os.remove(dataset.path)
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"datasets": len(self._datasets), "idle": len(self._idle),
+                    "leases": sum(d.refs for d in self._datasets.values()),
+                    "mapped_bytes": sum(d.nbytes for d in self._datasets.values())}
+
+
+shared_datasets = DatasetRegistry()
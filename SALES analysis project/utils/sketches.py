@@ -0,0 +1,115 @@
+# utils/sketches.py
+import numpy as np
+import pandas as pd
+
+
+class QuantileSketch:
+    """
+    Log-bucketed quantile sketch (DDSketch style). Values are counted in
+    buckets whose width grows geometrically, so any quantile it returns is
+    within relative_accuracy of a true value of that rank. Memory depends on
+    the value range, not on how many values were added.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = np.log(self.gamma)
+        self.positive = {}
+        self.negative = {}
+        self.zeros = 0
+        self.count = 0
+
+    def _add(self, store: dict, values: np.ndarray):
+        if len(values):
+            keys, counts = np.unique(np.ceil(np.log(values) / self._log_gamma).astype(np.int64), return_counts=True)
+            for k, c in zip(keys.tolist(), counts.tolist()):
+                store[k] = store.get(k, 0) + c
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[np.isfinite(values)]
+        self.count += len(values)
+        self.zeros += int((values == 0).sum())
+        self._add(self.positive, values[values > 0])
+        self._add(self.negative, -values[values < 0])
+
+    def _value(self, key: int) -> float:
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return np.nan
+        rank = q * (self.count - 1)
+        seen = 0
+        for k in sorted(self.negative, reverse=True):
+            seen += self.negative[k]
+            if seen > rank:
+                return -self._value(k)
+        seen += self.zeros
+        if seen > rank:
+            return 0.0
+        for k in sorted(self.positive):
+            seen += self.positive[k]
+            if seen > rank:
+                return self._value(k)
+        return self._value(max(self.positive)) if self.positive else 0.0
+
+
+class HyperLogLog:
+    """
+    Distinct-count estimate in 2**p one-byte registers
+    (standard error about 1.04 / sqrt(2**p), i.e. ~1.6% for p=12).
+    """
+
+    def __init__(self, p: int = 12):
+        self.p = p
+        self.registers = np.zeros(1 << p, dtype=np.uint8)
+
+    def update(self, values):
+        values = pd.Series(values).dropna()
+        if values.empty:
+            return
+        h = pd.util.hash_pandas_object(values, index=False).to_numpy(dtype=np.uint64)
+        idx = (h >> np.uint64(64 - self.p)).astype(np.int64)
+        rest = h << np.uint64(self.p)
+        # rank = leading zeros of the remaining bits + 1
+        _, exponent = np.frexp(rest.astype(float))
+        rank = np.where(rest == 0, 64 - self.p + 1, np.minimum(65 - exponent, 64 - self.p + 1))
+        np.maximum.at(self.registers, idx, rank.astype(np.uint8))
+
+    def estimate(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.exp2(-self.registers.astype(float)))
+        empty = int((self.registers == 0).sum())
+        if estimate <= 2.5 * m and empty:
+            estimate = m * np.log(m / empty)  # small-range correction (linear counting)
+        return int(round(estimate))
+
+
+class HeavyHitters:
+    """
+    Misra-Gries top-k summary: keeps at most k candidate values and their
+    counts. Each count is under-estimated by at most n / (k + 1), so any value
+    seen more often than that is guaranteed to be kept.
+    """
+
+    def __init__(self, k: int = 50):
+        self.k = k
+        self.counts = {}
+
+    def _shrink(self, counts: pd.Series) -> pd.Series:
+        if len(counts) > self.k:
+            kth = counts.iloc[self.k]
+            counts = counts[counts > kth] - kth
+        return counts
+
+    def update(self, values):
+        chunk = pd.Series(values).value_counts(dropna=True)
+        chunk = self._shrink(chunk[chunk > 0])
+        merged = pd.Series(self.counts, dtype="int64").add(chunk, fill_value=0).sort_values(ascending=False)
+        self.counts = self._shrink(merged).astype("int64").to_dict()
+
+    def top(self, n: int = 1) -> list:
+        """The n most frequent (value, estimated count) pairs."""
+        return sorted(self.counts.items(), key=lambda kv: kv[1], reverse=True)[:n]
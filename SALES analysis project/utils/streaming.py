@@ -0,0 +1,299 @@
+# utils/streaming.py
+import itertools
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+from utils.cache import LRUCache, file_hash, make_key
+from utils.cleaning import clean_data, explain_column_detection
+from utils.filters import as_str_keys
+from utils.perf import traced
+from utils.pipeline import dataset_cache, standardize_columns, detected_columns
+
+# Rows at the top of a worksheet searched for the header row
+HEADER_SCAN_ROWS = 20
+
+
+class StreamingHistogram:
+    """
+    Equal-width histogram that can be fed chunk by chunk without knowing
+    the value range upfront. When a chunk falls outside the current range the
+    bin width doubles and neighbouring bins are merged, so memory stays at
+    nbins counters. Bins are half-open [lo, hi), so a merged bin holds
+    exactly the values a bin of the doubled width would.
+    """
+
+    def __init__(self, nbins: int = 30):
+        self.nbins = nbins + nbins % 2  # merging pairs needs an even bin count
+        self.start = None
+        self.width = None
+        self.counts = np.zeros(self.nbins, dtype=np.int64)
+
+    def _grow(self, left: bool):
+        merged = np.add.reduceat(self.counts, np.arange(0, self.nbins, 2))
+        self.counts = np.zeros(self.nbins, dtype=np.int64)
+        if left:
+            self.start -= self.width * self.nbins
+            self.counts[self.nbins // 2:] = merged
+        else:
+            self.counts[:self.nbins // 2] = merged
+        self.width *= 2
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[np.isfinite(values)]
+        if not len(values):
+            return
+        lo, hi = values.min(), values.max()
+        if self.start is None:
+            self.start = lo
+            # The first maximum opens the last bin instead of closing it
+            self.width = (hi - lo) / (self.nbins - 1) or max(abs(lo), 1.0) / self.nbins
+        while lo < self.start:
+            self._grow(left=True)
+        while hi >= self.start + self.width * self.nbins:
+            self._grow(left=False)
+        idx = ((values - self.start) // self.width).astype(np.int64).clip(0, self.nbins - 1)
+        self.counts += np.bincount(idx, minlength=self.nbins)
+
+    @property
+    def edges(self):
+        if self.start is None:
+            return np.array([])
+        return self.start + self.width * np.arange(self.nbins + 1)
+
+
+class StreamingAggregator:
+    """
+    Folds cleaned chunks into the pre-aggregates the dashboard needs:
+    KPI totals, per-category sums, a daily time series, a sales histogram,
+    missing-cell counts and a bounded uniform sample for the preview.
+    Duplicate rows are only dropped within a chunk, not across chunks.
+    """
+
+    def __init__(self, sales_col, profit_col, category_col, date_col,
+                 sample_rows: int = 1000, nbins: int = 30, seed: int = 0):
+        self.sales_col = sales_col
+        self.profit_col = profit_col
+        self.category_col = category_col
+        self.date_col = date_col
+        self.value_cols = [c for c in (sales_col, profit_col) if c]
+        self.sample_rows = sample_rows
+        self.rows = 0
+        self.totals = pd.Series(0.0, index=self.value_cols)
+        self.category_sums = None
+        self.time_series = None
+        self.missing = None
+        self.histogram = StreamingHistogram(nbins)
+        self._sample = None
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, chunk: pd.DataFrame):
+        if self.date_col and self.date_col in chunk.columns:
+            if not pd.api.types.is_datetime64_any_dtype(chunk[self.date_col]):
+                chunk[self.date_col] = pd.to_datetime(chunk[self.date_col], errors='coerce')
+            chunk = chunk.dropna(subset=[self.date_col])
+        if chunk.empty:
+            return
+
+        self.rows += len(chunk)
+        missing = chunk.isna().sum()
+        self.missing = missing if self.missing is None else self.missing.add(missing, fill_value=0)
+
+        if self.value_cols:
+            values = chunk[self.value_cols]
+            self.totals = self.totals.add(values.sum(), fill_value=0)
+            if self.category_col:
+                part = values.groupby(as_str_keys(chunk[self.category_col]), observed=True).sum()
+                self.category_sums = part if self.category_sums is None else self.category_sums.add(part, fill_value=0)
+            if self.date_col:
+                part = values.groupby(chunk[self.date_col].dt.floor('D')).sum()
+                self.time_series = part if self.time_series is None else self.time_series.add(part, fill_value=0)
+        if self.sales_col:
+            self.histogram.update(chunk[self.sales_col].to_numpy(dtype=float, na_value=np.nan))
+
+        # Reservoir sample: keep the rows with the smallest random keys seen so far
+        keyed = chunk.assign(_key=self._rng.random(len(chunk)))
+        if self._sample is not None:
+            keyed = pd.concat([self._sample, keyed])
+        self._sample = keyed.nsmallest(self.sample_rows, '_key')
+
+    @property
+    def sample(self) -> pd.DataFrame:
+        if self._sample is None:
+            return pd.DataFrame()
+        sample = self._sample.drop(columns='_key')
+        return sample.sort_values(self.date_col) if self.date_col else sample.sort_index()
+
+    def kpis(self) -> dict:
+        """Raw KPI numbers (None where the source column was not detected)."""
+        sales_count = self.histogram.counts.sum()
+        return {
+            "total_sales": self.totals.get(self.sales_col) if self.sales_col else None,
+            "total_profit": self.totals.get(self.profit_col) if self.profit_col else None,
+            "avg_sales": self.totals[self.sales_col] / sales_count if self.sales_col and sales_count else None,
+            "total_missing": int(self.missing.sum()) if self.missing is not None else 0,
+        }
+
+
+def _aggregate_chunks(chunks, sample_rows: int, nbins: int, progress=None):
+    """
+    Infer the cleaning schema and detect columns on the first chunk, then
+    clean every chunk with that schema and fold it into a StreamingAggregator.
+    Returns (aggregator, col_info, column_types).
+    """
+    types = col_info = agg = None
+    for chunk in chunks:
+        chunk = standardize_columns(chunk)
+        if types is None:
+            chunk, types = clean_data(chunk, copy=False, return_types=True)
+            col_info = explain_column_detection(chunk)
+            agg = StreamingAggregator(*detected_columns(col_info), sample_rows=sample_rows, nbins=nbins)
+        else:
+            chunk = clean_data(chunk, copy=False, types=types)
+        agg.update(chunk)
+        if progress:
+            progress(agg.rows)
+    if agg is None or not agg.rows:
+        raise ValueError("No data rows found")
+    return agg, col_info, types
+
+
+@traced
+def stream_csv(source, chunksize: int = 100_000, encoding: str = "latin1", sample_rows: int = 1000,
+               nbins: int = 30, progress=None):
+    """
+    Read a CSV in chunks, infer the cleaning schema and detect columns on the
+    first chunk, then clean every chunk with that schema and fold it into a
+    StreamingAggregator. Peak memory is bounded by chunksize, not file size.
+    progress, if given, is called with the number of rows aggregated so far.
+    Returns (aggregator, col_info, column_types).
+    """
+    return _aggregate_chunks(pd.read_csv(source, encoding=encoding, chunksize=chunksize), sample_rows, nbins,
+                             progress)
+
+
+# ---------- Excel ----------
+def _rewind(source):
+    if hasattr(source, "seek"):
+        source.seek(0)
+
+
+def _is_blank(value) -> bool:
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def detect_header_row(rows) -> int:
+    """
+    Position of the header among the first rows of a sheet: the first row
+    made of distinct text cells (at least two) that covers at least half of
+    the widest row, so title lines and blank rows above a table are skipped.
+    0 when no row qualifies.
+    """
+    filled = [[v for v in row if not _is_blank(v)] for row in rows]
+    widest = max(map(len, filled), default=0)
+    for i, cells in enumerate(filled):
+        if len(cells) >= max(2, widest / 2) and all(isinstance(v, str) for v in cells) \
+                and len(set(cells)) == len(cells):
+            return i
+    return 0
+
+
+def _header_names(row) -> list:
+    """Column names like read_excel's: blanks become 'Unnamed: <i>', repeats get '.1', '.2'... suffixes."""
+    row = list(row)
+    while row and _is_blank(row[-1]):
+        row.pop()
+    names, seen = [], {}
+    for i, value in enumerate(row):
+        name = f"Unnamed: {i}" if _is_blank(value) else str(value).strip()
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def xlsx_layout(source) -> dict:
+    """
+    {sheet name: (detected header row (0-based), row count)} for every
+    worksheet, reading only their first rows. The row count comes from the
+    sheet's stored dimensions; files that don't record them get the number
+    of non-blank rows among the first HEADER_SCAN_ROWS.
+    """
+    book = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        layout = {}
+        for sheet in book.worksheets:
+            head = list(sheet.iter_rows(max_row=HEADER_SCAN_ROWS, values_only=True))
+            rows = sheet.max_row or sum(not all(_is_blank(v) for v in row) for row in head)
+            layout[sheet.title] = (detect_header_row(head), rows)
+        return layout
+    finally:
+        book.close()
+        _rewind(source)
+
+
+def iter_xlsx(source, sheet_name=0, header_row: int = None, chunksize: int = 50_000):
+    """
+    Yield one worksheet as DataFrames of at most chunksize rows. Rows are read
+    one at a time in openpyxl's read-only mode (no cell objects are kept), so
+    memory is bounded by chunksize, not by the workbook. Cell values keep
+    their Excel types (numbers, dates, text), so columns come out typed.
+    sheet_name is a name or position; header_row (0-based) is detected among
+    the first HEADER_SCAN_ROWS rows when None. Blank rows are skipped.
+    """
+    book = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        sheet = book.worksheets[sheet_name] if isinstance(sheet_name, int) else book[sheet_name]
+        rows = sheet.iter_rows(values_only=True)
+        head = list(itertools.islice(rows, HEADER_SCAN_ROWS if header_row is None else header_row + 1))
+        if header_row is None:
+            header_row = detect_header_row(head)
+        if header_row >= len(head):
+            return
+        columns = _header_names(head[header_row])
+        width = len(columns)
+        batch = []
+        for row in itertools.chain(head[header_row + 1:], rows):
+            if all(v is None for v in row):
+                continue
+            batch.append(row[:width] if len(row) >= width else row + (None,) * (width - len(row)))
+            if len(batch) == chunksize:
+                yield pd.DataFrame.from_records(batch, columns=columns)
+                batch = []
+        if batch:
+            yield pd.DataFrame.from_records(batch, columns=columns)
+    finally:
+        book.close()
+        _rewind(source)
+
+
+@traced
+def stream_xlsx(source, sheet_name=0, header_row: int = None, chunksize: int = 50_000, sample_rows: int = 1000,
+                nbins: int = 30, progress=None):
+    """
+    stream_csv() for one worksheet: row batches from iter_xlsx() are cleaned
+    with the schema inferred on the first batch and folded into a
+    StreamingAggregator. Returns (aggregator, col_info, column_types).
+    """
+    return _aggregate_chunks(iter_xlsx(source, sheet_name, header_row, chunksize), sample_rows, nbins, progress)
+
+
+def _load_stream(tag, stream, fileobj, cache, options):
+    cache = dataset_cache if cache is None else cache
+    key = make_key(tag, file_hash(fileobj), {k: v for k, v in options.items() if k != "progress"})
+    return cache.get_or_compute(key, lambda: stream(fileobj, **options))
+
+
+def load_csv_stream(fileobj, cache: LRUCache = None, **options):
+    """Cached stream_csv() for a seekable upload, keyed on its content hash and options."""
+    return _load_stream("stream", stream_csv, fileobj, cache, options)
+
+
+def load_xlsx_stream(fileobj, cache: LRUCache = None, **options):
+    """Cached stream_xlsx() for a seekable upload, keyed on its content hash, sheet, header row and options."""
+    return _load_stream("stream-xlsx", stream_xlsx, fileobj, cache, options)
@@ -0,0 +1,90 @@
+# utils/synthetic.py
+import numpy as np
+import pandas as pd
+
+SHIP_MODES = ["Standard Class", "Second Class", "First Class", "Same Day"]
+SEGMENTS = ["Consumer", "Corporate", "Home Office"]
+REGIONS = ["West", "East", "Central", "South"]
+STATES = ["California", "New York", "Texas", "Pennsylvania", "Washington", "Illinois", "Ohio", "Florida",
+          "Michigan", "North Carolina", "Arizona", "Virginia", "Georgia", "Tennessee", "Colorado", "Indiana"]
+CATEGORIES = ["Office Supplies", "Furniture", "Technology"]
+SUBCATEGORIES = ["Binders", "Paper", "Furnishings", "Phones", "Storage", "Art", "Accessories", "Chairs",
+                 "Appliances", "Labels", "Tables", "Envelopes", "Bookcases", "Fasteners", "Supplies",
+                 "Machines", "Copiers"]
+
+
+def _labels(prefix: str, n: int, first_id: int = None) -> np.ndarray:
+    """n distinct labels: 'Prefix 0', 'Prefix 1'... or IDs like 'PR-10000000' when first_id is given."""
+    if first_id is not None:
+        return np.array([f"{prefix}-{first_id + i}" for i in range(n)], dtype=object)
+    return np.array([f"{prefix} {i}" for i in range(n)], dtype=object)
+
+
+def make_superstore(rows: int = 10_000, extra_columns: int = 0, categories: int = 3, customers: int = 800,
+                    products: int = 1_900, start: str = "2014-01-03", days: int = 4 * 365,
+                    missing_rate: float = 0.0, dirty_numbers: bool = False, seed: int = 0) -> pd.DataFrame:
+    """
+    Synthetic frame with the columns and value shapes of csv/Sample - Superstore.csv:
+    m/d/Y date strings, ID strings, low-cardinality dimensions and skewed sales.
+    - categories: category cardinality (the first 3 use the real names)
+    - extra_columns: additional numeric 'Metric N' columns
+    - missing_rate: share of cells blanked in the non-key columns
+    - dirty_numbers: write Sales/Profit as strings like "$1,234.50"
+    """
+    rng = np.random.default_rng(seed)
+    # Format each calendar day once, then index into the labels
+    calendar = pd.date_range(start, periods=days + 7, freq="D")
+    day_labels = np.array(calendar.strftime("%m/%d/%Y"), dtype=object)
+    order_day = rng.integers(0, days, rows)
+    ship_day = order_day + rng.integers(0, 7, rows)
+    category_names = np.array((CATEGORIES + [f"Category {i}" for i in range(3, categories)])[:categories], dtype=object)
+    category = rng.integers(0, categories, rows)
+    product = rng.integers(0, products, rows)
+    customer = rng.integers(0, customers, rows)
+    quantity = rng.integers(1, 15, rows)
+    discount = rng.choice([0.0, 0.1, 0.2, 0.3, 0.5, 0.7, 0.8], rows, p=[0.45, 0.1, 0.3, 0.05, 0.04, 0.03, 0.03])
+    sales = np.round(rng.lognormal(4, 1.3, rows), 2)
+    profit = np.round(sales * rng.normal(0.12, 0.25, rows) - sales * discount * 0.5, 4)
+
+    df = pd.DataFrame({
+        "Row ID": np.arange(1, rows + 1),
+        "Order ID": [f"CA-{y}-{n}" for y, n in zip(calendar.year[order_day], rng.integers(100_000, 170_000, rows))],
+        "Order Date": day_labels[order_day],
+        "Ship Date": day_labels[ship_day],
+        "Ship Mode": rng.choice(SHIP_MODES, rows, p=[0.6, 0.2, 0.15, 0.05]),
+        "Customer ID": _labels("CU", customers, 10_000)[customer],
+        "Customer Name": _labels("Customer", customers)[customer],
+        "Segment": rng.choice(SEGMENTS, rows, p=[0.5, 0.3, 0.2]),
+        "Country": "United States",
+        "City": _labels("City", 500)[rng.integers(0, 500, rows)],
+        "State": rng.choice(STATES, rows),
+        "Postal Code": rng.integers(1_000, 99_999, rows),
+        "Region": rng.choice(REGIONS, rows),
+        "Product ID": _labels("PR", products, 10_000_000)[product],
+        "Category": category_names[category],
+        "Sub-Category": np.array(SUBCATEGORIES, dtype=object)[product % len(SUBCATEGORIES)],
+        "Product Name": _labels("Product", products)[product],
+        "Sales": sales,
+        "Quantity": quantity,
+        "Discount": discount,
+        "Profit": profit,
+    })
+    for i in range(extra_columns):
+        df[f"Metric {i}"] = np.round(rng.normal(100, 30, rows), 3)
+
+    if dirty_numbers:
+        df["Sales"] = ["${:,.2f}".format(v) for v in sales]
+        df["Profit"] = ["{:,.2f}".format(v) for v in profit]
+    if missing_rate:
+        keys = {"Row ID", "Order ID", "Order Date"}
+        for col in df.columns.difference(list(keys)):
+            blank = rng.random(rows) < missing_rate
+            if blank.any():
+                df[col] = df[col].astype(object).where(~blank, None)
+    return df
+
+
+def write_superstore_csv(path: str, **options) -> str:
+    """Generate a synthetic Superstore frame and write it as a latin1 CSV, like the sample file."""
+    make_superstore(**options).to_csv(path, index=False, encoding="latin1")
+    return path
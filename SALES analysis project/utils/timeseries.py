@@ -0,0 +1,147 @@
+# utils/timeseries.py
+import numpy as np
+import pandas as pd
+
+from utils.downsample import DEFAULT_LINE_POINTS, choose_granularity
+from utils.filters import as_str_keys
+from utils.perf import traced
+
+FREQ_LABELS = {"D": "Daily", "W": "Weekly", "MS": "Monthly", "QS": "Quarterly"}
+# Periods averaged by the '<col>_rolling' column
+ROLLING_WINDOW = {"D": 7, "W": 4, "MS": 3, "QS": 4}
+PERIOD_STEPS = {"D": pd.Timedelta(days=1), "W": pd.Timedelta(days=7), "MS": pd.offsets.MonthBegin(1),
+                "QS": pd.offsets.QuarterBegin(startingMonth=1)}
+YEAR = pd.DateOffset(years=1)
+
+
+def _period_starts(days: pd.DatetimeIndex, freq: str) -> pd.DatetimeIndex:
+    """Start of the day/week (Monday)/month/quarter each day falls in."""
+    if freq == "D":
+        return days
+    if freq == "W":
+        return days - pd.to_timedelta(days.dayofweek, unit="D")
+    return days.to_period("M" if freq == "MS" else "Q").start_time
+
+
+class TimeSeries:
+    """
+    Daily sums of the value columns (and record counts) per category, stored
+    as prefix sums over a dense calendar, plus the day positions where each
+    week, month and quarter starts. Built once per dataset.
+
+    Any period rollup for any date range and category selection is then a
+    difference of prefix sums at the period boundaries - O(periods x
+    categories), whatever the row count - so changing the filters re-slices
+    the rollups instead of re-aggregating rows.
+    """
+
+    def __init__(self, dates: pd.Series, values: pd.DataFrame, counts: pd.Series, categories: pd.Series = None,
+                 date_col: str = "date"):
+        self.date_col = date_col
+        self.value_cols = list(values.columns)
+        keep = dates.notna().to_numpy()
+        days = dates[keep].dt.normalize()
+        self.start = days.min() if len(days) else pd.Timestamp("1970-01-01")
+        self.days = pd.date_range(self.start, days.max() if len(days) else self.start, freq="D")
+        day_pos = (days - self.start).dt.days.to_numpy()
+
+        if categories is None:
+            codes, self.categories = np.zeros(len(day_pos), dtype=np.int64), [None]
+        else:
+            # Missing categories get a column of their own, under the "nan" key the filters use
+            codes, uniques = pd.factorize(as_str_keys(categories[keep]), use_na_sentinel=False)
+            self.categories = ["nan" if pd.isna(c) else c for c in uniques]
+        self._cat_index = {c: i for i, c in enumerate(self.categories)}
+
+        # prefix[name][d, c] = sum over days < d of category c
+        self.prefix = {}
+        measures = {**{c: values[c] for c in self.value_cols}, "records": counts}
+        for name, col in measures.items():
+            daily = np.zeros((len(self.days), len(self.categories)))
+            np.add.at(daily, (day_pos, codes), col[keep].fillna(0).to_numpy(dtype=float))
+            self.prefix[name] = np.vstack([np.zeros((1, len(self.categories))), daily.cumsum(axis=0)])
+
+        # Per frequency: day positions where each period starts (negative for a first,
+        # partly covered period), period labels, period lengths in days and the
+        # positions where the previous periods start
+        self.periods = {}
+        for freq, step in PERIOD_STEPS.items():
+            starts = _period_starts(self.days, freq)
+            labels = starts[np.flatnonzero(np.r_[True, starts[1:] != starts[:-1]])]
+            positions = self._positions(labels)
+            self.periods[freq] = (positions, labels, self._positions(labels + step) - positions,
+                                  self._positions(labels - step))
+
+    def _positions(self, dates: pd.DatetimeIndex) -> np.ndarray:
+        return (dates - self.start).days.to_numpy()
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, date_col: str, value_cols, category_col: str = None) -> "TimeSeries":
+        """Build from rows: value_cols are summed per day (and category); 'records' counts the rows."""
+        value_cols = [c for c in value_cols if c]
+        return cls(df[date_col], df[value_cols], pd.Series(1, index=df.index),
+                   df[category_col] if category_col else None, date_col)
+
+    def _span(self, date_range):
+        lo, hi = 0, len(self.days)
+        if date_range:
+            lo = max(lo, (pd.Timestamp(date_range[0]).normalize() - self.start).days)
+            hi = min(hi, (pd.Timestamp(date_range[1]).normalize() - self.start).days + 1)
+        return lo, max(lo, hi)
+
+    def _sums(self, name: str, cols, positions) -> np.ndarray:
+        """Prefix sums at day positions (clipped to the calendar) for the chosen categories."""
+        return self.prefix[name][np.clip(positions, 0, len(self.days))][:, cols].sum(axis=1)
+
+    def auto_freq(self, date_range=None, max_points: int = DEFAULT_LINE_POINTS) -> str:
+        lo, hi = self._span(date_range)
+        return choose_granularity(pd.Series([self.start + pd.Timedelta(days=lo), self.start + pd.Timedelta(days=hi)]),
+                                  max_points)
+
+    @traced
+    def series(self, freq: str = "MS", date_range=None, categories=None) -> pd.DataFrame:
+        """
+        Sums per period (freq "D", "W", "MS", "QS" or "auto") inside date_range
+        for the selected categories, indexed by period start. Columns:
+        - <col>, records: sums over the days of the period inside the range
+        - <col>_rolling: mean over the last ROLLING_WINDOW[freq] periods shown
+        - <col>_pop: change vs the whole previous period (0.12 = +12%)
+        - <col>_yoy: change vs the same days one year earlier
+        - complete: whether the range covers the whole period
+        Previous-period and prior-year values are read from the full data, even
+        outside date_range; they are NaN where the data does not reach back.
+        """
+        freq = self.auto_freq(date_range) if freq == "auto" else freq
+        lo, hi = self._span(date_range)
+        cols = list(range(len(self.categories))) if not categories or self.categories == [None] else \
+            [self._cat_index[c] for c in map(str, categories) if c in self._cat_index]
+        positions, labels, lengths, previous_starts = self.periods[freq]
+        i0 = max(np.searchsorted(positions, lo, side="right") - 1, 0)
+        i1 = np.searchsorted(positions, hi, side="left") if hi > lo and cols else i0
+        starts, lengths, previous_starts = positions[i0:i1], lengths[i0:i1], previous_starts[i0:i1]
+        lows = np.maximum(starts, lo)
+        highs = np.minimum(starts + lengths, hi)
+        # The same days one year earlier
+        prior_lows = self._positions(self.start + pd.to_timedelta(lows, unit="D") - YEAR)
+        prior_highs = self._positions(self.start + pd.to_timedelta(highs, unit="D") - YEAR)
+
+        out = pd.DataFrame(index=pd.DatetimeIndex(labels[i0:i1], name=self.date_col))
+        window = ROLLING_WINDOW[freq]
+        for name in self.value_cols + ["records"]:
+            out[name] = self._sums(name, cols, highs) - self._sums(name, cols, lows)
+            if name == "records":
+                continue
+            values = out[name].to_numpy()
+            previous = self._sums(name, cols, starts) - self._sums(name, cols, previous_starts)
+            prior = self._sums(name, cols, prior_highs) - self._sums(name, cols, prior_lows)
+            out[f"{name}_rolling"] = out[name].rolling(window, min_periods=1).mean()
+            with np.errstate(divide="ignore", invalid="ignore"):
+                out[f"{name}_pop"] = np.where((previous != 0) & (previous_starts >= 0), values / previous - 1, np.nan)
+                out[f"{name}_yoy"] = np.where((prior != 0) & (prior_lows >= 0), values / prior - 1, np.nan)
+        out["records"] = out["records"].astype("int64")
+        out["complete"] = highs - lows == lengths
+        out.attrs["freq"] = freq
+        return out
+
+    def __sizeof__(self):
+        return sum(p.nbytes for p in self.prefix.values())